@@ -8,7 +8,14 @@ import speech_recognition as sr
 import io
 import datetime
 import litellm
-from tinydb import TinyDB, Query as TinyQuery
+import sys
+from tinydb import TinyDB
+from backend.predicates import compile_filter
+
+# backend/ modules import their siblings by plain name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from storage import LogStorage
+from nosql_bulk import bulk_insert, bulk_update, bulk_delete, bulk_restore
 
 # -----------------------------
 # CONFIG
@@ -29,7 +36,10 @@ def get_sqlite_con():
     return con
 
 def get_tinydb_table():
-    db = TinyDB(TINYDB_PATH)
+    # Same append-only file format as the backend; the backend compacts it.
+    # Writes go through nosql_bulk (one log record per mutation); LogStore's
+    # file lock keeps them from interleaving with the backend's.
+    db = TinyDB(TINYDB_PATH, storage=LogStorage, compact_ratio=None)
     return db.table("employees")
 
 
@@ -54,35 +64,9 @@ def get_tinydb_schema():
     sample = table.all()[0]
     return json.dumps({k: type(v).__name__ for k, v in sample.items()}, indent=2)
 
-def _build_tinydb_cond(field: str, spec, Q):
-    if isinstance(spec, dict):
-        conds = []
-        for op, val in spec.items():
-            f = getattr(Q, field)
-            if op == "$gt":   conds.append(f > val)
-            elif op == "$gte": conds.append(f >= val)
-            elif op == "$lt":  conds.append(f < val)
-            elif op == "$lte": conds.append(f <= val)
-            elif op == "$ne":  conds.append(f != val)
-        if not conds: return None
-        result = conds[0]
-        for c in conds[1:]:
-            result &= c
-        return result
-    return getattr(Q, field) == spec
-
 def tinydb_filter(filter_dict: dict):
-    if not filter_dict: return None
-    Q = TinyQuery()
-    conditions = []
-    for f, v in filter_dict.items():
-        cond = _build_tinydb_cond(f, v, Q)
-        if cond: conditions.append(cond)
-    if not conditions: return None
-    result = conditions[0]
-    for c in conditions[1:]:
-        result &= c
-    return result
+    # Shared compiled-predicate engine (same one the FastAPI backend uses)
+    return compile_filter(filter_dict)
 
 def apply_smart_update(doc: dict, update_spec: dict):
     """Applies mutations to a doc, handling arithmetic operators like $inc, $mul, $expr."""
@@ -127,12 +111,8 @@ def undo_mutation(entry_idx):
             con.commit()
             con.close()
         else:
-            table = get_tinydb_table()
-            for doc_data in snapshot:
-                # TinyDB snapshots stored with 'doc_id'
-                doc_id = doc_data.pop("__doc_id__", None)
-                if doc_id:
-                    table.update(doc_data, doc_ids=[doc_id])
+            # TinyDB snapshots stored with '__doc_id__'; one write for all docs
+            bulk_restore(get_tinydb_table(), snapshot)
         
         st.session_state.audit_log[entry_idx]["undone"] = True
         return True
@@ -364,26 +344,20 @@ with tab1:
                         flt    = query_obj.get("filter", {})
                         cond   = tinydb_filter(flt)
                         
-                        # Snapshot: docs to be affected
-                        target_docs = table.search(cond) if cond else table.all()
-                        snapshot = []
-                        for d in target_docs:
-                            sd = dict(d)
-                            sd["__doc_id__"] = d.doc_id
-                            snapshot.append(sd)
-
+                        # Snapshot (docs affected, with '__doc_id__') comes
+                        # from the same single-write pass as the mutation
+                        snapshot = None
                         if method == "insert":
-                            table.insert(query_obj.get("document", {}))
+                            bulk_insert(table, query_obj.get("document", {}))
                             msg = "Inserted 1 record."
-                            snapshot = None # No undo for inserts in this simple version
+                            # No undo for inserts in this simple version
                         elif method == "update":
                             upd = query_obj.get("update", {})
-                            for doc in target_docs:
-                                new_doc = apply_smart_update(dict(doc), upd)
-                                table.update(new_doc, doc_ids=[doc.doc_id])
-                            msg = f"Updated {len(target_docs)} records."
+                            snapshot, _ = bulk_update(table, cond,
+                                                      lambda d: apply_smart_update(d, upd))
+                            msg = f"Updated {len(snapshot)} records."
                         elif method == "delete":
-                            table.remove(cond)
+                            snapshot, _ = bulk_delete(table, cond)
                             msg = "Deleted matching records."
                         st.success(f"NoSQL Mutation ({method}) executed: {msg}")
                         df = pd.DataFrame()
@@ -0,0 +1,254 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+from audit_store import entry_matches, normalize_time
+
+# ─────────────────────────────────────────────────
+# Audit index  (sidecar offsets for the JSONL audit file)
+# ─────────────────────────────────────────────────
+# `<audit file>.idx` is a 16-byte header followed by one fixed-size record per
+# audit line:  id, byte offset, length, time key (YYYYMMDDhhmmss), crc32(user).
+# The header holds the largest id ever written, so a restart continues the id
+# sequence without reading the audit file, and the recent window is read
+# straight from the tail offsets. Search loads the index columns once and
+# seeks to matching lines only.
+#
+# The audit file is the source of truth. The index is written after each
+# fsynced batch without an fsync of its own; on startup records that point
+# past the end of the data are dropped, and any unindexed tail is re-scanned.
+
+_HEADER = struct.Struct("<4sIq")      # magic, version, max id
+_REC    = struct.Struct("<qqIqI")     # id, offset, length, time key, user crc
+_MAGIC  = b"AIDX"
+
+
+def time_key(ts: str) -> int:
+    """'2024-05-01 10:30:00' → 20240501103000 (orders like the timestamp)."""
+    digits = "".join(ch for ch in str(ts) if ch.isdigit())[:14]
+    return int(digits.ljust(14, "0")) if digits else 0
+
+
+def user_key(user) -> int:
+    return zlib.crc32(str(user).encode())
+
+
+def record_meta(record: dict):
+    """(id, time key, user key) for an audit record about to be written."""
+    return record.get("id", -1), time_key(record.get("timestamp", "")), user_key(record.get("user"))
+
+
+# Ids and times are almost always appended in order, but not guaranteed to be
+# (older files, clock steps, a record re-indexed after a crash). Search bisects
+# a running max of each column instead of the column itself, plus a `lag`: how
+# many positions past its sorted place the most displaced record sits. Lower
+# bounds stay exact; upper bounds widen by the lag, and the scan re-checks keys.
+
+def _push_max(c, name, key):
+    m = c[name + "_max"]
+    if m and key < m[-1]:
+        c[name + "_lag"] = max(c[name + "_lag"], len(m) + 1 - bisect_right(m, key))
+        m.append(m[-1])
+    else:
+        m.append(key)
+
+
+def _narrow(c, name, lo_key, hi_key, lo, hi):
+    """Positions in [lo, hi) that can hold a key within [lo_key, hi_key]."""
+    m, end = c[name + "_max"], hi
+    if lo_key is not None:
+        lo = max(lo, bisect_left(m, lo_key, 0, end))
+    if hi_key is not None:
+        hi = min(hi, bisect_right(m, hi_key, 0, end) + c[name + "_lag"])
+    return lo, hi
+
+
+class AuditIndex:
+    meta = staticmethod(record_meta)
+
+    def __init__(self, data_path: str, index_path: str = None):
+        self.data_path  = data_path
+        self.index_path = index_path or data_path + ".idx"
+        self._lock    = threading.Lock()
+        self._columns = None     # id/offset/length/time/user arrays, loaded by search
+        self.count    = 0
+        self.max_id   = -1
+        self._end     = 0        # audit-file bytes covered by the index
+        data_size = self._recover()
+        self._file = open(self.index_path, "r+b")
+        if self._end < data_size:
+            self._scan_tail(self._end)
+
+    # ── startup ───────────────────────────────
+    def _recover(self):
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if data_size:
+            data_size = self._trim_partial_line(data_size)
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, _, self.max_id = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError("bad magic")
+        except (OSError, struct.error, ValueError):
+            self._write_fresh_index()
+        n = (os.path.getsize(self.index_path) - _HEADER.size) // _REC.size
+        with open(self.index_path, "r+b") as f:
+            # Drop records whose audit lines never made it to disk
+            while n:
+                f.seek(_HEADER.size + (n - 1) * _REC.size)
+                _, offset, length, _, _ = _REC.unpack(f.read(_REC.size))
+                if offset + length <= data_size:
+                    self._end = offset + length
+                    break
+                n -= 1
+            f.truncate(_HEADER.size + n * _REC.size)
+        self.count = n
+        return data_size
+
+    def _trim_partial_line(self, size: int) -> int:
+        """A crash mid-write can leave a torn last line; cut it off."""
+        with open(self.data_path, "r+b") as f:
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return size
+            keep, pos = 0, size
+            while pos > 0:
+                start = max(0, pos - 65536)
+                f.seek(start)
+                cut = f.read(pos - start).rfind(b"\n")
+                if cut >= 0:
+                    keep = start + cut + 1
+                    break
+                pos = start
+            f.truncate(keep)
+            print(f"  [Audit] Dropped a torn record at the end of {self.data_path}")
+            return keep
+
+    def _write_fresh_index(self):
+        with open(self.index_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, 1, -1))
+        self.max_id = -1
+
+    def _scan_tail(self, start: int):
+        """Index audit lines from byte `start` on (first run, or after a crash)."""
+        records = []
+        with open(self.data_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    records.append((record_meta(rec), offset, len(line)))
+                except (ValueError, AttributeError):
+                    pass   # unparseable line: not indexed
+                offset += len(line)
+        self.append(records)
+        if records:
+            print(f"  [Audit] Indexed {len(records)} audit records")
+
+    # ── writing ───────────────────────────────
+    def append(self, records):
+        """records: [((id, time key, user key), offset, length)] in file order."""
+        if not records:
+            return
+        data = b"".join(_REC.pack(m[0], off, ln, m[1], m[2]) for m, off, ln in records)
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self.max_id = max(self.max_id, max(m[0] for m, _, _ in records))
+            self._file.seek(0)
+            self._file.write(_HEADER.pack(_MAGIC, 1, self.max_id))
+            self._file.flush()
+            if self._columns is not None:
+                for (rid, tk, uk), off, ln in records:
+                    self._add_column_row(rid, off, ln, tk, uk)
+            self.count += len(records)
+            _, off, ln = records[-1]
+            self._end = off + ln
+
+    def _add_column_row(self, rid, off, ln, tk, uk):
+        c = self._columns
+        _push_max(c, "id", rid)
+        _push_max(c, "time", tk)
+        c["id"].append(rid); c["offset"].append(off); c["length"].append(ln)
+        c["time"].append(tk); c["user"].append(uk)
+
+    # ── reading ───────────────────────────────
+    def _read_records(self, first: int, last: int):
+        self._file.seek(_HEADER.size + first * _REC.size)
+        return list(_REC.iter_unpack(self._file.read((last - first) * _REC.size)))
+
+    def recent(self, n: int) -> list:
+        """The last `n` audit records, oldest first."""
+        with self._lock:
+            recs = self._read_records(max(0, self.count - n), self.count)
+        if not recs:
+            return []
+        start = recs[0][1]
+        with open(self.data_path, "rb") as f:
+            f.seek(start)
+            blob = f.read(recs[-1][1] + recs[-1][2] - start)
+        return [json.loads(blob[off - start:off - start + ln]) for _, off, ln, _, _ in recs]
+
+    def _load_columns(self):
+        if self._columns is None:
+            c = {"id": array("q"), "offset": array("q"), "length": array("q"),
+                 "time": array("q"), "user": array("q"),
+                 "id_max": array("q"), "id_lag": 0,
+                 "time_max": array("q"), "time_lag": 0}
+            self._columns = c
+            for rec in self._read_records(0, self.count):
+                self._add_column_row(*rec)
+        return self._columns
+
+    def search(self, log_id=None, user=None, status=None, db_type=None,
+               since=None, until=None, cursor=None, limit=50) -> dict:
+        """Newest-first matches across the whole audit file.
+
+        `cursor` is the `next_cursor` of the previous page (an index position).
+        Before the first flush there is no audit file yet: an empty page.
+        """
+        since, until = normalize_time(since), normalize_time(until)
+        status = status.lower() if status else None
+        with self._lock:
+            c = self._load_columns()
+            lo, hi = 0, self.count if cursor is None else max(0, min(cursor, self.count))
+        # Columns only ever grow, so positions below `hi` are stable without the lock
+        t_lo = time_key(since) if since else None
+        t_hi = time_key(until) if until else None
+        lo, hi = _narrow(c, "time", t_lo, t_hi, lo, hi)
+        if log_id is not None:
+            lo, hi = _narrow(c, "id", log_id, log_id, lo, hi)
+        u = user_key(user) if user is not None else None
+        out = []
+        if lo >= hi or not os.path.exists(self.data_path):
+            return {"entries": out, "next_cursor": None}
+        with open(self.data_path, "rb") as f:
+            for i in range(hi - 1, lo - 1, -1):
+                if ((log_id is not None and c["id"][i] != log_id) or
+                        (u is not None and c["user"][i] != u) or
+                        (t_lo is not None and c["time"][i] < t_lo) or
+                        (t_hi is not None and c["time"][i] > t_hi)):
+                    continue
+                f.seek(c["offset"][i])
+                rec = json.loads(f.read(c["length"][i]))
+                # status/db_type aren't indexed; user is re-checked (crc collisions)
+                if not entry_matches(rec, user, status, db_type, since, until):
+                    continue
+                out.append(rec)
+                if len(out) == limit:
+                    return {"entries": out, "next_cursor": i if i > lo else None}
+        return {"entries": out, "next_cursor": None}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"records": self.count, "max_id": self.max_id,
+                    "indexed_bytes": self._end, "columns_loaded": self._columns is not None}
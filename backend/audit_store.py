@@ -0,0 +1,395 @@
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from operator import itemgetter
+
+# ─────────────────────────────────────────────────
+# Audit log  (bounded in memory, snapshots spilled to disk)
+# ─────────────────────────────────────────────────
+# Only the most recent `max_entries` entries are kept in memory, in id order.
+# Ids are normally consecutive, so an entry is found by offset from the oldest
+# one; restored history can have gaps, where lookups fall back to bisection.
+# Undo snapshots never stay in memory. Each one is written as a single compact
+# JSON line to an append-only segment file, and the entry keeps only its
+# [segment, offset, length]. undo reads it back on demand.
+#
+# Segments roll over at `segment_bytes`; a segment is deleted once no entry in
+# memory references it. Segments survive restarts, so entries restored from
+# the audit file (see audit_index.py) can still be undone.
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def normalize_time(value):
+    """ISO date/datetime string → TIME_FORMAT (so string comparison works)."""
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value).strftime(TIME_FORMAT)
+
+
+def entry_matches(e, user=None, status=None, db_type=None, since=None, until=None) -> bool:
+    """Filter check shared by paging and search. `status` must be lower-case
+    and `since`/`until` already normalized."""
+    return not ((user and e.get("user") != user)
+                or (db_type and e.get("db_type") != db_type)
+                or (status and not str(e.get("status", "")).lower().startswith(status))
+                or (since and e.get("timestamp", "") < since)
+                or (until and e.get("timestamp", "") > until))
+
+
+class AuditLog:
+    def __init__(self, snapshot_path: str, max_entries: int = 10000,
+                 segment_bytes: int = 16 * 1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.max_entries   = max_entries
+        self.segment_bytes = segment_bytes
+        self._ring     = deque(maxlen=max_entries)
+        self._lock     = threading.RLock()
+        self._next_id  = 0
+        self._evicted  = 0
+        self._refs     = Counter()    # segment -> entries in memory referencing it
+        segments = self._segments()
+        self._segment  = max(segments, default=0)
+        self._seg_file = open(self._segment_path(self._segment), "ab")
+
+    @property
+    def next_id(self) -> int:
+        return self._next_id
+
+    def restore(self, entries, next_id: int):
+        """Reload recent entries after a restart.
+
+        Entries are put back in id order whatever order the file has them in
+        (duplicate ids keep the last one). Entries logged by an undo
+        (`undo_of`) mark their target undone again. Snapshot segments nothing
+        refers to anymore are removed.
+        """
+        with self._lock:
+            by_id = {e["id"]: e for e in entries if isinstance(e.get("id"), int)}
+            for _, e in sorted(by_id.items())[-self.max_entries:]:
+                ref = e.get("snapshot_ref")
+                if ref and not os.path.exists(self._segment_path(ref[0])):
+                    e["snapshot_ref"] = ref = None
+                if ref:
+                    self._refs[ref[0]] += 1
+                self._ring.append(e)
+            for e in self._ring:
+                target = self.get(e["undo_of"]) if e.get("undo_of") is not None else None
+                if target is not None:
+                    target["undone"] = True
+            self._next_id = max(next_id, self._ring[-1]["id"] + 1 if self._ring else 0)
+            for seg in self._segments():
+                if seg != self._segment and not self._refs[seg]:
+                    os.remove(self._segment_path(seg))
+
+    def append(self, entry: dict, snapshot=None, persist=None) -> dict:
+        """Assign the next id, spill `snapshot` (if any) and keep the entry.
+
+        `persist` (e.g. AuditWriter.write) gets a copy of the entry before the
+        lock is released, so concurrent appends reach it in id order.
+        """
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+            if len(self._ring) == self.max_entries:
+                self._drop(self._ring[0])
+            entry["snapshot_ref"] = self._spill(snapshot) if snapshot else None
+            self._ring.append(entry)
+            if persist is not None:
+                persist(dict(entry))
+            return entry
+
+    # ── snapshots ─────────────────────────────
+    def _segment_path(self, n: int) -> str:
+        base, ext = os.path.splitext(self.snapshot_path)
+        return f"{base}.{n:06d}{ext}"
+
+    def _segments(self):
+        base, ext = os.path.splitext(os.path.basename(self.snapshot_path))
+        folder = os.path.dirname(self.snapshot_path) or "."
+        out = []
+        for name in os.listdir(folder):
+            middle = name[len(base) + 1:-len(ext) or None]
+            if name.startswith(base + ".") and name.endswith(ext) and middle.isdigit():
+                out.append(int(middle))
+        return out
+
+    def _spill(self, snapshot):
+        offset = self._seg_file.tell()
+        if offset >= self.segment_bytes:
+            self._seg_file.close()
+            if not self._refs[self._segment]:
+                os.remove(self._segment_path(self._segment))
+            self._segment += 1
+            self._seg_file = open(self._segment_path(self._segment), "ab")
+            offset = 0
+        data = json.dumps(snapshot, separators=(",", ":")).encode() + b"\n"
+        self._seg_file.write(data)
+        self._seg_file.flush()
+        self._refs[self._segment] += 1
+        return [self._segment, offset, len(data)]
+
+    def _drop(self, entry):
+        self._evicted += 1
+        ref = entry.get("snapshot_ref")
+        if ref:
+            seg = ref[0]
+            self._refs[seg] -= 1
+            if self._refs[seg] <= 0:
+                del self._refs[seg]
+                if seg != self._segment:
+                    os.remove(self._segment_path(seg))
+
+    def snapshot(self, entry: dict):
+        """Load an entry's undo snapshot from disk (None if it has none)."""
+        ref = entry.get("snapshot_ref")
+        if not ref:
+            return None
+        with self._lock:
+            with open(self._segment_path(ref[0]), "rb") as f:
+                f.seek(ref[1])
+                return json.loads(f.read(ref[2]))
+
+    # ── lookup / paging ───────────────────────
+    def _position(self, log_id: int) -> int:
+        """Ring index of the first entry with id >= log_id."""
+        i = log_id - self._ring[0]["id"]
+        if 0 <= i < len(self._ring) and self._ring[i]["id"] == log_id:
+            return i
+        return bisect_left(self._ring, log_id, key=itemgetter("id"))
+
+    def get(self, log_id: int):
+        with self._lock:
+            if not self._ring:
+                return None
+            i = self._position(log_id)
+            e = self._ring[i] if i < len(self._ring) else None
+            return e if e is not None and e["id"] == log_id else None
+
+    def page(self, cursor=None, limit=50, user=None, status=None, db_type=None,
+             since=None, until=None):
+        """Newest-first page of entries older than `cursor` (an entry id).
+
+        `status` is a case-insensitive prefix ("failed" matches every failure);
+        `since`/`until` are inclusive ISO timestamps.
+        """
+        since, until = normalize_time(since), normalize_time(until)
+        status = status.lower() if status else None
+        out, next_cursor = [], None
+        with self._lock:
+            if self._ring and cursor is not None:
+                end = self._position(cursor)
+            else:
+                end = len(self._ring)
+            for i in range(end - 1, -1, -1):
+                e = self._ring[i]
+                if since and e["timestamp"] < since:
+                    break   # ids and timestamps increase together
+                if not entry_matches(e, user, status, db_type, None, until):
+                    continue
+                if len(out) == limit:
+                    next_cursor = out[-1]["id"]
+                    break
+                out.append(self.public(e))
+        return {"entries": out, "next_cursor": next_cursor}
+
+    def newer_than(self, after_id: int, limit=50, log_id=None, user=None, status=None,
+                   db_type=None, since=None, until=None) -> list:
+        """Newest-first matching entries with an id above `after_id`, e.g. the
+        ones the audit writer hasn't flushed yet. Filters as for page()."""
+        since, until = normalize_time(since), normalize_time(until)
+        status = status.lower() if status else None
+        out = []
+        with self._lock:
+            for i in range(len(self._ring) - 1, -1, -1):
+                e = self._ring[i]
+                if e["id"] <= after_id or len(out) == limit:
+                    break
+                if log_id is not None and e["id"] != log_id:
+                    continue
+                if entry_matches(e, user, status, db_type, since, until):
+                    out.append(self.public(e))
+        return out
+
+    @staticmethod
+    def public(entry: dict) -> dict:
+        e = {k: v for k, v in entry.items() if k != "snapshot_ref"}
+        e["has_snapshot"] = entry.get("snapshot_ref") is not None
+        return e
+
+    def close(self):
+        with self._lock:
+            self._seg_file.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._ring), "max_entries": self.max_entries,
+                    "evicted": self._evicted, "next_id": self._next_id,
+                    "snapshot_segment": self._segment,
+                    "snapshot_segments_live": len(self._refs),
+                    "snapshot_segment_bytes": self._seg_file.tell()}
+
+
+class AuditWriter:
+    """Group-commit writer for the audit file.
+
+    write() only serializes the entry and queues it; a background thread
+    appends queued lines in batches, one write + fsync per batch, flushing
+    when `batch_size` lines are waiting or `flush_interval` seconds after the
+    first one arrived. No line is ever discarded: when the queue stays full
+    for `put_timeout` seconds, write() takes the flush lock and appends the
+    queued lines plus its own synchronously (`sync_writes`), and a batch
+    whose write failed is kept whole for the next attempt. close() drains
+    everything before returning.
+
+    The writer thread holds the flush lock from taking a batch off the queue
+    until it is written, so the file stays in write() order either way.
+
+    With an `index` (audit_index.AuditIndex), each flushed batch's line
+    offsets are appended to the sidecar index after the fsync.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.2,
+                 max_queue: int = 10000, put_timeout: float = 1.0, index=None):
+        self.path           = path
+        self.index          = index
+        self.batch_size     = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue      = max_queue
+        self.put_timeout    = put_timeout
+        self._queue   = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._retry   = []       # lines of a batch whose write failed
+        self._closed  = False
+        self._stats   = {"written": 0, "batches": 0, "errors": 0, "sync_writes": 0,
+                         "flush_seconds": 0.0, "max_flush_seconds": 0.0, "last_error": None}
+        self._stats_lock = threading.Lock()
+        self._thread  = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict):
+        meta = self.index.meta(record) if self.index is not None else None
+        line = ((json.dumps(record) + "\n").encode(), meta)
+        if self._closed:
+            with self._flush_lock:
+                self._flush([line])   # late entries (during shutdown) go straight to disk
+            return
+        try:
+            self._queue.put(line, timeout=self.put_timeout)
+        except queue.Full:
+            self._write_through(line)
+
+    def _write_through(self, line):
+        """Queue full: append everything queued so far, then `line`."""
+        with self._flush_lock:
+            batch, stop = [], False
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            batch.append(line)
+            self._flush(batch)
+            with self._stats_lock:
+                self._stats["sync_writes"] += 1
+        if stop:
+            self._queue.put(None)   # close() is waiting on the writer thread
+
+    def _run(self):
+        while True:
+            with self._flush_lock:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch, stop = [first], False
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        line = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if line is None:
+                        stop = True
+                        break
+                    batch.append(line)
+                self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        lines = self._retry + batch
+        started = time.perf_counter()
+        try:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(b"".join(data for data, _ in lines))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            # Keep every line for the next batch
+            with self._stats_lock:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+            self._retry = lines
+            print(f"  [Audit] Write to {self.path} failed ({len(lines)} entries pending): {e}")
+            return
+        if self.index is not None:
+            records = []
+            for data, meta in lines:
+                records.append((meta, offset, len(data)))
+                offset += len(data)
+            try:
+                self.index.append(records)
+            except Exception as e:
+                # The lines are on disk. Stop indexing so they stay an unindexed
+                # tail, which AuditIndex re-scans on the next start
+                self.index = None
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = f"index: {e}"
+                print(f"  [Audit] Index append failed, indexing paused until restart: {e}")
+        elapsed = time.perf_counter() - started
+        self._retry = []
+        with self._stats_lock:
+            self._stats["written"] += len(lines)
+            self._stats["batches"] += 1
+            self._stats["flush_seconds"] += elapsed
+            self._stats["max_flush_seconds"] = max(self._stats["max_flush_seconds"], elapsed)
+
+    def close(self):
+        """Flush everything queued so far, then stop the writer thread."""
+        if self._closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._closed = True
+        late = []   # raced in behind the stop marker
+        while True:
+            try:
+                late.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if late or self._retry:
+            with self._flush_lock:
+                self._flush(late)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            s = dict(self._stats)
+        total, worst = s.pop("flush_seconds"), s.pop("max_flush_seconds")
+        return {
+            **s, "queue_depth": self._queue.qsize(), "max_queue": self.max_queue,
+            "pending_retry": len(self._retry),
+            "avg_flush_ms": round(total / s["batches"] * 1000, 3) if s["batches"] else 0.0,
+            "max_flush_ms": round(worst * 1000, 3),
+        }
@@ -0,0 +1,349 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# ─────────────────────────────────────────────────
+# Change feed between TinyDB and SQLite  (CDC)
+# ─────────────────────────────────────────────────
+# Every mutation of an employee on either store appends the record's
+# after-image to _cdc_log: (seq, source, key, doc or NULL when deleted). SQL
+# mutations append inside their own transaction. NoSQL ones are staged in
+# memory while the TinyDB lock is still held, so staging order is write order,
+# and move to the log in that order on flush_nosql() or the next sync pass
+# (the writer can't be taken under the TinyDB lock: the lock order is writer →
+# TinyDB). A worker thread replays new entries onto the other store:
+#   - per pass only the latest image of each record is applied; when both
+#     stores changed the same employee, the later log entry wins
+#   - images are absolute (upsert / delete), so applying one twice is harmless
+#   - one checkpoint per target store: SQLite changes commit together with
+#     theirs; TinyDB is written first and its checkpoint after, so a crash in
+#     between only re-applies images
+# Records are paired through _cdc_map (doc_id ↔ employees.id); records created
+# later get a fresh id on the other side. Pairs outlive deletes, so an undone
+# delete re-creates the record under both ids. Equal ids are NOT assumed to be
+# the same employee: the stores' ids drift apart as soon as either side
+# deletes and re-inserts. Existing records are paired explicitly, before the
+# first start:
+#   - pair_by_id(con)   after populate_sqlite.py reloaded SQLite from TinyDB
+#                       (it loads id = doc_id, and calls this itself)
+#   - reconcile(fields) pairs records whose values of `fields` (a natural key)
+#                       are equal and unique on both sides
+# start() refuses to run while either store has a record without a partner,
+# since replaying it would create a duplicate on the other side.
+#
+# The TinyDB side is reached through three callables supplied by the app:
+#   nosql_docs()                → (doc_id, doc) of every stored document
+#   nosql_allocate(n)           → n unused doc ids, reserved
+#   nosql_apply(upserts, dels)  → write {doc_id: doc} and delete [doc_id]
+
+LOG, MAP, CHECKPOINT = "_cdc_log", "_cdc_map", "_cdc_checkpoint"
+TABLES = (LOG, MAP, CHECKPOINT)
+
+_IN_CHUNK = 500   # ids per `IN (...)` lookup
+
+
+def _sql_value(v):
+    return v if v is None or isinstance(v, (str, int, float)) else json.dumps(v)
+
+
+class UnpairedRecords(RuntimeError):
+    """Records exist on one side with no partner in _cdc_map."""
+
+
+def create_tables(con):
+    con.execute(f"CREATE TABLE IF NOT EXISTS {LOG} (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "source TEXT NOT NULL, key INTEGER NOT NULL, doc TEXT, ts REAL NOT NULL)")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {MAP} (doc_id INTEGER PRIMARY KEY, "
+                "row_id INTEGER NOT NULL UNIQUE)")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT} (target TEXT PRIMARY KEY, "
+                "seq INTEGER NOT NULL)")
+    if not con.execute(f"SELECT 1 FROM {CHECKPOINT}").fetchone():
+        head = con.execute(f"SELECT coalesce(max(seq), 0) FROM {LOG}").fetchone()[0]
+        con.executemany(f"INSERT INTO {CHECKPOINT} VALUES (?, ?)", (("sql", head), ("nosql", head)))
+
+
+def pair_by_id(con, table: str = "employees", key: str = "id"):
+    """Pair every row with the document of the same id and drop the pending
+    log: for a `table` just reloaded from TinyDB with id = doc_id."""
+    create_tables(con)
+    con.execute(f"DELETE FROM {MAP}")
+    con.execute(f"INSERT INTO {MAP} SELECT {key}, {key} FROM {table}")
+    head = con.execute(f"SELECT coalesce(max(seq), 0) FROM {LOG}").fetchone()[0]
+    con.execute(f"DELETE FROM {LOG}")
+    con.execute(f"UPDATE {CHECKPOINT} SET seq = ?", (head,))
+
+
+class ChangeFeed:
+    def __init__(self, pool, nosql_docs, nosql_allocate, nosql_apply,
+                 table: str = "employees", key: str = "id",
+                 batch_size: int = 5000, interval: float = 1.0):
+        self.pool           = pool
+        self.nosql_docs     = nosql_docs
+        self.nosql_allocate = nosql_allocate
+        self.nosql_apply    = nosql_apply
+        self.table          = table
+        self.key            = key        # the table's INTEGER PRIMARY KEY
+        self.batch_size     = batch_size
+        self.interval       = interval
+        self._sync_lock = threading.Lock()   # one pass at a time
+        self._wake      = threading.Event()
+        self._stop      = threading.Event()
+        self._thread    = None
+        self._errors    = deque(maxlen=20)
+        self._staged      = []               # (doc_id, after) not yet in the log
+        self._staged_lock = threading.Lock()
+        self._stats     = {"passes": 0, "applied_to_sql": 0, "applied_to_nosql": 0,
+                           "failed": 0}
+        with pool.writer() as con:
+            create_tables(con)
+
+    # ── Pairing ──────────────────────────────
+    def unpaired(self):
+        """(row ids, doc ids) of records with no partner in _cdc_map."""
+        with self.pool.writer() as con:
+            rows = [r[0] for r in con.execute(
+                f"SELECT {self.key} FROM {self.table} WHERE {self.key} NOT IN "
+                f"(SELECT row_id FROM {MAP}) ORDER BY {self.key}")]
+            paired = {r[0] for r in con.execute(f"SELECT doc_id FROM {MAP}")}
+        docs = sorted(int(i) for i, _ in self.nosql_docs() if int(i) not in paired)
+        return rows, docs
+
+    def reconcile(self, fields) -> dict:
+        """Pair unpaired records whose `fields` values match exactly one
+        unpaired record on the other side. Returns what is still unpaired."""
+        fields = list(fields)
+        paired = 0
+        with self.pool.writer() as con:
+            mapped = {r[0] for r in con.execute(f"SELECT doc_id FROM {MAP}")}
+            docs = {}
+            for doc_id, doc in self.nosql_docs():
+                if int(doc_id) not in mapped:
+                    docs.setdefault(tuple(doc.get(f) for f in fields), []).append(int(doc_id))
+            rows = {}
+            cols = ", ".join(f'"{f}"' for f in fields)
+            for row in con.execute(f"SELECT {self.key}, {cols} FROM {self.table} WHERE "
+                                   f"{self.key} NOT IN (SELECT row_id FROM {MAP})"):
+                rows.setdefault(tuple(row[1:]), []).append(row[0])
+            pairs = [(docs[k][0], ids[0]) for k, ids in rows.items()
+                     if len(ids) == 1 and len(docs.get(k, ())) == 1]
+            con.executemany(f"INSERT INTO {MAP} VALUES (?, ?)", pairs)
+            paired = len(pairs)
+        sql_left, nosql_left = self.unpaired()
+        return {"paired": paired, "unpaired_sql": sql_left, "unpaired_nosql": nosql_left}
+
+    # ── Capture ──────────────────────────────
+    def record_sql(self, con, before_images: list):
+        """Log the after-images of the rows a SQL statement touched. Call on
+        the writer inside the statement's transaction, with its before-images
+        (sql_undo format)."""
+        keys = {}
+        for ch in before_images:
+            if ch["table"] != self.table:
+                continue
+            keys[ch["rowid"]] = None
+            old_key = (ch["row"] or {}).get(self.key)
+            if old_key is not None:
+                keys[old_key] = None       # an UPDATE of the id leaves the old one deleted
+        if not keys:
+            return
+        images, ids = dict.fromkeys(keys), list(keys)
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            for row in con.execute(f"SELECT rowid AS __rowid__, * FROM {self.table} "
+                                   f"WHERE rowid IN ({','.join('?' * len(chunk))})", chunk):
+                images[row["__rowid__"]] = {k: row[k] for k in row.keys()
+                                            if k not in ("__rowid__", self.key)}
+        self._append(con, "sql", images.items())
+
+    def record_nosql(self, changes: list):
+        """Stage (doc_id, before, after) changes of a TinyDB mutation. Call
+        under the TinyDB lock, then flush_nosql() once it is released."""
+        if not changes:
+            return
+        with self._staged_lock:
+            self._staged.extend((doc_id, after) for doc_id, _, after in changes)
+
+    def flush_nosql(self):
+        """Move staged NoSQL changes to the log. Takes the writer, so never
+        call it with the TinyDB lock held."""
+        if self._staged:
+            with self.pool.writer() as con:
+                self._drain(con)
+
+    def _drain(self, con):
+        # Always on the writer, so drained batches reach the log in order
+        with self._staged_lock:
+            staged, self._staged = self._staged, []
+        if not staged:
+            return
+        try:
+            self._append(con, "nosql", staged)
+        except Exception:
+            with self._staged_lock:
+                self._staged[:0] = staged
+            raise
+
+    def _append(self, con, source, images):
+        now = time.time()
+        con.executemany(f"INSERT INTO {LOG} (source, key, doc, ts) VALUES (?, ?, ?, ?)",
+                        ((source, int(k), json.dumps(doc) if doc is not None else None, now)
+                         for k, doc in images))
+        self._wake.set()
+
+    # ── Replay ───────────────────────────────
+    def _doc_of(self, con, row_id):
+        r = con.execute(f"SELECT doc_id FROM {MAP} WHERE row_id = ?", (row_id,)).fetchone()
+        return r[0] if r else None
+
+    def _row_of(self, con, doc_id):
+        r = con.execute(f"SELECT row_id FROM {MAP} WHERE doc_id = ?", (doc_id,)).fetchone()
+        return r[0] if r else None
+
+    def _pending(self, con, entries, checkpoints):
+        """Latest image per record still to apply: ({doc_id: doc}, {row_id: doc})."""
+        latest = {}
+        for seq, source, key, doc in entries:
+            if seq > checkpoints["sql" if source == "nosql" else "nosql"]:
+                latest[(source, key)] = (seq, doc)
+        # Both stores changed one employee: the later entry wins
+        for (source, row_id), (seq, _) in list(latest.items()):
+            if source != "sql":
+                continue
+            doc_id = self._doc_of(con, row_id)
+            other = latest.get(("nosql", doc_id))
+            if other is not None:
+                del latest[("sql", row_id) if other[0] > seq else ("nosql", doc_id)]
+        to_sql, to_nosql = {}, {}
+        for (source, key), (_, doc) in latest.items():
+            (to_sql if source == "nosql" else to_nosql)[key] = (
+                json.loads(doc) if doc is not None else None)
+        return to_sql, to_nosql
+
+    def _apply_sql(self, con, to_sql: dict) -> int:
+        cols = [r[1] for r in con.execute(f"PRAGMA table_info({self.table})") if r[1] != self.key]
+        applied = 0
+        for doc_id, doc in to_sql.items():
+            row_id = self._row_of(con, doc_id)
+            con.execute("SAVEPOINT cdc_apply")
+            try:
+                if doc is None:
+                    if row_id is not None:
+                        con.execute(f"DELETE FROM {self.table} WHERE {self.key} = ?", (row_id,))
+                else:
+                    fields = [c for c in cols if c in doc]
+                    values = [_sql_value(doc[c]) for c in fields]
+                    names = ", ".join(f'"{c}"' for c in fields)
+                    if row_id is None:
+                        cur = con.execute(f"INSERT INTO {self.table} ({names}) VALUES "
+                                          f"({', '.join('?' * len(fields))})", values)
+                        con.execute(f"INSERT INTO {MAP} VALUES (?, ?)", (doc_id, cur.lastrowid))
+                    else:
+                        # Re-creates the row if it is gone from SQLite
+                        sets = ", ".join(f'"{c}" = excluded."{c}"' for c in fields) or \
+                            f"{self.key} = excluded.{self.key}"
+                        con.execute(f"INSERT INTO {self.table} ({self.key}{', ' if fields else ''}"
+                                    f"{names}) VALUES ({', '.join('?' * (len(fields) + 1))}) "
+                                    f"ON CONFLICT({self.key}) DO UPDATE SET {sets}",
+                                    [row_id, *values])
+                con.execute("RELEASE cdc_apply")
+                applied += 1
+            except sqlite3.Error as e:
+                con.execute("ROLLBACK TO cdc_apply")
+                con.execute("RELEASE cdc_apply")
+                self._failed("sql", doc_id, e)
+        return applied
+
+    def _plan_nosql(self, con, to_nosql: dict):
+        """Resolve rows to doc ids, reserving ids (and map entries) for new ones."""
+        new = [row_id for row_id, doc in to_nosql.items()
+               if doc is not None and self._doc_of(con, row_id) is None]
+        if new:
+            con.executemany(f"INSERT INTO {MAP} VALUES (?, ?)",
+                            zip(self.nosql_allocate(len(new)), new))
+        upserts, deletes = {}, []
+        for row_id, doc in to_nosql.items():
+            doc_id = self._doc_of(con, row_id)
+            if doc is not None:
+                upserts[doc_id] = doc
+            elif doc_id is not None:
+                deletes.append(doc_id)
+        return upserts, deletes
+
+    def sync_once(self) -> int:
+        """Apply up to batch_size log entries to both stores. Returns how many
+        entries were consumed (0 = caught up)."""
+        with self._sync_lock:
+            self.flush_nosql()
+            with self.pool.writer() as con:
+                checkpoints = dict(con.execute(f"SELECT target, seq FROM {CHECKPOINT}").fetchall())
+                entries = con.execute(f"SELECT seq, source, key, doc FROM {LOG} WHERE seq > ? "
+                                      "ORDER BY seq LIMIT ?",
+                                      (min(checkpoints.values()), self.batch_size)).fetchall()
+                if not entries:
+                    return 0
+                end = entries[-1][0]
+                if not con.in_transaction:
+                    con.execute("BEGIN")   # savepoints must not commit on release
+                to_sql, to_nosql = self._pending(con, entries, checkpoints)
+                applied_sql = self._apply_sql(con, to_sql)
+                upserts, deletes = self._plan_nosql(con, to_nosql)
+                con.execute(f"UPDATE {CHECKPOINT} SET seq = ? WHERE target = 'sql'", (end,))
+
+            if upserts or deletes:
+                self.nosql_apply(upserts, deletes)
+            with self.pool.writer() as con:
+                con.execute(f"UPDATE {CHECKPOINT} SET seq = ? WHERE target = 'nosql'", (end,))
+                con.execute(f"DELETE FROM {LOG} WHERE seq <= ?", (end,))
+
+            self._stats["passes"] += 1
+            self._stats["applied_to_sql"] += applied_sql
+            self._stats["applied_to_nosql"] += len(upserts) + len(deletes)
+            return len(entries)
+
+    def _failed(self, target, key, error):
+        self._stats["failed"] += 1
+        self._errors.append({"target": target, "key": key, "error": str(error),
+                             "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    # ── Worker ───────────────────────────────
+    def start(self):
+        """Catch up synchronously (ids reserved before a restart are written
+        before anything can reuse them), then sync in the background.
+        Raises UnpairedRecords while a record has no partner."""
+        sql_left, nosql_left = self.unpaired()
+        if sql_left or nosql_left:
+            raise UnpairedRecords(
+                f"{len(sql_left)} SQLite row(s) and {len(nosql_left)} TinyDB document(s) "
+                "have no partner; reconcile the stores before enabling the change feed")
+        while self.sync_once():
+            pass
+        self._thread = threading.Thread(target=self._run, name="cdc-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while not self._stop.is_set() and self.sync_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                self._failed(None, None, e)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush_nosql()
+
+    def stats(self) -> dict:
+        with self.pool.writer() as con:
+            checkpoints = dict(con.execute(f"SELECT target, seq FROM {CHECKPOINT}").fetchall())
+            head = con.execute(f"SELECT coalesce(max(seq), 0) FROM {LOG}").fetchone()[0]
+        head = max(head, *checkpoints.values())
+        return {**self._stats, "head": head, "checkpoints": checkpoints,
+                "staged": len(self._staged),
+                "lag": head - min(checkpoints.values()), "recent_errors": list(self._errors)}
@@ -0,0 +1,467 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from nosql_bulk import write_docs
+from predicates import compile_filter
+
+# ─────────────────────────────────────────────────
+# Columnar in-memory engine for the NoSQL collection
+# ─────────────────────────────────────────────────
+# Documents are held as typed columns instead of a list of dicts:
+#   numeric fields     → float64 values + uint8 kind (missing/int/float/irregular)
+#   categorical fields → int32 codes into a per-field category list
+#   everything else    → a small per-row dict ("rest")
+# A row's original key order is kept as an interned layout tuple, so
+# reconstructed documents are identical (values, types and key order) to what
+# TinyDB returns.
+#
+# Filters are evaluated as vectorized boolean masks. Anything the vectorized
+# path can't express exactly (irregular values such as bools or huge ints in a
+# numeric column, exotic operators) falls back to the shared compiled
+# predicate for just those rows, so results always match the row engine.
+
+_M = object()
+_MISSING, _INT, _FLOAT, _IRREGULAR = 0, 1, 2, 3
+_CODE_MISSING, _CODE_IRREGULAR = -1, -2
+_MAX_EXACT_INT = 2 ** 53
+_VEC_OPS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists"}
+_NUM_TYPES = (int, float, bool)
+
+
+def _is_num_bound(v) -> bool:
+    """Numbers that survive the trip through float64 unchanged."""
+    if type(v) is int:
+        return -_MAX_EXACT_INT <= v <= _MAX_EXACT_INT
+    return type(v) in _NUM_TYPES
+
+
+class ColumnarCollection:
+    def __init__(self, numeric=(), categorical=(), capacity: int = 1024):
+        self.numeric     = tuple(numeric)
+        self.categorical = tuple(categorical)
+        self.n           = 0
+        self.dead        = 0
+        self.next_id     = 1
+        self.ids   = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.kinds = {f: np.zeros(capacity, dtype=np.uint8) for f in self.numeric}
+        self.vals  = {f: np.zeros(capacity, dtype=np.float64) for f in self.numeric}
+        self.codes = {f: np.full(capacity, _CODE_MISSING, dtype=np.int32) for f in self.categorical}
+        self.categories = {f: [] for f in self.categorical}
+        self._cat_index = {f: {} for f in self.categorical}
+        self.rest    = []                      # per-row dict of remaining/irregular fields
+        self.layout  = np.zeros(capacity, dtype=np.int32)
+        self.layouts = []                      # interned key-order tuples
+        self._layout_index = {}
+
+    @classmethod
+    def from_docs(cls, docs, numeric=(), categorical=()):
+        """docs: iterable of (doc_id, doc), in table order."""
+        col = cls(numeric, categorical)
+        for doc_id, doc in docs:
+            col._append(doc_id, doc)
+        if col.n > 1 and np.any(np.diff(col.ids[:col.n]) <= 0):
+            col._compact()   # lookups by doc_id need ascending ids
+        return col
+
+    # ── storage ───────────────────────────────
+    def _grow(self):
+        cap = max(1024, len(self.ids) * 2)
+
+        def grow(arr, fill=0):
+            out = np.full(cap, fill, dtype=arr.dtype)
+            out[:self.n] = arr[:self.n]
+            return out
+        self.ids, self.alive, self.layout = grow(self.ids), grow(self.alive), grow(self.layout)
+        for f in self.numeric:
+            self.kinds[f], self.vals[f] = grow(self.kinds[f]), grow(self.vals[f])
+        for f in self.categorical:
+            self.codes[f] = grow(self.codes[f], _CODE_MISSING)
+
+    def _append(self, doc_id, doc):
+        if self.n == len(self.ids):
+            self._grow()
+        row = self.n
+        self.n += 1
+        self.ids[row] = doc_id
+        self.rest.append({})
+        self._write_row(row, doc)
+        self.next_id = max(self.next_id, int(doc_id) + 1)
+        return row
+
+    def _write_row(self, row, doc):
+        self.alive[row] = True
+        rest = {}
+        for f in self.numeric:
+            v = doc.get(f, _M)
+            if v is _M:
+                kind = _MISSING
+            elif type(v) is int and -_MAX_EXACT_INT <= v <= _MAX_EXACT_INT:
+                kind = _INT
+            elif type(v) is float:
+                kind = _FLOAT
+            else:
+                kind, rest[f] = _IRREGULAR, v
+            self.kinds[f][row] = kind
+            self.vals[f][row] = v if kind in (_INT, _FLOAT) else 0.0
+        for f in self.categorical:
+            v = doc.get(f, _M)
+            if v is _M:
+                code = _CODE_MISSING
+            elif type(v) is str:
+                code = self._cat_index[f].get(v)
+                if code is None:
+                    code = self._cat_index[f][v] = len(self.categories[f])
+                    self.categories[f].append(v)
+            else:
+                code, rest[f] = _CODE_IRREGULAR, v
+            self.codes[f][row] = code
+        columns = self.kinds.keys() | self.codes.keys()
+        for k, v in doc.items():
+            if k not in columns:
+                rest[k] = v
+        self.rest[row] = rest
+        keys = tuple(doc.keys())
+        li = self._layout_index.get(keys)
+        if li is None:
+            li = self._layout_index[keys] = len(self.layouts)
+            self.layouts.append(keys)
+        self.layout[row] = li
+
+    def _value(self, row, field):
+        kinds = self.kinds.get(field)
+        if kinds is not None:
+            kind = kinds[row]
+            if kind == _INT:
+                return int(self.vals[field][row])
+            if kind == _FLOAT:
+                return float(self.vals[field][row])
+            return self.rest[row].get(field, _M)
+        codes = self.codes.get(field)
+        if codes is not None and codes[row] >= 0:
+            return self.categories[field][codes[row]]
+        return self.rest[row].get(field, _M)
+
+    def doc(self, row) -> dict:
+        return {k: self._value(row, k) for k in self.layouts[self.layout[row]]}
+
+    def _row_of(self, doc_id):
+        i = int(np.searchsorted(self.ids[:self.n], doc_id))
+        if i < self.n and self.ids[i] == doc_id and self.alive[i]:
+            return i
+        return None
+
+    # ── filtering ─────────────────────────────
+    def _rowwise(self, field, spec, rows=None):
+        """Exact fallback: the compiled predicate applied per row."""
+        pred = compile_filter({field: spec})
+        n = self.n
+        if pred is None:
+            return np.ones(n, dtype=bool)
+        if rows is None:
+            rows = range(n)
+            out = np.zeros(n, dtype=bool)
+        else:
+            out = None
+        results = []
+        for r in rows:
+            v = self._value(r, field)
+            results.append(pred({} if v is _M else {field: v}))
+        if out is None:
+            return results
+        out[:] = results
+        return out
+
+    def _numeric_mask(self, field, spec):
+        kinds = self.kinds[field][:self.n]
+        vals  = self.vals[field][:self.n]
+        if not isinstance(spec, dict):
+            spec = {"$eq": spec}
+        elif not any(k.startswith("$") for k in spec):
+            return self._rowwise(field, spec)
+        ops = {k: v for k, v in spec.items() if k.startswith("$")}
+        vectorizable = all(
+            op in _VEC_OPS and (
+                op == "$exists" or
+                (op in ("$in", "$nin") and isinstance(val, list)
+                 and all(type(x) in (str, type(None)) or _is_num_bound(x) for x in val)) or
+                _is_num_bound(val))
+            for op, val in ops.items())
+        if not vectorizable:
+            return self._rowwise(field, spec)
+
+        present = (kinds == _INT) | (kinds == _FLOAT)
+        mask = present.copy()
+        for op, val in ops.items():
+            if op == "$exists":
+                if not val:
+                    mask[:] = False
+                continue
+            if op in ("$in", "$nin"):
+                members = np.array([float(x) for x in val if type(x) in _NUM_TYPES], dtype=np.float64)
+                hit = np.isin(vals, members) & present
+                mask &= hit if op == "$in" else ~hit
+                continue
+            b = float(val)
+            if   op == "$eq":  mask &= vals == b
+            elif op == "$ne":  mask &= vals != b
+            elif op == "$gt":  mask &= vals > b
+            elif op == "$gte": mask &= vals >= b
+            elif op == "$lt":  mask &= vals < b
+            elif op == "$lte": mask &= vals <= b
+        # Missing rows: one predicate evaluation decides them all
+        pred = compile_filter({field: spec})
+        missing_ok = True if pred is None else pred({})
+        mask[kinds == _MISSING] = missing_ok
+        irregular = np.flatnonzero(kinds == _IRREGULAR)
+        if irregular.size:
+            mask[irregular] = self._rowwise(field, spec, irregular)
+        return mask
+
+    def _categorical_mask(self, field, spec):
+        pred = compile_filter({field: spec})
+        if pred is None:
+            return np.ones(self.n, dtype=bool)
+        codes = self.codes[field][:self.n]
+        # Evaluate once per distinct category, then gather by code; the two
+        # trailing slots are hit by codes -2 (irregular) and -1 (missing).
+        lut = np.array([pred({field: c}) for c in self.categories[field]] + [False, pred({})],
+                       dtype=bool)
+        mask = lut[codes]
+        irregular = np.flatnonzero(codes == _CODE_IRREGULAR)
+        if irregular.size:
+            mask[irregular] = self._rowwise(field, spec, irregular)
+        return mask
+
+    def _field_mask(self, field, spec):
+        if field in self.kinds:
+            return self._numeric_mask(field, spec)
+        if field in self.codes:
+            return self._categorical_mask(field, spec)
+        return self._rowwise(field, spec)
+
+    def _mask(self, flt):
+        """Mask for a filter dict, or None when it constrains nothing
+        (mirrors predicates._Compiler.filter)."""
+        mask = None
+
+        def both(a, b):
+            return b if a is None else (a if b is None else a & b)
+        for key, spec in flt.items():
+            if key in ("$and", "$or", "$nor") and isinstance(spec, list):
+                subs = [self._mask(s) if isinstance(s, dict) else None for s in spec]
+                if key == "$and":
+                    for s in subs:
+                        mask = both(mask, s)
+                elif subs and all(s is not None for s in subs):
+                    any_ = np.logical_or.reduce(subs)
+                    mask = both(mask, any_ if key == "$or" else ~any_)
+                elif subs and key == "$nor":
+                    mask = both(mask, np.zeros(self.n, dtype=bool))
+            elif compile_filter({key: spec}) is not None:
+                mask = both(mask, self._field_mask(key, spec))
+        return mask
+
+    def find_rows(self, flt: dict) -> np.ndarray:
+        alive = self.alive[:self.n]
+        mask = self._mask(flt) if flt else None
+        return np.flatnonzero(alive if mask is None else alive & mask)
+
+    def find(self, flt: dict):
+        """Matching documents (as dicts, table order) and their doc ids."""
+        rows = self.find_rows(flt)
+        return [self.doc(r) for r in rows], [int(self.ids[r]) for r in rows]
+
+    # ── mutations (return snapshot + (doc_id, before, after) changes) ──
+    def insert(self, doc: dict):
+        doc_id = self.next_id
+        self._append(doc_id, dict(doc))
+        return doc_id, [(doc_id, None, dict(doc))]
+
+    def update(self, flt: dict, update_fn):
+        snapshot, changes = [], []
+        for r in self.find_rows(flt):
+            doc_id = int(self.ids[r])
+            before = self.doc(r)
+            after  = update_fn(dict(before))
+            self._write_row(r, after)
+            snapshot.append(before | {"__doc_id__": doc_id})
+            changes.append((doc_id, before, after))
+        return snapshot, changes
+
+    def delete(self, flt: dict):
+        return self._delete_rows(self.find_rows(flt))
+
+    def delete_ids(self, doc_ids):
+        rows = (self._row_of(doc_id) for doc_id in doc_ids)
+        return self._delete_rows([r for r in rows if r is not None])
+
+    def _delete_rows(self, rows):
+        snapshot, changes = [], []
+        for r in rows:
+            doc_id = int(self.ids[r])
+            before = self.doc(r)
+            self.alive[r] = False
+            self.rest[r] = {}
+            self.dead += 1
+            snapshot.append(before | {"__doc_id__": doc_id})
+            changes.append((doc_id, before, None))
+        if self.dead > 1024 and self.dead * 4 > self.n:
+            self._compact()
+        return snapshot, changes
+
+    def restore(self, snapshot):
+        changes, appended = [], False
+        for saved in snapshot:
+            doc_id = saved.get("__doc_id__")
+            if doc_id is None:
+                continue
+            doc = {k: v for k, v in saved.items() if k != "__doc_id__"}
+            r = self._row_of(doc_id)
+            if r is not None:
+                before = self.doc(r)
+                self._write_row(r, doc)
+            else:
+                before = None
+                self._append(doc_id, doc)
+                appended = True
+            changes.append((int(doc_id), before, dict(doc)))
+        if appended:
+            self._compact()   # drops tombstones and restores doc_id order
+        return changes
+
+    def _compact(self):
+        rows = np.flatnonzero(self.alive[:self.n])
+        rows = rows[np.argsort(self.ids[rows], kind="stable")]
+        m = len(rows)
+        self.ids[:m], self.alive[:m] = self.ids[rows], True
+        self.alive[m:self.n] = False
+        self.layout[:m] = self.layout[rows]
+        for f in self.numeric:
+            self.kinds[f][:m], self.vals[f][:m] = self.kinds[f][rows], self.vals[f][rows]
+        for f in self.categorical:
+            self.codes[f][:m] = self.codes[f][rows]
+        self.rest = [self.rest[r] for r in rows]
+        self.n, self.dead = m, 0
+
+    def __len__(self):
+        return self.n - self.dead
+
+    def stats(self) -> dict:
+        nbytes = self.ids.nbytes + self.alive.nbytes + self.layout.nbytes
+        nbytes += sum(a.nbytes for a in self.kinds.values())
+        nbytes += sum(a.nbytes for a in self.vals.values())
+        nbytes += sum(a.nbytes for a in self.codes.values())
+        return {
+            "documents": len(self), "rows": self.n, "tombstones": self.dead,
+            "numeric_columns": list(self.numeric),
+            "categorical_columns": {f: len(c) for f, c in self.categories.items()},
+            "layouts": len(self.layouts), "column_bytes": nbytes,
+        }
+
+
+class WriteBehind:
+    """Persists columnar-engine changes to the TinyDB file on a background
+    thread. Pending change lists are coalesced and written with one
+    write_docs() call per batch. A failed batch is kept (merged by doc_id
+    under newer changes) and retried with the next one, or after
+    `retry_interval` seconds when nothing new arrives."""
+
+    def __init__(self, table, max_pending: int = 10000, linger: float = 0.05,
+                 retry_interval: float = 1.0):
+        self.table   = table
+        self.linger  = linger
+        self.retry_interval = retry_interval
+        self._queue  = queue.Queue(maxsize=max_pending)
+        self._lock   = threading.Lock()   # guards the TinyDB table object
+        self._retry  = {}                 # doc_id -> after, of batches whose write failed
+        self.batches = self.written = self.errors = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="nosql-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, changes):
+        if changes:
+            self._queue.put(changes)   # blocks when max_pending batches are queued
+
+    def sync(self, timeout: float = None) -> bool:
+        """Wait until everything submitted so far has been written (or has
+        failed and is kept for retry: see stats()["pending_retry"])."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.retry_interval if self._retry else None)
+            except queue.Empty:
+                self._flush([])
+                continue
+            if first is None:
+                self._last_flush([])
+                return
+            batch, waiters, stop = [], [], False
+            (waiters if isinstance(first, threading.Event) else batch).append(first)
+            if batch:
+                time.sleep(self.linger)   # let a burst of mutations coalesce
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                (waiters if isinstance(item, threading.Event) else batch).append(item)
+            if stop:
+                self._last_flush(batch)
+            else:
+                self._flush(batch)
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+
+    def _last_flush(self, batch):
+        """On close: one more attempt if the write fails, instead of waiting
+        out retry_interval for a batch that would otherwise be lost."""
+        self._flush(batch)
+        if self._retry:
+            self._flush([])
+        if self._retry:
+            print(f"  [Columnar] Write-behind closed with {len(self._retry)} docs unwritten")
+
+    def _flush(self, batch):
+        latest = self._retry
+        for changes in batch:
+            for doc_id, _, after in changes:
+                latest[doc_id] = after
+        if not latest:
+            return
+
+        try:
+            with self._lock:
+                write_docs(self.table, latest)
+        except Exception as e:
+            self._retry = latest
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"  [Columnar] Write-behind flush failed ({len(latest)} docs pending): {e}")
+            return
+        self._retry = {}
+        self.batches += 1
+        self.written += len(latest)
+
+    def close(self):
+        """Flush everything still queued, then stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return {"pending_batches": self._queue.qsize(), "flushed_batches": self.batches,
+                "documents_written": self.written, "pending_retry": len(self._retry),
+                "errors": self.errors, "last_error": self.last_error}
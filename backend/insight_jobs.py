@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+
+# ─────────────────────────────────────────────────
+# Deferred insight generation  (bounded queue + worker pool)
+# ─────────────────────────────────────────────────
+class InsightJobQueue:
+    """In-process job queue that runs insight generation off the request path.
+
+    `handler` is an async callable (sample, count, prompt) -> str. Jobs are
+    kept for `ttl` seconds (at most `max_jobs` of them) so clients can poll or
+    stream the result after the query response has already been sent. Each
+    handler runs in a copy of the submitting request's context (contextvars).
+    """
+
+    def __init__(self, handler, workers: int = 4, max_queue: int = 256,
+                 max_jobs: int = 2048, ttl: float = 900.0):
+        self.handler   = handler
+        self.workers   = workers
+        self.max_queue = max_queue
+        self.max_jobs  = max_jobs
+        self.ttl       = ttl
+        self._queue    = None
+        self._loop     = None
+        self._tasks    = []
+        self._jobs     = OrderedDict()   # job_id -> job dict
+        self._events   = {}              # job_id -> asyncio.Event (set when finished)
+        self._seq      = itertools.count(1)
+        self.submitted = self.completed = self.failed = self.rejected = 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # First use, or the app was restarted on a new event loop
+            self._loop  = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = []
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            # Workers outlive the request that started them: give them a
+            # clean context rather than that request's
+            self._tasks.append(contextvars.Context().run(asyncio.create_task, self._worker()))
+
+    def submit(self, sample: list, count: int, prompt: str):
+        """Queue a job; returns its id, or None when the queue is full."""
+        self._ensure_workers()
+        self._expire()
+        job_id = f"{next(self._seq)}-{uuid.uuid4().hex[:8]}"
+        job = {"id": job_id, "status": "queued", "insights": None, "error": None,
+               "created": time.time(), "finished": None}
+        try:
+            self._queue.put_nowait((job_id, sample, count, prompt, contextvars.copy_context()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+        self._jobs[job_id]   = job
+        self._events[job_id] = asyncio.Event()
+        self.submitted += 1
+        return job_id
+
+    def get(self, job_id: str):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id: str, timeout: float = None):
+        """Wait until the job finishes (or timeout) and return its state."""
+        event = self._events.get(job_id)
+        if event is None:
+            return self.get(job_id)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id, sample, count, prompt, ctx = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job["status"] = "running"
+                job["insights"] = await ctx.run(asyncio.ensure_future,
+                                                self.handler(sample, count, prompt))
+                job["status"] = "done"
+                self.completed += 1
+            except Exception as e:
+                job["status"], job["error"] = "failed", str(e)
+                self.failed += 1
+            finally:
+                if job is not None:
+                    job["finished"] = time.time()
+                event = self._events.get(job_id)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._jobs:
+            job_id, job = next(iter(self._jobs.items()))
+            too_many = len(self._jobs) >= self.max_jobs
+            expired  = job["finished"] is not None and job["finished"] < cutoff
+            if not (too_many or expired):
+                break
+            self._jobs.popitem(last=False)
+            event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()   # release any waiter on an evicted job
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": len([t for t in self._tasks if not t.done()]),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue, "jobs_tracked": len(self._jobs),
+            "submitted": self.submitted, "completed": self.completed,
+            "failed": self.failed, "rejected": self.rejected,
+        }
@@ -0,0 +1,450 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:      # Windows
+    fcntl = None
+    import msvcrt
+
+# ─────────────────────────────────────────────────
+# Append-only, log-structured document store  (no TinyDB dependency)
+# ─────────────────────────────────────────────────
+# Data lives in two files:
+#   <path>      base snapshot in TinyDB's JSON format {"table": {"id": doc}}
+#   <path>.log  changes since that snapshot, one JSON record per line:
+#                 {"table": t, "put": {"id": doc, ...}, "delete": ["id", ...]}
+#                 {"table": t, "replace": {"id": doc, ...}}   (whole table)
+#                 {"drop": t}
+# A write appends (and fsyncs) one line, so its cost is the size of the change,
+# not of the collection. Everything is also held in memory, plus a doc_id →
+# (log offset, bytes) map of the log records that are still current; bytes of
+# superseded records are garbage. Once garbage passes `compact_ratio` of both
+# files together, a background thread writes a new base and keeps only the log
+# records appended meanwhile.
+#
+# Crash safety:
+#   - a torn last line (crash mid-append) is dropped when the log is loaded
+#   - new files are written to a temp file, fsynced, then renamed into place
+#   - compaction renames the new base before the log is cut; a crash between
+#     the two replays the old log over the new base, which is harmless since
+#     every record carries absolute document images
+# Processes sharing the files (the API and the Streamlit app) serialize
+# appends, reloads and compaction on an OS file lock on `<path>.lock`; a
+# compaction that finds the files compacted by someone else meanwhile gives up.
+# Tools that only read (show_data.py, populate_sqlite.py) use read_tables()
+# or overlay().
+
+LOG_SUFFIX  = ".log"
+LOCK_SUFFIX = ".lock"
+
+_WRITE_CHUNK = 10_000   # documents serialized per write() when dumping a base
+
+
+def log_path(path: str) -> str:
+    return path + LOG_SUFFIX
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)   # gives up after ~10 s
+            return
+        except OSError:
+            pass
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return                    # e.g. Windows: directories can't be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _temp_beside(path, suffix):
+    return tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                            prefix=".tmp-", suffix=suffix)
+
+
+def _dump_base(path, tables) -> str:
+    """Write tables in TinyDB's JSON layout to a fsynced temp file next to
+    `path`; returns the temp file's path (the caller renames it)."""
+    fd, tmp_path = _temp_beside(path, ".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("{")
+            for i, (name, docs) in enumerate(tables.items()):
+                f.write(f"{', ' if i else ''}{json.dumps(name)}: {{")
+                items = list(docs.items())
+                for j in range(0, len(items), _WRITE_CHUNK):
+                    f.write((", " if j else "") + ", ".join(
+                        f"{json.dumps(k)}: {json.dumps(v)}" for k, v in items[j:j + _WRITE_CHUNK]))
+                f.write("}")
+            f.write("}")
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_base(path) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    return json.loads(raw) if raw.strip() else {}
+
+
+def _records(path, start: int = 0):
+    """Yield (offset, length, record) from byte `start`. A torn last line ends
+    the iteration; the generator returns the offset where valid data ends."""
+    if not os.path.exists(path):
+        return start
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("unterminated record")
+                record = json.loads(line)
+            except ValueError:
+                if f.read(1):
+                    raise ValueError(f"Corrupt change log {path} at byte {offset}")
+                return offset             # the last append never completed
+            yield offset, len(line), record
+            offset += len(line)
+        return offset
+
+
+def _apply(tables: dict, record: dict):
+    if "drop" in record:
+        tables.pop(record["drop"], None)
+        return
+    name = record["table"]
+    if "replace" in record:
+        tables[name] = dict(record["replace"])
+        return
+    docs = tables.setdefault(name, {})
+    last = next(reversed(docs), None)
+    reorder = False
+    for doc_id, doc in record.get("put", {}).items():
+        if last is not None and doc_id not in docs and int(doc_id) < int(last):
+            reorder = True        # re-created document: keep doc_id order
+        docs[doc_id] = doc
+    for doc_id in record.get("delete", ()):
+        docs.pop(doc_id, None)
+    if reorder:
+        tables[name] = dict(sorted(docs.items(), key=lambda kv: int(kv[0])))
+
+
+def read_tables(path: str) -> dict:
+    """Current data (base + log) as {"table": {"id": doc}}; read-only."""
+    tables = _read_base(path)
+    for _, _, record in _records(log_path(path)):
+        _apply(tables, record)
+    return tables
+
+
+def overlay(path: str, table: str):
+    """Net effect of the log on one table, for streaming readers of the base:
+    (replaced, docs) where docs maps "id" → doc or None (deleted), and
+    replaced means the base's copy of the table is obsolete altogether."""
+    replaced, docs = False, {}
+    for _, _, record in _records(log_path(path)):
+        if record.get("drop") == table:
+            replaced, docs = True, {}
+        elif record.get("table") == table:
+            if "replace" in record:
+                replaced, docs = True, dict(record["replace"])
+            else:
+                docs.update(record.get("put", {}))
+                docs.update(dict.fromkeys(record.get("delete", ())))
+    if replaced:
+        docs = {k: v for k, v in docs.items() if v is not None}
+    return replaced, docs
+
+
+def fold(path: str):
+    """Merge a leftover log into the base file and delete the log."""
+    if os.path.exists(log_path(path)):
+        store = LogStore(path, compact_ratio=None)
+        store.compact()
+        store.close()
+        os.remove(log_path(path))
+
+
+class LogStore:
+    def __init__(self, path: str, compact_ratio: float | None = 0.5,
+                 compact_min_bytes: int = 4 << 20, sync: bool = True):
+        self.path              = path
+        self.log_path          = log_path(path)
+        self.compact_ratio     = compact_ratio      # None = never in the background
+        self.compact_min_bytes = compact_min_bytes
+        self.sync              = sync               # fsync every append
+        self._lock      = threading.RLock()
+        self._flock     = open(path + LOCK_SUFFIX, "a+b")
+        self._held      = 0             # _exclusive() nesting depth
+        self._compactor = None
+        self._log       = None
+        self._handed    = {}            # table copies returned by the last read()
+        self.generation = 0             # bumped when another process's writes are picked up
+        self.appends = self.compactions = 0
+        with self._exclusive():
+            if not os.path.exists(path):
+                os.replace(_dump_base(path, {}), path)
+            self._load()
+
+    @contextmanager
+    def _exclusive(self):
+        """This thread, and this process, own the files (re-entrant)."""
+        with self._lock:
+            if not self._held:
+                _lock_file(self._flock)
+            self._held += 1
+            try:
+                yield
+            finally:
+                self._held -= 1
+                if not self._held:
+                    _unlock_file(self._flock)
+
+    # ── loading / accounting ─────────────────
+    def _signature(self):
+        base = os.stat(self.path)
+        try:
+            log = os.stat(self.log_path)
+            log = (log.st_ino, log.st_size)
+        except FileNotFoundError:
+            log = (None, 0)
+        return (base.st_ino, base.st_size, base.st_mtime_ns), log
+
+    def _load(self):
+        self.tables = _read_base(self.path)
+        self._reset_accounting(os.path.getsize(self.path), self.tables)
+        self._known = dict(self.tables)     # table dicts as last persisted
+        records = _records(self.log_path)
+        while True:
+            try:
+                offset, length, record = next(records)
+            except StopIteration as end:
+                valid = end.value
+                break
+            self._replay(record, offset, length)
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > valid:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(valid)           # drop the torn tail for good
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, "ab")
+        self._base_sig, (self._log_ino, self._log_bytes) = self._signature()
+
+    def _reset_accounting(self, base_bytes, tables):
+        """Documents missing from the offset map live in the base (or in a
+        replace record) at their table's average size."""
+        docs = sum(len(d) for d in tables.values())
+        avg = base_bytes / docs if docs else 0
+        self._base_bytes = base_bytes
+        self._offsets = {t: {} for t in tables}
+        self._avg     = {t: avg for t in tables}
+        self._live    = {t: avg * len(d) for t, d in tables.items()}
+
+    def _account(self, tables, record, offset, length):
+        """Live-byte bookkeeping for `record`, before it is applied to `tables`."""
+        if "drop" in record:
+            for counters in (self._offsets, self._avg, self._live):
+                counters.pop(record["drop"], None)
+            return
+        name = record["table"]
+        if "replace" in record:
+            docs = record["replace"]
+            self._offsets[name] = {}
+            self._avg[name] = length / len(docs) if docs else 0
+            self._live[name] = length if docs else 0
+            return
+        offsets = self._offsets.setdefault(name, {})
+        current = tables.get(name, {})
+        put, delete = record.get("put", {}), record.get("delete", ())
+        size = length / ((len(put) + len(delete)) or 1)
+        live = self._live.get(name, 0)
+        for doc_id in (*put, *delete):
+            old = offsets.pop(doc_id, None)
+            if old is not None:
+                live -= old[1]
+            elif doc_id in current:
+                live -= self._avg.get(name, 0)
+        for doc_id in put:
+            offsets[doc_id] = (offset, size)
+            live += size
+        self._live[name] = live
+
+    def _replay(self, record, offset, length):
+        self._account(self.tables, record, offset, length)
+        _apply(self.tables, record)
+        name = record.get("table", record.get("drop"))
+        if name in self.tables:
+            self._known[name] = self.tables[name]
+        else:
+            self._known.pop(name, None)
+
+    def _refresh(self):
+        """Pick up files changed by another process (a stat call otherwise)."""
+        base_sig, (log_ino, log_size) = self._signature()
+        if base_sig != self._base_sig or log_ino != self._log_ino or log_size < self._log_bytes:
+            self._load()
+            self.generation += 1
+        elif log_size > self._log_bytes:
+            for offset, length, record in _records(self.log_path, self._log_bytes):
+                self._replay(record, offset, length)
+                self._log_bytes = offset + length
+            self.generation += 1
+
+    def refresh(self) -> int:
+        """Pick up other processes' writes now; returns `generation`. Anything
+        derived from the data (indexes, caches) is stale once it changes."""
+        with self._exclusive():
+            self._refresh()
+            return self.generation
+
+    # ── reads / writes ───────────────────────
+    def read(self) -> dict:
+        """A snapshot: each table is a shallow copy, so later writes and
+        replays never change what the caller holds."""
+        with self._exclusive():
+            self._refresh()
+            self._handed = {name: dict(docs) for name, docs in self.tables.items()}
+            return dict(self._handed)
+
+    def write_docs(self, table: str, docs: dict):
+        """Persist {"id": doc or None (= delete)} for one table."""
+        self._append({"table": table,
+                      "put": {k: v for k, v in docs.items() if v is not None},
+                      "delete": [k for k, v in docs.items() if v is None]})
+
+    def write(self, tables: dict):
+        """Whole-database write (TinyDB's generic path): every table whose
+        dict was swapped since read() and differs from the stored one is
+        logged in full."""
+        with self._exclusive():
+            for name in [t for t in self._known if t not in tables]:
+                self._append({"drop": name})
+            for name, docs in list(tables.items()):
+                if docs is self._handed.get(name) or docs is self._known.get(name):
+                    continue
+                if docs != self.tables.get(name):
+                    self._append({"table": name, "replace": docs})
+
+    def _append(self, record):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._exclusive():
+            self._refresh()
+            self._log.write(line)
+            self._log.flush()
+            if self.sync:
+                os.fsync(self._log.fileno())
+            self._replay(record, self._log_bytes, len(line))
+            self._log_bytes += len(line)
+            self._log_ino = os.fstat(self._log.fileno()).st_ino
+            self.appends += 1
+            if self._should_compact():
+                self._compactor = threading.Thread(target=self._compact_quietly,
+                                                   name="nosql-compact", daemon=True)
+                self._compactor.start()
+
+    # ── compaction ───────────────────────────
+    def garbage_ratio(self) -> float:
+        total = self._base_bytes + self._log_bytes
+        return min(1.0, max(0.0, 1 - sum(self._live.values()) / total)) if total else 0.0
+
+    def _should_compact(self):
+        return (self.compact_ratio is not None
+                and (self._compactor is None or not self._compactor.is_alive())
+                and self._base_bytes + self._log_bytes >= self.compact_min_bytes
+                and self.garbage_ratio() > self.compact_ratio)
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"  [LogStore] Compaction failed: {e}")
+
+    def compact(self):
+        """Write the current data as the new base and cut the log down to the
+        records appended while doing so."""
+        with self._exclusive():
+            self._refresh()
+            tables = {name: dict(docs) for name, docs in self.tables.items()}
+            upto, files = self._log_bytes, (self._base_sig, self._log_ino)
+        # Writers swap documents, never edit them in place: the copy is stable
+        tmp_base = _dump_base(self.path, tables)
+        with self._exclusive():
+            self._refresh()                     # appends by other processes meanwhile
+            if (self._base_sig, self._log_ino) != files:
+                os.remove(tmp_base)             # another process compacted first
+                return
+            os.replace(tmp_base, self.path)
+            _fsync_dir(self.path)
+            with open(self.log_path, "rb") as f:
+                f.seek(upto)
+                tail = f.read(self._log_bytes - upto)
+            self._log.close()                   # Windows can't replace an open file
+            fd, tmp_log = _temp_beside(self.path, ".log")
+            with os.fdopen(fd, "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_log, self.log_path)
+            _fsync_dir(self.log_path)
+            self._log = open(self.log_path, "ab")
+            # Offsets restart with the new files: the snapshot is the base and
+            # the kept tail is re-accounted on top of it
+            self._reset_accounting(os.path.getsize(self.path), tables)
+            offset = 0
+            for line in tail.splitlines(keepends=True):
+                record = json.loads(line)
+                self._account(tables, record, offset, len(line))
+                _apply(tables, record)
+                offset += len(line)
+            self._base_sig, (self._log_ino, self._log_bytes) = self._signature()
+            self.compactions += 1
+
+    def close(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self._flock.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"base_bytes": self._base_bytes, "log_bytes": self._log_bytes,
+                    "garbage_ratio": round(self.garbage_ratio(), 4),
+                    "log_documents": sum(len(o) for o in self._offsets.values()),
+                    "appends": self.appends, "compactions": self.compactions,
+                    "compacting": self._compactor is not None and self._compactor.is_alive()}
@@ -1,31 +1,213 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import litellm
+import asyncio
+import contextvars
+import functools
 import json
 import os
+import secrets
 import sqlite3
 import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import speech_recognition as sr
 import shutil
+import sys
 # import pandas as pd # Removed for zero-dependency
 
 # TinyDB — embedded NoSQL (no server needed)
-from tinydb import TinyDB, Query as TinyQuery
+from tinydb import TinyDB
 
 # ─────────────────────────────────────────────────
 # CONFIG
 # ─────────────────────────────────────────────────
+# Data file paths can be overridden from the environment (NLQ_SQLITE_DB,
+# NLQ_TINYDB, NLQ_AUDIT_LOG, NLQ_AUDIT_SNAPSHOTS), e.g. by bench/serve.py
 MODEL_NAME         = "ollama/minimax-m2:cloud"
 ANALYST_MODEL_NAME = "ollama/minimax-m2:cloud"
-AUDIT_LOG_FILE     = "audit_log.json"
+AUDIT_LOG_FILE     = os.environ.get("NLQ_AUDIT_LOG", "audit_log.json")
+
+# Audit: recent entries kept in memory; undo snapshots spilled to this file
+AUDIT_MEMORY_SIZE   = 10000
+AUDIT_SNAPSHOT_FILE = os.environ.get("NLQ_AUDIT_SNAPSHOTS", "audit_snapshots.jsonl")
+# Audit file group commit: flush every N entries or T seconds; queue bound,
+# and how long write() waits on a full queue before writing synchronously
+AUDIT_FLUSH_BATCH    = 256
+AUDIT_FLUSH_INTERVAL = 0.2
+AUDIT_QUEUE_SIZE     = 10000
+AUDIT_QUEUE_WAIT     = 1.0
 
 BASE_DIR       = os.path.dirname(__file__)
-SQLITE_DB_PATH = os.path.join(BASE_DIR, "company_sql.db")
-TINYDB_PATH    = os.path.join(BASE_DIR, "company_nosql.json")
+SQLITE_DB_PATH = os.environ.get("NLQ_SQLITE_DB", os.path.join(BASE_DIR, "company_sql.db"))
+TINYDB_PATH    = os.environ.get("NLQ_TINYDB", os.path.join(BASE_DIR, "company_nosql.json"))
+
+# NL → query cache sizing (entries / seconds)
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL  = 3600
+
+# Threads reserved for blocking TinyDB / SQLite work off the event loop
+DB_WORKERS = 8
+
+# SQLite pool: one WAL writer + read-only readers, one per DB worker plus
+# SQL_STREAM_READERS for NDJSON streams (which hold theirs between batches).
+# A reader checkout gives up after SQLITE_READER_TIMEOUT s: HTTP 503
+SQL_STREAM_READERS       = 4
+SQLITE_READERS           = DB_WORKERS + SQL_STREAM_READERS
+SQLITE_READER_TIMEOUT    = 10.0
+SQLITE_CACHED_STATEMENTS = 512
+
+# Secondary indexes on the NoSQL collection: "hash" (equality/$in) or
+# "sorted" (numeric ranges)
+NOSQL_INDEXES = {
+    "department":    "hash",
+    "location":      "hash",
+    "salary_amount": "sorted",
+    "age":           "sorted",
+}
+
+# NoSQL execution engine: "tinydb" (row store, every access reads the file
+# cache) or "columnar" (NumPy column store in memory; mutations are written
+# through to the TinyDB file in the background). "columnar" needs numpy.
+NOSQL_ENGINE  = "tinydb"
+NOSQL_COLUMNS = {
+    "numeric":     ("age", "salary_amount"),
+    "categorical": ("department", "location", "salary_currency"),
+}
+
+# TinyDB file storage: "log" appends each write to company_nosql.json.log and
+# folds the log into the JSON file in the background once more than
+# NOSQL_COMPACT_RATIO of both files is superseded records (never below
+# NOSQL_COMPACT_MIN bytes); "json" rewrites the whole file on every write
+NOSQL_STORAGE       = "log"
+NOSQL_COMPACT_RATIO = 0.5
+NOSQL_COMPACT_MIN   = 4 << 20
+
+# Background insight generation (concurrent LLM calls / pending jobs)
+INSIGHT_WORKERS    = 4
+INSIGHT_QUEUE_SIZE = 256
+
+# SQL reads: hard row cap (enforced by wrapping the generated SELECT), default
+# page size, fetchmany batch for NDJSON streams, page-cursor lifetime (s)
+SQL_MAX_ROWS     = 10000
+SQL_PAGE_SIZE    = 1000
+SQL_STREAM_BATCH = 500
+SQL_CURSOR_TTL   = 600
+
+# Runaway-query guard for generated SQL: per-statement SQLite VM-step and
+# execution-time budgets (checked every SQL_GUARD_CHECK_EVERY instructions),
+# and an EXPLAIN QUERY PLAN pre-flight that rejects ("reject") or only flags
+# ("warn") plans estimated to visit more than SQL_PLAN_MAX_COST rows
+# (None skips the pre-flight). A visited row costs roughly 3-15 VM steps, so
+# the default rejects up front plans that would about exhaust the step budget
+# anyway. Query mode is also read-only via an authorizer.
+SQL_MAX_VM_STEPS      = 200_000_000
+SQL_MAX_SECONDS       = 10.0
+SQL_GUARD_CHECK_EVERY = 10_000
+SQL_PLAN_MAX_COST     = SQL_MAX_VM_STEPS // 10
+SQL_PLAN_ACTION       = "reject"
+
+# SQLite index advisor: a WHERE / ORDER BY column pattern that caused this
+# many full table scans is recommended as an index; with SQL_AUTO_INDEX on
+# it is created in the background instead
+SQL_ADVISOR_THRESHOLD = 5
+SQL_AUTO_INDEX        = False
+
+# On-demand request profiling (Admin, `"profile": true`): stack sampling
+# interval (s) and where the collapsed-stack files are written
+PROFILE_INTERVAL = 0.002
+PROFILE_DIR      = os.path.join(BASE_DIR, "profiles")
+
+# Change feed: every employees mutation on either store is logged and replayed
+# onto the other one by a background worker (woken by each change, at least
+# every CDC_SYNC_INTERVAL s; up to CDC_BATCH log entries per pass).
+# Off by default: existing records must be paired first. populate_sqlite.py
+# does that when it reloads SQLite from TinyDB; otherwise set CDC_RECONCILE to
+# pair them by the CDC_PAIR_KEY fields on start. The feed refuses to start
+# while any record is left without a partner.
+CDC_ENABLED       = False
+CDC_RECONCILE     = False
+CDC_PAIR_KEY      = ("name", "age", "department", "location")
+CDC_SYNC_INTERVAL = 1.0
+CDC_BATCH         = 5000
+
+# Sibling modules live next to this file; make them importable whether we are
+# started as `uvicorn backend.main:app` or `python backend/main.py`.
+sys.path.insert(0, os.path.abspath(BASE_DIR))
+from query_cache import QueryCache
+from insight_jobs import InsightJobQueue
+from sqlite_pool import PoolTimeout, SQLitePool
+from schema_registry import SchemaRegistry
+from storage import AtomicJSONStorage, LogStorage
+from logstore import fold as fold_nosql_log
+from nosql_bulk import bulk_insert, bulk_update, bulk_delete, bulk_delete_ids, bulk_restore
+from sql_guard import ExecutionBudget, QueryAborted, estimate_cost
+from sql_advisor import IndexAdvisor
+from sql_normalize import NormalizedSQL, normalize_sql
+from sql_paging import keyset_form, keyset_select, split_key
+from sql_undo import (install_undo_triggers, start_capture, collect_before_images,
+                      restore_before_images)
+from nosql_index import IndexManager
+from nosql_read import apply_read_options
+from nosql_aggregate import run_pipeline
+from audit_store import AuditLog, AuditWriter
+from audit_index import AuditIndex
+from predicates import compile_filter, cache_stats as predicate_cache_stats
+from metrics import Registry, request_labels
+from tracing import Trace, SamplingProfiler, current_trace, span
+from cdc import ChangeFeed, UnpairedRecords
+
+query_cache = QueryCache(max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+# Open SQL page cursors: token -> (normalized sql, next offset, page size,
+# last rowid key sent, keyed?)
+sql_cursors = QueryCache(max_size=1024, ttl=SQL_CURSOR_TTL)
 
 app = FastAPI()
 
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking database work on the dedicated DB executor.
+    The caller's contextvars (request metric labels) go along."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, ctx.run,
+                                      functools.partial(fn, *args, **kwargs))
+
+@app.on_event("shutdown")
+def _shutdown_db_executor():
+    db_executor.shutdown(wait=True)
+
+# ─────────────────────────────────────────────────
+# Metrics  (Prometheus text format at /api/metrics)
+# ─────────────────────────────────────────────────
+# Samples are labelled with the current request's db_type / mode (set by
+# run_query); work outside a request is labelled "none".
+metrics = Registry()
+stage_seconds = metrics.histogram(
+    "nlq_stage_duration_seconds",
+    "Time per request stage (schema, llm_generate, execute, insights, audit)",
+    ("stage", "db_type", "mode"))
+request_seconds = metrics.histogram(
+    "nlq_request_duration_seconds", "End-to-end /api/query latency",
+    ("db_type", "mode", "status"))
+llm_errors = metrics.counter(
+    "nlq_llm_errors_total", "Failed LLM calls by kind (timeout / error)",
+    ("kind", "db_type", "mode"))
+rows_returned = metrics.counter(
+    "nlq_rows_returned_total", "Result rows returned to clients", ("db_type", "mode"))
+
+@contextmanager
+def stage(name: str):
+    """Time one request stage: stage histogram + a span in the request trace."""
+    with stage_seconds.time(stage=name), span(name):
+        yield
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -65,8 +247,15 @@ Fields (same in both SQL and NoSQL):
 # ─────────────────────────────────────────────────
 # Check BEFORE TinyDB creates the file
 _tinydb_is_new = not os.path.exists(TINYDB_PATH)
-tinydb_conn = TinyDB(TINYDB_PATH)
+if NOSQL_STORAGE == "log":
+    tinydb_conn = TinyDB(TINYDB_PATH, storage=LogStorage, compact_ratio=NOSQL_COMPACT_RATIO,
+                         compact_min_bytes=NOSQL_COMPACT_MIN)
+else:
+    fold_nosql_log(TINYDB_PATH)   # changes still in a log from the "log" storage
+    tinydb_conn = TinyDB(TINYDB_PATH, storage=AtomicJSONStorage)
 employees_table = tinydb_conn.table("employees")
+# TinyDB is not thread-safe; every access from the DB executor goes through this
+tinydb_lock = threading.RLock()
 
 def init_tinydb():
     if _tinydb_is_new:
@@ -77,6 +266,42 @@ def init_tinydb():
 
 init_tinydb()
 
+nosql_indexes = IndexManager(NOSQL_INDEXES)
+nosql_indexes.rebuild((d.doc_id, d) for d in employees_table.all())
+
+nosql_columns = nosql_writer = None
+if NOSQL_ENGINE == "columnar":
+    from columnar import ColumnarCollection, WriteBehind
+    nosql_columns = ColumnarCollection.from_docs(
+        ((d.doc_id, d) for d in employees_table.all()), **NOSQL_COLUMNS)
+    nosql_writer = WriteBehind(employees_table)
+    print(f"ℹ️  Columnar NoSQL engine — {len(nosql_columns)} docs in memory")
+
+# Other processes (the Streamlit app) write the same files. The storage bumps
+# its generation when it picks their writes up; the indexes, NoSQL schema and
+# columnar copy are then rebuilt before they are used again.
+_nosql_generation = tinydb_conn.storage.refresh()
+
+def sync_nosql_state():
+    """Catch derived NoSQL state up with other processes' writes (a stat call
+    when there are none). Caller must hold tinydb_lock."""
+    global _nosql_generation, nosql_columns
+    if tinydb_conn.storage.refresh() == _nosql_generation:
+        return
+    if nosql_columns is not None:
+        nosql_writer.sync()   # our own pending changes reach the file first
+        if nosql_writer.stats()["pending_retry"]:
+            return            # they'd be lost by a reload: try again next time
+    _nosql_generation = tinydb_conn.storage.refresh()
+    employees_table.clear_cache()        # TinyDB's search cache and next doc id
+    employees_table._next_id = None
+    docs = [(d.doc_id, d) for d in employees_table.all()]
+    if nosql_columns is not None:
+        nosql_columns = ColumnarCollection.from_docs(docs, **NOSQL_COLUMNS)
+    nosql_indexes.rebuild(docs)
+    schema_registry.invalidate("nosql")
+    print(f"  [NoSQL] Picked up writes by another process — {len(docs)} docs reindexed")
+
 # ─────────────────────────────────────────────────
 # SQLite — embedded SQL setup
 # ─────────────────────────────────────────────────
@@ -124,58 +349,56 @@ def init_sqlite():
 
 init_sqlite()
 
-def get_sqlite_con():
-    con = sqlite3.connect(SQLITE_DB_PATH)
-    con.row_factory = sqlite3.Row
-    return con
+def _sqlite_on_connect(con, readonly):
+    if not readonly:
+        # REPLACE must fire the delete trigger too, or its victims can't be undone
+        con.execute("PRAGMA recursive_triggers=ON")
+        install_undo_triggers(con)
+
+sqlite_pool = SQLitePool(SQLITE_DB_PATH, readers=SQLITE_READERS,
+                         cached_statements=SQLITE_CACHED_STATEMENTS,
+                         reader_timeout=SQLITE_READER_TIMEOUT,
+                         on_connect=_sqlite_on_connect)
+# Streams take a slot before their reader, so they can never hold the
+# readers run_db() work needs to finish them
+stream_slots = threading.BoundedSemaphore(SQL_STREAM_READERS)
+
+@app.exception_handler(PoolTimeout)
+async def _pool_busy(request, exc):
+    return JSONResponse({"error": str(exc), "step": "SQLite Pool"}, status_code=503,
+                        headers={"Retry-After": "1"})
+
+index_advisor = IndexAdvisor(threshold=SQL_ADVISOR_THRESHOLD, auto_create=SQL_AUTO_INDEX)
 
 # ─────────────────────────────────────────────────
 # Schema helpers
 # ─────────────────────────────────────────────────
+# Both schemas are computed once and cached by the registry. NoSQL mutations
+# feed their (doc_id, before, after) changes in; SQL DDL invalidates.
+def _load_sqlite_schema():
+    with sqlite_pool.reader() as con:
+        cols = con.execute("PRAGMA table_info(employees)").fetchall()
+    return json.dumps({r["name"]: r["type"] for r in cols}, indent=2)
+
+def _load_tinydb_docs():
+    with tinydb_lock:
+        if nosql_columns is not None:
+            return nosql_columns.find({})[0]
+        return employees_table.all()
+
+schema_registry = SchemaRegistry(_load_sqlite_schema, _load_tinydb_docs, empty_desc=SCHEMA_DESC)
+
 def get_tinydb_schema():
-    if len(employees_table) == 0:
-        return SCHEMA_DESC
-    sample = employees_table.all()[0]
-    return json.dumps({k: type(v).__name__ for k, v in sample.items()}, indent=2)
+    with tinydb_lock:
+        sync_nosql_state()
+    return schema_registry.nosql_schema()
 
 def get_sqlite_schema():
     try:
-        con = get_sqlite_con()
-        cur = con.cursor()
-        cur.execute("PRAGMA table_info(employees)")
-        cols = cur.fetchall()
-        con.close()
-        return json.dumps({r["name"]: r["type"] for r in cols}, indent=2)
+        return schema_registry.sql_schema()
     except Exception as e:
         return f"Error: {e}"
 
-# ─────────────────────────────────────────────────
-# TinyDB filter translator  (MongoDB-style JSON → TinyDB)
-# ─────────────────────────────────────────────────
-def _build_tinydb_cond(field: str, spec, Q):
-    """Translate one field's filter spec into a TinyDB condition."""
-    if isinstance(spec, dict):
-        conds = []
-        for op, val in spec.items():
-            f = getattr(Q, field)
-            if op == "$gt":   conds.append(f > val)
-            elif op == "$gte": conds.append(f >= val)
-            elif op == "$lt":  conds.append(f < val)
-            elif op == "$lte": conds.append(f <= val)
-            elif op == "$ne":  conds.append(f != val)
-            elif op == "$in":  conds.append(f.one_of(val))
-            elif op == "$nin": conds.append(~f.one_of(val))
-            elif op == "$regex":
-                import re
-                conds.append(f.matches(val, flags=re.IGNORECASE))
-        result = conds[0]
-        for c in conds[1:]:
-            result &= c
-        return result
-    else:
-        # Plain equality
-        return getattr(Q, field) == spec
-
 # ─────────────────────────────────────────────────
 # TinyDB Smart Update Helper
 # ─────────────────────────────────────────────────
@@ -214,37 +437,152 @@ def apply_smart_update(doc: dict, update_spec: dict):
             doc[field] = val
     return doc
 
+# ─────────────────────────────────────────────────
+# TinyDB filter translator  (MongoDB-style JSON → compiled predicate)
+# ─────────────────────────────────────────────────
 def tinydb_filter(filter_dict: dict):
-    """Convert a MongoDB-style filter dict to a TinyDB condition (or None for all docs)."""
-    if not filter_dict:
-        return None
-    Q = TinyQuery()
-    conditions = [_build_tinydb_cond(f, v, Q) for f, v in filter_dict.items()]
-    # Filter out None conditions
-    conditions = [c for c in conditions if c is not None]
-    if not conditions:
-        return None
-    result = conditions[0]
-    for c in conditions[1:]:
-        result &= c
-    return result
+    """Compile a MongoDB-style filter dict to a predicate (or None for all docs)."""
+    with span("compile_filter"):
+        return compile_filter(filter_dict)
+
+def tinydb_find(flt: dict):
+    """Filter the collection, using a secondary index when one applies.
+
+    Returns (docs, plan). Caller must hold tinydb_lock.
+    """
+    sync_nosql_state()
+    if nosql_columns is not None:
+        docs, _ = nosql_columns.find(flt)
+        return docs, {"type": "columnar", "documents": len(nosql_columns)}
+    cond = tinydb_filter(flt)
+    if cond is None:
+        return employees_table.all(), {"type": "scan", "reason": "no filter"}
+    plan, candidate_ids = nosql_indexes.plan(flt)
+    if candidate_ids is None:
+        return employees_table.search(cond), plan
+    # One storage read for all candidates (Table.get re-reads it per call)
+    raw = employees_table._read_table()
+    docs = ((i, raw.get(str(i))) for i in sorted(candidate_ids))
+    return [employees_table.document_class(d, employees_table.document_id_class(i))
+            for i, d in docs if d is not None and cond(d)], plan
+
+# Mutations through the configured engine. Each returns the undo snapshot and
+# the (doc_id, before, after) change list; caller must hold tinydb_lock.
+def nosql_insert(doc: dict):
+    sync_nosql_state()
+    if nosql_columns is not None:
+        _, changes = nosql_columns.insert(doc)
+        nosql_writer.submit(changes)
+        return None, changes
+    return None, bulk_insert(employees_table, doc)
+
+def nosql_update(flt: dict, update_fn):
+    sync_nosql_state()
+    if nosql_columns is not None:
+        snapshot, changes = nosql_columns.update(flt, update_fn)
+        nosql_writer.submit(changes)
+        return snapshot, changes
+    return bulk_update(employees_table, tinydb_filter(flt), update_fn)
+
+def nosql_delete(flt: dict):
+    sync_nosql_state()
+    if nosql_columns is not None:
+        snapshot, changes = nosql_columns.delete(flt)
+        nosql_writer.submit(changes)
+        return snapshot, changes
+    return bulk_delete(employees_table, tinydb_filter(flt))
+
+def nosql_restore(snapshot: list):
+    sync_nosql_state()
+    if nosql_columns is not None:
+        changes = nosql_columns.restore(snapshot)
+        nosql_writer.submit(changes)
+        return changes
+    return bulk_restore(employees_table, snapshot)
+
+def nosql_delete_ids(doc_ids: list):
+    sync_nosql_state()
+    if nosql_columns is not None:
+        snapshot, changes = nosql_columns.delete_ids(doc_ids)
+        nosql_writer.submit(changes)
+        return snapshot, changes
+    return bulk_delete_ids(employees_table, doc_ids)
+
+def nosql_allocate_ids(n: int) -> list:
+    """Reserve n fresh doc ids. Caller must hold tinydb_lock."""
+    sync_nosql_state()
+    if nosql_columns is not None:
+        first = nosql_columns.next_id
+        nosql_columns.next_id += n
+        return list(range(first, first + n))
+    return [employees_table._get_next_id() for _ in range(n)]
+
+# ─────────────────────────────────────────────────
+# Change feed  (SQLite ↔ TinyDB sync, see cdc.py)
+# ─────────────────────────────────────────────────
+def _cdc_nosql_docs():
+    with tinydb_lock:
+        sync_nosql_state()
+        if nosql_columns is not None:
+            docs, ids = nosql_columns.find({})
+            return list(zip(ids, docs))
+        return [(d.doc_id, d) for d in employees_table.all()]
+
+def _cdc_nosql_allocate(n):
+    with tinydb_lock:
+        return nosql_allocate_ids(n)
+
+def _cdc_nosql_apply(upserts: dict, deletes: list):
+    with tinydb_lock:
+        changes = nosql_restore([doc | {"__doc_id__": doc_id} for doc_id, doc in upserts.items()])
+        changes += nosql_delete_ids(deletes)[1]
+        nosql_indexes.apply_changes(changes)
+    schema_registry.apply_changes(changes)
+
+change_feed = None
+if CDC_ENABLED:
+    _feed = ChangeFeed(sqlite_pool, _cdc_nosql_docs, _cdc_nosql_allocate, _cdc_nosql_apply,
+                       batch_size=CDC_BATCH, interval=CDC_SYNC_INTERVAL)
+    if CDC_RECONCILE:
+        _paired = _feed.reconcile(CDC_PAIR_KEY)["paired"]
+        print(f"ℹ️  Change feed — paired {_paired} record(s) by {', '.join(CDC_PAIR_KEY)}")
+    try:
+        _feed.start()
+        change_feed = _feed
+    except UnpairedRecords as e:
+        print(f"⚠️  Change feed not started: {e}")
+
+# In dependency order: the change feed writes to both stores, and columnar
+# changes reach TinyDB through the write-behind
+@app.on_event("shutdown")
+def _close_stores():
+    if change_feed is not None:
+        change_feed.close()
+    if nosql_writer is not None:
+        nosql_writer.close()
+    tinydb_conn.close()   # waits for a running compaction
+    sqlite_pool.close()
 
 # ─────────────────────────────────────────────────
 # LLM helpers
 # ─────────────────────────────────────────────────
-def _call_llm(prompt: str) -> str:
-    """Call the LLM and return the cleaned text content."""
+async def _call_llm(prompt: str) -> str:
+    """Call the LLM (non-blocking) and return the cleaned text content."""
     print(f"  [LLM] Calling model {MODEL_NAME}...")
     try:
-        response = litellm.completion(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            timeout=30  # Prevent infinite hangs
-        )
+        with span("llm_call"):
+            response = await litellm.acompletion(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=30  # Prevent infinite hangs
+            )
         res = response.choices[0].message.content
         print(f"  [LLM] Success. Length: {len(res)}")
     except Exception as e:
         print(f"  [LLM] Error: {e}")
+        timed_out = isinstance(e, (asyncio.TimeoutError, TimeoutError)) or \
+            "timeout" in type(e).__name__.lower()
+        llm_errors.inc(kind="timeout" if timed_out else "error")
         raise # Re-raise the exception after logging
     
     # Strip markdown fences
@@ -257,8 +595,11 @@ def _call_llm(prompt: str) -> str:
             break
     return content
 
-def generate_nosql_query(nl_query: str, schema: str, mode: str) -> dict:
-    """LLM → MongoDB-style JSON filter/mutation for TinyDB."""
+async def generate_nosql_query(nl_query: str, schema: str, mode: str) -> dict:
+    """LLM → MongoDB-style JSON filter/mutation for TinyDB.
+
+    Served from the query cache when possible; on a miss the caller caches
+    the query (_cache_nosql) only after it ran, like the SQL path."""
     if mode == "mutation":
         task = """
 Return JSON with:
@@ -271,9 +612,27 @@ Return JSON with:
         task = """
 Return a MongoDB-style read query JSON:
 {
-  "filter": {},          // field conditions — use $gt, $lt, $gte, $lte, $ne, $in, $regex
-  "sort": "field_name"   // optional
+  "filter": {},            // field conditions — use $gt, $lt, $gte, $lte, $ne, $in, $nin, $regex, $exists; combine with $and / $or
+  "sort": {"field": -1},   // optional — 1 ascending, -1 descending; several keys allowed, in priority order
+  "skip": 0,               // optional — documents to skip
+  "limit": 10,             // optional — max documents (e.g. "top 5" → sort + limit 5)
+  "projection": {"name": 1, "salary_amount": 1}   // optional — only these fields
+}
+
+For aggregate questions (averages, totals, counts, min/max per group) return a
+pipeline instead, which is evaluated inside the database:
+{
+  "pipeline": [
+    {"$match": {}},                                   // optional filter, same syntax as above
+    {"$group": {"_id": "$department",                 // "$field", {"a": "$f1", "b": "$f2"}, or null for one group
+                "avg_salary": {"$avg": "$salary_amount"},
+                "employees": {"$count": {}}}},        // also $sum (use {"$sum": 1} to count), $min, $max
+    {"$sort": {"avg_salary": -1}},                    // optional
+    {"$limit": 5},                                    // optional
+    {"$project": {"department": "$_id", "avg_salary": 1, "employees": 1, "_id": 0}}  // optional
+  ]
 }
+Use {"$count": "field_name"} as a stage to count matching documents.
 """
     prompt = f"""You are a NoSQL assistant for TinyDB (document database).
 Schema:
@@ -284,15 +643,22 @@ Task: {task}
 User request: "{nl_query}"
 
 Return ONLY valid JSON. No markdown. No explanation."""
+    key = query_cache.make_key(nl_query, mode, "nosql", schema)
     try:
-        content = _call_llm(prompt)
+        content = query_cache.get(key)
+        if content is None:
+            content = await _call_llm(prompt)
         return json.loads(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"NoSQL LLM error: {e}")
 
 
-def generate_sql_query(nl_query: str, schema: str, mode: str) -> str:
-    """LLM → SQL SELECT or mutation statement for SQLite."""
+async def generate_sql_query(nl_query: str, schema: str, mode: str) -> str:
+    """LLM → SQL SELECT or mutation statement for SQLite.
+
+    Served from the query cache when possible; on a miss the caller caches
+    the SQL (_cache_sql) only after it ran, so failed or aborted SQL is not
+    replayed for the TTL."""
     if mode == "mutation":
         task = """Generate a single SQLite DML statement: INSERT INTO, UPDATE ... SET ... WHERE, or DELETE FROM ... WHERE.
 Return ONLY the SQL. No markdown."""
@@ -310,60 +676,79 @@ Task: {task}
 User request: "{nl_query}"
 
 SQL:"""
+    key = query_cache.make_key(nl_query, mode, "sql", schema)
     try:
-        return _call_llm(prompt)
+        sql = query_cache.get(key)
+        if sql is None:
+            sql = await _call_llm(prompt)
+        return sql
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"SQL LLM error: {e}")
 
 
-def generate_insights(results: list, nl_query: str) -> str:
-    if not results:
+def _cache_sql(req, schema: str, sql: str):
+    query_cache.put(query_cache.make_key(req.prompt, req.mode, "sql", schema), sql)
+
+
+def _cache_nosql(req, schema: str, query_obj: dict):
+    query_cache.put(query_cache.make_key(req.prompt, req.mode, "nosql", schema),
+                    json.dumps(query_obj))
+
+
+async def generate_insights(sample: list, count: int, nl_query: str) -> str:
+    if not sample:
         return ""
+    with stage("insights"):
+        return await _generate_insights(sample, count, nl_query)
+
+async def _generate_insights(sample: list, count: int, nl_query: str) -> str:
     try:
         # Simple summary instead of pandas describe()
-        count = len(results)
-        sample = results[:2]
         prompt = f"""You are a Data Analyst.
 User Query: "{nl_query}"
 Data Results Count: {count}
 Sample Data: {json.dumps(sample)}
 
 Provide 3 concise bullet-point insights. Focus only on the data."""
-        return _call_llm(prompt)
+        return await _call_llm(prompt)
     except Exception as e:
         return f"Could not generate insights: {e}"
 
 
+insight_jobs = InsightJobQueue(generate_insights, workers=INSIGHT_WORKERS,
+                               max_queue=INSIGHT_QUEUE_SIZE)
+
+@app.on_event("shutdown")
+async def _stop_insight_workers():
+    await insight_jobs.stop()
+
+
 # ─────────────────────────────────────────────────
 # Audit
 # ─────────────────────────────────────────────────
-def log_audit(user, action, query, status, db_type=None, snapshot=None):
-    global audit_log, audit_id_counter
+def log_audit(user, action, query, status, db_type=None, snapshot=None, undo_of=None,
+              fingerprint=None):
+    with stage("audit"):
+        return _log_audit(user, action, query, status, db_type, snapshot, undo_of, fingerprint)
+
+def _log_audit(user, action, query, status, db_type, snapshot, undo_of, fingerprint):
     entry = {
-        "id": audit_id_counter,
         "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "user": user,
         "action": action,
         "query": str(query),
         "status": status,
         "db_type": db_type,
-        "snapshot": snapshot,
         "undone": False
     }
-    audit_id_counter += 1
-    audit_log.append(entry)
-    
-    # Still write to file for persistence
-    try:
-        with open(AUDIT_LOG_FILE, "a") as f:
-            # We don't write snapshots to the file to keep it small in this demo
-            file_entry = entry.copy()
-            file_entry.pop("snapshot", None)
-            f.write(json.dumps(file_entry) + "\n")
-    except:
-        pass
-        
-    return entry
+    if undo_of is not None:
+        entry["undo_of"] = undo_of
+    if fingerprint is not None:
+        entry["fingerprint"] = fingerprint   # normalized SQL shape
+    # Persisted in the background, enqueued under the id lock so the file stays
+    # in id order; the record keeps the snapshot ref (not the snapshot), so
+    # entries restored after a restart can still be undone
+    return audit_log.append(entry, snapshot=snapshot, persist=audit_writer.write)
 
 
 # ─────────────────────────────────────────────────
@@ -372,16 +757,40 @@ def log_audit(user, action, query, status, db_type=None, snapshot=None):
 # -----------------------------
 # Global State for Demo
 # -----------------------------
-# In a real app, use a DB table. For demo, we use session-like global list.
-# Each entry: {id, timestamp, user, action, query, status, db_type, snapshot, undone}
-audit_log = []
-audit_id_counter = 0
+# Recent entries in memory, undo snapshots on disk (see audit_store.py).
+# Each entry: {id, timestamp, user, action, query, status, db_type, snapshot_ref, undone[, undo_of]}
+def init_audit():
+    started = time.perf_counter()
+    index = AuditIndex(AUDIT_LOG_FILE)   # sidecar offsets; catches up after a crash
+    log = AuditLog(AUDIT_SNAPSHOT_FILE, max_entries=AUDIT_MEMORY_SIZE)
+    log.restore(index.recent(AUDIT_MEMORY_SIZE), next_id=index.max_id + 1)
+    print(f"ℹ️  Audit log restored — {log.stats()['entries']} recent entries, next id "
+          f"{log.next_id} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+    return index, log
+
+audit_index, audit_log = init_audit()
+audit_writer = AuditWriter(AUDIT_LOG_FILE, batch_size=AUDIT_FLUSH_BATCH,
+                           flush_interval=AUDIT_FLUSH_INTERVAL, max_queue=AUDIT_QUEUE_SIZE,
+                           put_timeout=AUDIT_QUEUE_WAIT, index=audit_index)
+
+@app.on_event("shutdown")
+def _close_audit_log():
+    audit_writer.close()
+    audit_index.close()
+    audit_log.close()
 
 class QueryRequest(BaseModel):
     prompt: str
     role: str    = "Viewer"   # "Admin" | "Viewer"
     mode: str    = "query"    # "query" | "mutation"
     db_type: str = "nosql"    # "nosql" (TinyDB) | "sql" (SQLite)
+    # SQL reads only
+    page_size: int | None = None   # rows per page (default SQL_PAGE_SIZE)
+    cursor: str | None    = None   # `next_cursor` of the previous page
+    stream: bool          = False  # NDJSON stream of every row instead of a page
+    # Diagnostics
+    timings: bool = False   # add the request's trace spans as `timings`
+    profile: bool = False   # Admin: sample-profile this request into PROFILE_DIR
 
 
 # ─────────────────────────────────────────────────
@@ -397,48 +806,200 @@ def health_check():
 
 @app.get("/api/schema")
 def get_schema(db_type: str = "nosql"):
+    version = schema_registry.versions.get(db_type, 0)
     if db_type == "sql":
-        return {"db_type": "sql",   "schema": get_sqlite_schema(), "source": "SQLite · employees"}
-    return     {"db_type": "nosql", "schema": get_tinydb_schema(), "source": "TinyDB · employees"}
+        return {"db_type": "sql",   "schema": get_sqlite_schema(), "source": "SQLite · employees", "version": version}
+    return     {"db_type": "nosql", "schema": get_tinydb_schema(), "source": "TinyDB · employees", "version": version}
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return query_cache.stats()
+
+@app.delete("/api/cache")
+def clear_cache():
+    query_cache.clear()
+    return {"message": "Query cache cleared", **query_cache.stats()}
+
+@app.get("/api/schema/stats")
+def get_schema_stats():
+    return schema_registry.stats()
+
+@app.get("/api/nosql/indexes")
+def get_nosql_indexes():
+    stats = {"engine": NOSQL_ENGINE, "indexes": nosql_indexes.stats(),
+             "predicate_cache": predicate_cache_stats()}
+    if nosql_columns is not None:
+        with tinydb_lock:
+            stats["columnar"] = nosql_columns.stats()
+        stats["write_behind"] = nosql_writer.stats()
+    if NOSQL_STORAGE == "log":
+        stats["storage"] = employees_table.storage.stats()
+    return stats
+
+@app.get("/api/sqlite/pool")
+def get_sqlite_pool_stats():
+    return sqlite_pool.stats()
+
+@app.get("/api/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/sqlite/indexes")
+def get_sqlite_indexes():
+    """Index advisor: recommended and created indexes with observed speedups."""
+    return index_advisor.report()
+
+@app.post("/api/sqlite/indexes/{name}")
+async def create_sqlite_index(name: str):
+    """Build a recommended index now."""
+    def build():
+        with sqlite_pool.writer() as con:
+            return index_advisor.create_recommended(con, name)
+    try:
+        cand = await run_db(build)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index creation failed: {e}")
+    if cand is None:
+        raise HTTPException(status_code=404, detail="No such recommended index")
+    await run_db(log_audit, "Admin", "Create Index", cand.sql, "Success", db_type="sql")
+    return {"message": f"Created index {cand.name}"}
+
+@app.get("/api/sync/stats")
+async def get_sync_stats():
+    """Change feed: log head, per-store checkpoints, lag and apply errors."""
+    if change_feed is None:
+        return {"enabled": False}
+    return {"enabled": True, **await run_db(change_feed.stats)}
+
+@app.post("/api/sync")
+async def sync_now():
+    """Apply everything pending in the change feed before returning."""
+    if change_feed is None:
+        raise HTTPException(status_code=404, detail="Change feed is disabled")
+    def drain():
+        while change_feed.sync_once():
+            pass
+        return change_feed.stats()
+    return {"enabled": True, **await run_db(drain)}
+
+@app.get("/api/insights/stats")
+def get_insight_stats():
+    return insight_jobs.stats()
+
+@app.get("/api/insights/{job_id}")
+async def get_insights(job_id: str, wait: float = 0):
+    """Poll a deferred insight job; `wait` long-polls for up to that many seconds."""
+    job = await insight_jobs.wait(job_id, min(wait, 30)) if wait > 0 else insight_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Insight job not found or expired")
+    return job
+
+@app.get("/api/insights/{job_id}/stream")
+async def stream_insights(job_id: str):
+    """Server-Sent Events: one `insights` event once the job finishes."""
+    if insight_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Insight job not found or expired")
+
+    async def events():
+        while True:
+            job = await insight_jobs.wait(job_id, timeout=15)
+            if job is None or job["status"] in ("done", "failed"):
+                yield f"event: insights\ndata: {json.dumps(job)}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/audit")
-def get_audit():
-    # Return reversed to show latest first
-    return audit_log[::-1]
+def get_audit(cursor: int | None = None, limit: int = 50, user: str | None = None,
+              status: str | None = None, db_type: str | None = None,
+              since: str | None = None, until: str | None = None):
+    """Latest first. Pass the returned `next_cursor` back as `cursor` for the next page."""
+    try:
+        return audit_log.page(cursor, max(1, min(limit, 500)), user=user, status=status,
+                              db_type=db_type, since=since, until=until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+
+@app.get("/api/audit/search")
+def search_audit(id: int | None = None, user: str | None = None, status: str | None = None,
+                 db_type: str | None = None, since: str | None = None, until: str | None = None,
+                 cursor: int | None = None, limit: int = 50):
+    """Search the whole persisted audit history via the sidecar index.
+    Entries still in memory carry their live undone/undo state; the first page
+    also covers entries the writer hasn't flushed to the audit file yet."""
+    limit = max(1, min(limit, 500))
+    indexed = audit_index.stats()   # count and max id of the same flush
+    try:
+        pending = [] if cursor is not None else audit_log.newer_than(
+            indexed["max_id"], limit, log_id=id, user=user, status=status, db_type=db_type,
+            since=since, until=until)
+        if len(pending) == limit:
+            return {"entries": pending, "next_cursor": indexed["records"] or None}
+        page = audit_index.search(id, user=user, status=status, db_type=db_type, since=since,
+                                  until=until, cursor=cursor, limit=limit - len(pending))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+    entries, seen = list(pending), {e["id"] for e in pending}
+    for rec in page["entries"]:
+        if rec.get("id") in seen:
+            continue   # flushed while we searched
+        live = audit_log.get(rec.get("id", -1))
+        if live is not None and live["timestamp"] == rec.get("timestamp"):
+            rec = live
+        else:
+            rec["snapshot_ref"] = None   # only entries in memory can be undone
+        entries.append(audit_log.public(rec))
+    return {"entries": entries, "next_cursor": page["next_cursor"]}
+
+@app.get("/api/audit/stats")
+def get_audit_stats():
+    return {**audit_log.stats(), "writer": audit_writer.stats(), "index": audit_index.stats()}
+
+def _restore_snapshot(entry) -> list:
+    """Undo a mutation; returns the SQL changes that matched no row anymore."""
+    snapshot = audit_log.snapshot(entry)   # lazily read back from disk
+    if entry["db_type"] == "sql":
+        # Put back only the rows the mutation touched
+        with sqlite_pool.writer() as con:
+            result = restore_before_images(con, snapshot)
+            if change_feed is not None:
+                change_feed.record_sql(con, snapshot)
+        return result["missing"]
+    else:
+        # Restore documents by doc_id (re-creating deleted ones) in one write
+        with tinydb_lock:
+            changes = nosql_restore(snapshot)
+            nosql_indexes.apply_changes(changes)
+            if change_feed is not None:
+                change_feed.record_nosql(changes)
+        schema_registry.apply_changes(changes)
+        if change_feed is not None:
+            change_feed.flush_nosql()
+        return []
 
 @app.post("/api/audit/undo/{log_id}")
 async def undo_action(log_id: int):
-    global audit_log
-    entry = next((item for item in audit_log if item["id"] == log_id), None)
-    
+    entry = audit_log.get(log_id)
+
     if not entry:
         raise HTTPException(status_code=404, detail="Log entry not found")
     if entry["undone"]:
         raise HTTPException(status_code=400, detail="Action already undone")
-    if not entry.get("snapshot"):
+    if not entry.get("snapshot_ref"):
         raise HTTPException(status_code=400, detail="No snapshot available for this action")
 
     try:
-        if entry["db_type"] == "sql":
-            con = get_sqlite_con()
-            cur = con.cursor()
-            # Clear table and restore from snapshot
-            cur.execute("DELETE FROM employees")
-            for row in entry["snapshot"]:
-                fields = ", ".join(row.keys())
-                placeholders = ", ".join(["?"] * len(row))
-                cur.execute(f"INSERT INTO employees ({fields}) VALUES ({placeholders})", list(row.values()))
-            con.commit()
-            con.close()
-        else:
-            table = get_tinydb_table()
-            # Restore documents by doc_id
-            for doc_data in entry["snapshot"]:
-                doc_id = doc_data.pop("__doc_id__", None)
-                if doc_id:
-                    table.update(doc_data, doc_ids=[doc_id])
-        
+        missing = await run_db(_restore_snapshot, entry)
         entry["undone"] = True
+        status = f"Success ({len(missing)} rows no longer exist)" if missing else "Success"
+        # Recorded so the undone state survives a restart
+        await run_db(log_audit, "Admin", "Undo", f"Undo of #{log_id}", status,
+                     db_type=entry["db_type"], undo_of=log_id)
+        if missing:
+            return {"message": f"Action undone; {len(missing)} of its rows no longer "
+                               "exist and were not restored", "missing": missing}
         return {"message": "Action undone successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Undo failed: {e}")
@@ -457,163 +1018,449 @@ async def transcribe_audio(file: UploadFile = File(...)):
 
 
 # ─── Main query endpoint ────────────────────────
+# Blocking TinyDB/SQLite work runs on db_executor via run_db(); the LLM calls
+# are awaited directly, so the event loop is never parked on I/O.
+
+def _execute_nosql(req: QueryRequest, query_obj: dict) -> dict:
+    """Run a generated TinyDB query/mutation. Blocking — call via run_db()."""
+    try:
+        # ── READ ──────────────────────────────
+        if req.mode == "query" and "pipeline" in query_obj:
+            def find(flt):
+                with tinydb_lock:
+                    return tinydb_find(flt)
+            # Aggregation runs in one pass over the matched docs; only the
+            # grouped rows come back
+            results, plan = run_pipeline(query_obj["pipeline"], find)
+            return {
+                "status": "success", "db_type": "nosql", "db_label": "TinyDB",
+                "generated_query": query_obj, "plan": plan,
+                "results": results, "count": len(results), "insights": "",
+            }
+
+        if req.mode == "query":
+            flt = query_obj.get("filter", {})
+            with tinydb_lock:
+                docs, plan = tinydb_find(flt)
+
+            # Sort (top-K heap when limited), skip/limit, then projection
+            results, total = apply_read_options(docs, query_obj)
+            return {
+                "status": "success", "db_type": "nosql", "db_label": "TinyDB",
+                "generated_query": query_obj, "plan": plan,
+                "results": results, "count": len(results), "total": total, "insights": "",
+            }
+
+        # ── MUTATION ──────────────────────────
+        method = query_obj.get("method", "")
+        flt    = query_obj.get("filter", {})
+
+        with tinydb_lock:
+            if method == "insert":
+                snapshot, changes = nosql_insert(query_obj.get("document", {}))
+                msg = f"Inserted 1 document."
+
+            elif method == "update":
+                upd = query_obj.get("update", {})
+                # Match, snapshot and apply in one pass; one file write total
+                snapshot, changes = nosql_update(flt, lambda doc: apply_smart_update(doc, upd))
+                msg = f"Updated {len(changes)} documents."
+
+            elif method == "delete":
+                snapshot, changes = nosql_delete(flt)
+                msg = ("All documents deleted." if tinydb_filter(flt) is None
+                       else "Matching documents deleted.")
+            else:
+                return {"error": f"Unknown method: {method!r}"}
+            nosql_indexes.apply_changes(changes)
+            if change_feed is not None:
+                change_feed.record_nosql(changes)   # staged in write order
+
+        schema_registry.apply_changes(changes)
+        if change_feed is not None:
+            change_feed.flush_nosql()   # outside tinydb_lock: takes the SQL writer
+        log_audit(req.role, "NoSQL Mutation", str(query_obj), "Success", db_type="nosql", snapshot=snapshot)
+        return {"status": "success", "db_type": "nosql", "db_label": "TinyDB",
+                "generated_query": query_obj, "message": msg,
+                "results": [], "count": 0, "insights": ""}
+
+    except Exception as e:
+        log_audit(req.role, "Execute NoSQL Query", str(query_obj), f"Failed: {e}")
+        return {"error": str(e), "step": "TinyDB Execution"}
+
+
+def _is_select(sql: str) -> bool:
+    words = sql.strip().split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH", "VALUES")
+
+def _bounded_select(sql: str, limit: int, offset: int = 0):
+    """Wrap a generated SELECT so SQLite itself stops after `limit` rows."""
+    body = sql.strip().rstrip(";").strip()
+    return f"SELECT * FROM ({body}) LIMIT ? OFFSET ?", (limit, offset)
+
+def _budget() -> ExecutionBudget:
+    return ExecutionBudget(SQL_MAX_VM_STEPS, SQL_MAX_SECONDS, SQL_GUARD_CHECK_EVERY)
+
+def _preflight(con, norm: NormalizedSQL):
+    """Plan check for generated SQL. Raises QueryAborted over the cost limit
+    in "reject" mode; returns a warning dict in "warn" mode, else None."""
+    if SQL_PLAN_MAX_COST is None:
+        return None
+    est = estimate_cost(con, norm.text, norm.params)
+    if est["cost"] <= SQL_PLAN_MAX_COST:
+        return None
+    msg = f"estimated plan cost of {est['cost']:,} rows exceeds the limit of {SQL_PLAN_MAX_COST:,}"
+    if SQL_PLAN_ACTION == "reject":
+        raise QueryAborted("plan", f"Query rejected: {msg}", cost=est["cost"],
+                           limit=SQL_PLAN_MAX_COST, plan=est["plan"])
+    return {"message": f"Expensive query: {msg}", "cost": est["cost"], "plan": est["plan"]}
+
+def _execute_generated(con, norm: NormalizedSQL, limit=None, offset=0, after=None, keyed=False):
+    """Execute the parameterized statement (bounded to `limit` rows when
+    given; `keyed` pages by rowid key, see sql_paging). Falls back to the
+    SQL as generated if lifting literals broke it."""
+    def run(text, params):
+        if limit is None:
+            return con.execute(text, params)
+        if keyed:
+            bounded, bounds = keyset_select(keyset_form(text), after, limit)
+        else:
+            bounded, bounds = _bounded_select(text, limit, offset)
+        return con.execute(bounded, params + bounds)
+    try:
+        return run(norm.text, norm.params)
+    except sqlite3.OperationalError as e:
+        if norm.text == norm.sql or "syntax error" not in str(e):
+            raise
+        print(f"  [SQL] Parameterized form rejected ({e}); running as generated")
+        return run(norm.sql, ())
+
+def _sql_meta(norm: NormalizedSQL) -> dict:
+    return {"generated_query": {"sql": norm.sql, "normalized": norm.text,
+                                "params": list(norm.params)},
+            "fingerprint": norm.fingerprint}
+
+def _guarded(budget: ExecutionBudget, con, fn, *args):
+    with budget.attach(con):
+        return fn(*args)
+
+def _build_advised_index(cand):
+    try:
+        with sqlite_pool.writer() as con:
+            index_advisor.create(con, cand)
+        log_audit("system", "Create Index", cand.sql, "Success", db_type="sql")
+    except Exception as e:
+        log_audit("system", "Create Index", cand.sql, f"Failed: {e}", db_type="sql")
+
+def _advise(con, norm: NormalizedSQL, seconds: float):
+    """Feed an executed statement to the index advisor; never fails the query."""
+    try:
+        due = index_advisor.observe(con, norm.text, seconds, norm.params)
+    except Exception as e:
+        print(f"  [Advisor] Skipped: {e}")
+        return
+    for cand in due:
+        db_executor.submit(_build_advised_index, cand)   # needs the writer
+
+def _aborted(req: QueryRequest, norm: NormalizedSQL, e: QueryAborted) -> dict:
+    log_audit(req.role, "Execute SQL", norm.sql, f"Aborted ({e.reason}): {e}", db_type="sql",
+              fingerprint=norm.fingerprint)
+    return {"error": str(e), "step": "Query Guard", "aborted": e.to_dict()}
+
+def _read_sql_page(norm: NormalizedSQL, offset: int, page_size: int, after=None,
+                   keyed=None) -> dict:
+    """One page of a SQL read, capped at SQL_MAX_ROWS overall. Blocking.
+
+    Plain single-table SELECTs page by rowid key (`after` = last key sent),
+    anything else by OFFSET; `keyed` is None on the first page."""
+    limit = max(0, min(page_size, SQL_MAX_ROWS - offset))
+    is_select = _is_select(norm.text)
+    budget, warning = _budget(), None
+    with sqlite_pool.reader() as con, budget.attach(con, readonly=True):
+        if offset == 0:
+            warning = _preflight(con, norm)   # later pages already passed it
+        started = time.perf_counter()
+        if is_select:
+            if keyed is None:
+                keyed = keyset_form(norm.text) is not None
+                try:
+                    rows = _execute_generated(con, norm, limit + 1, keyed=keyed).fetchall()
+                except sqlite3.OperationalError as e:
+                    if not keyed or "rowid" not in str(e):
+                        raise
+                    keyed = False   # a view or WITHOUT ROWID table: no rowid
+                    rows = _execute_generated(con, norm, limit + 1).fetchall()
+            else:
+                rows = _execute_generated(con, norm, limit + 1, offset, after, keyed).fetchall()
+        else:
+            # PRAGMA / EXPLAIN can't be wrapped: first page only
+            rows = _execute_generated(con, norm).fetchmany(limit + 1) if offset == 0 else []
+        if offset == 0 and is_select:
+            _advise(con, norm, time.perf_counter() - started)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if keyed and rows:
+        keys, results = zip(*(split_key(r) for r in rows))
+        after, results = keys[-1], list(results)
+    else:
+        results = [dict(r) for r in rows]
+    next_offset = offset + len(results)
+    next_cursor = None
+    if more and is_select and next_offset < SQL_MAX_ROWS:
+        next_cursor = secrets.token_urlsafe(16)
+        sql_cursors.put(next_cursor, (norm, next_offset, page_size, after, keyed))
+    return {
+        "status": "success", "db_type": "sql", "db_label": "SQLite", **_sql_meta(norm),
+        "results": results, "count": len(results), "insights": "",
+        "offset": offset, "next_cursor": next_cursor,
+        "truncated": more and next_cursor is None,   # SQL_MAX_ROWS reached
+        "guard": {**budget.stats(), "plan_warning": warning},
+    }
+
+def _ndjson(obj) -> str:
+    return json.dumps(obj) + "\n"
+
+def _open_sql_stream(con, norm: NormalizedSQL, budget: ExecutionBudget):
+    with budget.attach(con, readonly=True):
+        warning = _preflight(con, norm)
+        if _is_select(norm.text):
+            return _execute_generated(con, norm, SQL_MAX_ROWS + 1), warning
+        return _execute_generated(con, norm), warning
+
+async def _stream_sql(req: QueryRequest, norm: NormalizedSQL, schema: str):
+    """NDJSON: a `meta` line, `rows` lines per fetchmany batch, then `end`.
+    The reader connection is held for the whole stream, in one of
+    SQL_STREAM_READERS stream slots."""
+    if not stream_slots.acquire(blocking=False):
+        yield _ndjson({"type": "error", "error": "Too many SQL streams open; retry shortly",
+                       "step": "SQLite Pool"})
+        return
+    try:
+        yield _ndjson({"type": "meta", "status": "success", "db_type": "sql",
+                       "db_label": "SQLite", **_sql_meta(norm)})
+        count, sample, truncated = 0, [], False
+        budget = _budget()
+        started = time.perf_counter()
+
+        def executed():
+            stage_seconds.observe(time.perf_counter() - started, stage="execute")
+            rows_returned.inc(count)
+
+        reader = sqlite_pool.reader()
+        try:
+            con = await run_db(reader.__enter__)
+            try:
+                cur, warning = await run_db(_open_sql_stream, con, norm, budget)
+                while not truncated:
+                    # The budget keeps counting across batches
+                    rows = await run_db(_guarded, budget, con, cur.fetchmany, SQL_STREAM_BATCH)
+                    if not rows:
+                        break
+                    if count + len(rows) > SQL_MAX_ROWS:
+                        rows, truncated = rows[:SQL_MAX_ROWS - count], True
+                    rows = [dict(r) for r in rows]
+                    count += len(rows)
+                    sample = sample or rows[:2]
+                    if rows:
+                        yield _ndjson({"type": "rows", "rows": rows})
+                if _is_select(norm.text):
+                    await run_db(_advise, con, norm, budget.elapsed)
+            finally:
+                await run_db(reader.__exit__, None, None, None)
+        except QueryAborted as e:
+            executed()
+            resp = await run_db(_aborted, req, norm, e)
+            yield _ndjson({"type": "error", **resp})
+            return
+        except Exception as e:
+            executed()
+            await run_db(log_audit, req.role, "Execute SQL", norm.sql, f"Failed: {e}",
+                         fingerprint=norm.fingerprint)
+            yield _ndjson({"type": "error", "error": str(e), "step": "SQLite Execution"})
+            return
+        executed()
+        _cache_sql(req, schema, norm.sql)
+        job_id = insight_jobs.submit(sample, count, req.prompt) if count else None
+        await run_db(log_audit, req.role, "Execute SQL", norm.sql, "Success",
+                     fingerprint=norm.fingerprint)
+        yield _ndjson({"type": "end", "count": count, "truncated": truncated,
+                       "insights_job_id": job_id,
+                       "guard": {**budget.stats(), "plan_warning": warning}})
+    finally:
+        stream_slots.release()
+
+def _execute_sql(req: QueryRequest, norm: NormalizedSQL) -> dict:
+    """Run a generated SQLite statement. Blocking — call via run_db()."""
+    sql = norm.sql
+    try:
+        # ── READ ──────────────────────────────
+        if req.mode == "query":
+            return _read_sql_page(norm, 0, req.page_size or SQL_PAGE_SIZE)
+
+        # ── MUTATION ──────────────────────────
+        action = sql.strip().split()[0].upper()
+        budget = _budget()
+        # An abort raises out of the writer block, so the statement rolls back
+        with sqlite_pool.writer() as con, budget.attach(con):
+            _preflight(con, norm)
+            # Undo snapshot = before-images of the touched rows (temp triggers)
+            start_capture(con)
+            started = time.perf_counter()
+            cur = _execute_generated(con, norm)
+            affected = cur.rowcount
+            if action in ("UPDATE", "DELETE"):
+                _advise(con, norm, time.perf_counter() - started)
+            snapshot = collect_before_images(con)
+            if change_feed is not None:
+                change_feed.record_sql(con, snapshot)   # commits with the statement
+            if action in ("CREATE", "ALTER", "DROP"):
+                install_undo_triggers(con)   # capture any new columns
+        if action in ("CREATE", "ALTER", "DROP"):
+            schema_registry.invalidate("sql")   # migration → new schema version
+            index_advisor.invalidate()
+        log_audit(req.role, "SQL Mutation", sql, "Success", db_type="sql", snapshot=snapshot,
+                  fingerprint=norm.fingerprint)
+        return {
+            "status": "success", "db_type": "sql", "db_label": "SQLite", **_sql_meta(norm),
+            "message": f"{action} executed — {affected} row(s) affected.",
+            "results": [], "count": 0, "insights": "",
+            "guard": budget.stats(),
+        }
+
+    except QueryAborted as e:
+        return _aborted(req, norm, e)
+    except PoolTimeout:
+        raise   # HTTP 503
+    except Exception as e:
+        log_audit(req.role, "Execute SQL", sql, f"Failed: {e}", fingerprint=norm.fingerprint)
+        return {"error": str(e), "step": "SQLite Execution"}
+
+
 @app.post("/api/query")
-def run_query(req: QueryRequest):
+async def run_query(req: QueryRequest):
     print(f"[Query] prompt={req.prompt!r}  role={req.role}  mode={req.mode}  db={req.db_type}")
+    # Labels every metric recorded while serving this request, DB threads included
+    request_labels.set({"db_type": "sql" if req.cursor else req.db_type, "mode": req.mode})
+    trace = Trace()
+    current_trace.set(trace)
+    if req.profile and req.role != "Admin":
+        return {"error": "You do not have permission to profile queries."}
+    profiler = None
+    if req.profile:
+        loop_thread = threading.get_ident()
+        profiler = SamplingProfiler(
+            lambda t: t.ident == loop_thread or t.name.startswith("db"),
+            PROFILE_INTERVAL).start()
+
+    resp = await _run_query(req)
+    status = ("stream" if isinstance(resp, StreamingResponse)
+              else "error" if "error" in resp else "ok")
+    request_seconds.observe(trace.elapsed(), status=status)
+
+    # A stream's headers go out before its body runs: its Server-Timing and
+    # profile cover generating the query only
+    profile = None
+    if profiler is not None:
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.id}.folded")
+        profile = await run_db(profiler.save, path)
+    if isinstance(resp, StreamingResponse):
+        resp.headers["Server-Timing"] = trace.server_timing()
+        if profile:
+            resp.headers["X-Profile"] = os.path.basename(profile["path"])
+        return resp
+
+    if req.mode == "query" and "results" in resp:
+        rows_returned.inc(len(resp["results"]))
+    if req.timings:
+        resp["timings"] = trace.timings()
+    if profile:
+        resp["profile"] = profile
+    with span("serialize"):
+        response = JSONResponse(jsonable_encoder(resp))
+    response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+async def _run_query(req: QueryRequest):
+    # Next page of an earlier SQL read (no LLM round-trip)
+    if req.cursor:
+        page = sql_cursors.get(req.cursor)
+        if page is None:
+            return {"error": "Cursor expired or unknown", "step": "Pagination"}
+        try:
+            with stage("execute"):
+                return await run_db(_read_sql_page, *page)
+        except QueryAborted as e:
+            return await run_db(_aborted, req, page[0], e)
+        except PoolTimeout:
+            raise   # HTTP 503
+        except Exception as e:
+            return {"error": str(e), "step": "SQLite Execution"}
 
     # RBAC
     if req.mode == "mutation" and req.role != "Admin":
-        log_audit(req.role, "Query", req.prompt, "Failed – Permission Denied")
+        await run_db(log_audit, req.role, "Query", req.prompt, "Failed – Permission Denied")
         return {"error": "You do not have permission to perform mutations."}
 
     # ══════════════════════════════════════════════
     # NoSQL path  (TinyDB — embedded, file-based)
     # ══════════════════════════════════════════════
     if req.db_type == "nosql":
-        schema = get_tinydb_schema()
+        with stage("schema"):
+            schema = await run_db(get_tinydb_schema)
 
         try:
-            query_obj = generate_nosql_query(req.prompt, schema, req.mode)
-            log_audit(req.role, "Generate NoSQL Query", req.prompt, "Success")
+            with stage("llm_generate"):
+                query_obj = await generate_nosql_query(req.prompt, schema, req.mode)
+            await run_db(log_audit, req.role, "Generate NoSQL Query", req.prompt, "Success")
         except Exception as e:
-            log_audit(req.role, "Generate NoSQL Query", req.prompt, f"Failed: {e}")
+            await run_db(log_audit, req.role, "Generate NoSQL Query", req.prompt, f"Failed: {e}")
             return {"error": str(e), "step": "LLM Generation"}
 
-        try:
-            # ── READ ──────────────────────────────
-            if req.mode == "query":
-                flt = query_obj.get("filter", {})
-                cond = tinydb_filter(flt)
-                if cond is None:
-                    docs = employees_table.all()
-                else:
-                    docs = employees_table.search(cond)
-
-                # Optional sort
-                sort_field = query_obj.get("sort")
-                if sort_field and docs:
-                    docs = sorted(docs, key=lambda d: d.get(sort_field, ""))
-
-                results = [dict(d) for d in docs]
-                insights = generate_insights(results, req.prompt) if results else ""
-                log_audit(req.role, "Execute NoSQL Query", str(query_obj), "Success")
-                return {
-                    "status": "success", "db_type": "nosql", "db_label": "TinyDB",
-                    "generated_query": query_obj,
-                    "results": results, "count": len(results), "insights": insights,
-                }
-
-            # ── MUTATION ──────────────────────────
-            else:
-                method = query_obj.get("method", "")
-                flt    = query_obj.get("filter", {})
-                cond   = tinydb_filter(flt)
-
-                if method == "insert":
-                    doc = query_obj.get("document", {})
-                    employees_table.insert(doc)
-                    msg = f"Inserted 1 document."
-
-                elif method == "update":
-                    upd = query_obj.get("update", {})
-                    
-                    # Fetch docs to update
-                    if cond is None:
-                        target_docs = employees_table.all()
-                    else:
-                        target_docs = employees_table.search(cond)
-                    
-                    # Apply smart update to each and save
-                    snapshot = []
-                    for doc in target_docs:
-                        doc_id = doc.doc_id
-                        snapshot.append(dict(doc) | {"__doc_id__": doc_id})
-                        new_doc = apply_smart_update(dict(doc), upd)
-                        employees_table.update(new_doc, doc_ids=[doc_id])
-                    
-                    msg = f"Updated {len(target_docs)} documents."
-
-                elif method == "delete":
-                    if cond is None:
-                        # Fetch snapshot before trunacting
-                        snapshot_docs = employees_table.all()
-                        snapshot = [dict(d) | {"__doc_id__": d.doc_id} for d in snapshot_docs]
-                        employees_table.truncate()
-                        msg = "All documents deleted."
-                    else:
-                        target_docs = employees_table.search(cond)
-                        snapshot = [dict(d) | {"__doc_id__": d.doc_id} for d in target_docs]
-                        employees_table.remove(cond)
-                        msg = "Matching documents deleted."
-                else:
-                    return {"error": f"Unknown method: {method!r}"}
-
-                log_audit(req.role, "NoSQL Mutation", str(query_obj), "Success", db_type="nosql", snapshot=snapshot)
-                return {"status": "success", "db_type": "nosql", "db_label": "TinyDB",
-                        "generated_query": query_obj, "message": msg,
-                        "results": [], "count": 0, "insights": ""}
-
-        except Exception as e:
-            log_audit(req.role, "Execute NoSQL Query", str(query_obj), f"Failed: {e}")
-            return {"error": str(e), "step": "TinyDB Execution"}
+        with stage("execute"):
+            resp = await run_db(_execute_nosql, req, query_obj)
+        if "error" not in resp:
+            _cache_nosql(req, schema, query_obj)
+        read_action, read_query = "Execute NoSQL Query", str(query_obj)
 
     # ══════════════════════════════════════════════
     # SQL path  (SQLite — embedded, file-based)
     # ══════════════════════════════════════════════
     elif req.db_type == "sql":
-        schema = get_sqlite_schema()
+        with stage("schema"):
+            schema = await run_db(get_sqlite_schema)
 
         try:
-            sql = generate_sql_query(req.prompt, schema, req.mode)
-            log_audit(req.role, "Generate SQL", req.prompt, "Success")
+            with stage("llm_generate"):
+                sql = await generate_sql_query(req.prompt, schema, req.mode)
+            await run_db(log_audit, req.role, "Generate SQL", req.prompt, "Success")
         except Exception as e:
-            log_audit(req.role, "Generate SQL", req.prompt, f"Failed: {e}")
+            await run_db(log_audit, req.role, "Generate SQL", req.prompt, f"Failed: {e}")
             return {"error": str(e), "step": "LLM SQL Generation"}
 
-        try:
-            con = get_sqlite_con()
-            cur = con.cursor()
-
-            # ── READ ──────────────────────────────
-            if req.mode == "query":
-                cur.execute(sql)
-                rows = cur.fetchall()
-                con.close()
-                results = [dict(r) for r in rows]
-                insights = generate_insights(results, req.prompt) if results else ""
-                log_audit(req.role, "Execute SQL", sql, "Success")
-                return {
-                    "status": "success", "db_type": "sql", "db_label": "SQLite",
-                    "generated_query": {"sql": sql},
-                    "results": results, "count": len(results), "insights": insights,
-                }
-
-            # ── MUTATION ──────────────────────────
-            else:
-                # Capture snapshot for SQL Undo (Zero-dependency)
-                cur.execute("SELECT * FROM employees")
-                snapshot = [dict(r) for r in cur.fetchall()]
-
-                cur.execute(sql)
-                affected = cur.rowcount
-                con.commit()
-                con.close()
-                action  = sql.strip().split()[0].upper()
-                log_audit(req.role, "SQL Mutation", sql, "Success", db_type="sql", snapshot=snapshot)
-                return {
-                    "status": "success", "db_type": "sql", "db_label": "SQLite",
-                    "generated_query": {"sql": sql},
-                    "message": f"{action} executed — {affected} row(s) affected.",
-                    "results": [], "count": 0, "insights": "",
-                }
-
-        except Exception as e:
-            log_audit(req.role, "Execute SQL", sql, f"Failed: {e}")
-            return {"error": str(e), "step": "SQLite Execution"}
+        # Literals → ? parameters: one prepared statement per query shape
+        norm = normalize_sql(sql)
+        if req.stream and req.mode == "query":
+            return StreamingResponse(_stream_sql(req, norm, schema), media_type="application/x-ndjson")
+        with stage("execute"):
+            resp = await run_db(_execute_sql, req, norm)
+        if "error" not in resp:
+            _cache_sql(req, schema, sql)
+        read_action, read_query = "Execute SQL", sql
 
     else:
         return {"error": f"Unknown db_type: {req.db_type!r}"}
 
+    if req.mode == "query" and "error" not in resp:
+        # Rows go back now; insights follow via /api/insights/{job_id}
+        results = resp["results"]
+        resp["insights_job_id"] = (
+            insight_jobs.submit(results[:2], len(results), req.prompt) if results else None
+        )
+        await run_db(log_audit, req.role, read_action, read_query, "Success",
+                     fingerprint=resp.get("fingerprint"))
+    return resp
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,128 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ─────────────────────────────────────────────────
+# Metrics  (Prometheus text exposition, no dependencies)
+# ─────────────────────────────────────────────────
+# Counters and histograms keyed by label values. Recording is a dict lookup,
+# a bisect and two additions under a per-metric lock (about a microsecond), so
+# it can stay on in production; cumulative buckets are only built by render().
+#
+# request_labels carries the current request's {"db_type", "mode"} so code
+# deep in the call stack (audit writes, LLM calls) can label its samples
+# without threading them through every signature.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+request_labels = ContextVar("request_labels", default={})
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._lock      = threading.Lock()
+        self._values    = {}
+
+    def _key(self, labels: dict) -> tuple:
+        """Explicit labels win, then the request's, else "none"."""
+        defaults = request_labels.get()
+        return tuple(str(labels[n] if n in labels else defaults.get(n, "none"))
+                     for n in self.labelnames)
+
+    def _labels(self, key, extra=()) -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        pairs += [f'{n}="{v}"' for n, v in extra]
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(k, list(v) if isinstance(v, list) else v) for k, v in self._values.items()]
+        for key, value in sorted(items):
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, key, value):
+        yield f"{self.name}{self._labels(key)} {_fmt(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)      # first bucket with le >= value
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                # per-bucket counts (+Inf last), then the sum
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, key, row):
+        total = 0
+        for le, n in zip(self.buckets + ("+Inf",), row):
+            total += n
+            le = le if le == "+Inf" else _fmt(float(le))
+            yield f"{self.name}_bucket{self._labels(key, [('le', le)])} {total}"
+        yield f"{self.name}_sum{self._labels(key)} {_fmt(row[-1])}"
+        yield f"{self.name}_count{self._labels(key)} {total}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
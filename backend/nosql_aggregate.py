@@ -0,0 +1,231 @@
+import heapq
+import json
+from itertools import islice
+
+from nosql_read import _sort_value, parse_sort, sort_key, project, _non_negative
+from predicates import compile_filter
+
+# ─────────────────────────────────────────────────
+# NoSQL aggregation pipeline  (MongoDB-style stage list)
+# ─────────────────────────────────────────────────
+#   {"$match":   {filter}}
+#   {"$group":   {"_id": "$department" | {"dept": "$department", ...} | null,
+#                 "avg_salary": {"$avg": "$salary_amount"}, "n": {"$count": {}}}}
+#                accumulators: $sum $avg $min $max $count
+#   {"$sort":    {"avg_salary": -1}}        (any sort spelling nosql_read accepts)
+#   {"$limit":   5}      {"$skip": 10}
+#   {"$project": {"department": "$_id", "avg_salary": 1, "_id": 0}}
+#   {"$count":   "total"}
+#
+# Stages are chained generators, so documents stream through $match/$project
+# one at a time and $group keeps only one accumulator row per group (hash
+# aggregation). A $sort followed by $limit keeps just the top rows on a heap.
+# Like MongoDB, $sum/$avg skip non-numeric values and $min/$max skip nulls.
+
+
+def _field_path(expr):
+    return expr[1:] if isinstance(expr, str) and expr.startswith("$") else None
+
+
+def _evaluate(expr, doc):
+    """'$field' / '$a.b' → the field value; anything else is a literal."""
+    path = _field_path(expr)
+    if path is None:
+        return expr
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+# ── $group accumulators: state = new(), add(state, value), result(state) ──
+class _Sum:
+    new = staticmethod(lambda: [0])
+    result = staticmethod(lambda s: s[0])
+
+    @staticmethod
+    def add(s, v):
+        if _is_number(v):
+            s[0] += v
+
+
+class _Avg:
+    new = staticmethod(lambda: [0, 0])
+    result = staticmethod(lambda s: s[0] / s[1] if s[1] else None)
+
+    @staticmethod
+    def add(s, v):
+        if _is_number(v):
+            s[0] += v
+            s[1] += 1
+
+
+class _Count:
+    new = staticmethod(lambda: [0])
+    result = staticmethod(lambda s: s[0])
+
+    @staticmethod
+    def add(s, v):
+        s[0] += 1
+
+
+class _Extreme:
+    def __init__(self, better):
+        self.better = better
+        self.new = lambda: [None, None]   # value, sort value
+        self.result = lambda s: s[0]
+
+    def add(self, s, v):
+        if v is None:
+            return
+        key = _sort_value(v)
+        if s[1] is None or self.better(key, s[1]):
+            s[0], s[1] = v, key
+
+
+ACCUMULATORS = {
+    "$sum":   _Sum,
+    "$avg":   _Avg,
+    "$count": _Count,
+    "$min":   _Extreme(lambda a, b: a < b),
+    "$max":   _Extreme(lambda a, b: a > b),
+}
+
+
+def _hashable(v):
+    if isinstance(v, dict):
+        return ("d",) + tuple((k, _hashable(x)) for k, x in v.items())
+    if isinstance(v, list):
+        return ("l",) + tuple(_hashable(x) for x in v)
+    try:
+        hash(v)
+        return v
+    except TypeError:
+        return json.dumps(v, sort_keys=True, default=str)
+
+
+def _group(docs, spec: dict):
+    if "_id" not in spec:
+        raise ValueError("$group needs an _id (use null for a single group)")
+    id_expr = spec["_id"]
+    fields = []
+    for name, acc in spec.items():
+        if name == "_id":
+            continue
+        if not isinstance(acc, dict) or len(acc) != 1:
+            raise ValueError(f"$group field {name!r} must be {{<accumulator>: <expr>}}")
+        (op, expr), = acc.items()
+        if op not in ACCUMULATORS:
+            raise ValueError(f"Unsupported accumulator: {op}")
+        fields.append((name, ACCUMULATORS[op], expr))
+
+    if isinstance(id_expr, dict):
+        def group_id(doc):
+            return {k: _evaluate(e, doc) for k, e in id_expr.items()}
+    else:
+        def group_id(doc):
+            return _evaluate(id_expr, doc)
+
+    groups = {}   # hashable key -> (_id value, [state per field])
+    for doc in docs:
+        gid = group_id(doc)
+        key = _hashable(gid)
+        entry = groups.get(key)
+        if entry is None:
+            entry = groups[key] = (gid, [acc.new() for _, acc, _ in fields])
+        states = entry[1]
+        for i, (_, acc, expr) in enumerate(fields):
+            acc.add(states[i], _evaluate(expr, doc))
+    for gid, states in groups.values():
+        row = {"_id": gid}
+        for (name, acc, _), state in zip(fields, states):
+            row[name] = acc.result(state)
+        yield row
+
+
+def _project(docs, spec):
+    if isinstance(spec, list) or not any(v for k, v in spec.items() if k != "_id"):
+        return (project(d, spec) for d in docs)     # field list / exclusions
+    # Inclusions and computed fields ({"department": "$_id"}); _id stays unless 0
+    keep_id = spec.get("_id", 1) not in (0, False)
+
+    def shape(doc):
+        out = {"_id": doc["_id"]} if keep_id and "_id" in doc else {}
+        for name, v in spec.items():
+            if name == "_id":
+                continue
+            if _field_path(v):
+                out[name] = _evaluate(v, doc)
+            elif v and name in doc:
+                out[name] = doc[name]
+        return out
+    return (shape(d) for d in docs)
+
+
+def _sort(docs, spec, limit=None):
+    key, reverse = sort_key(parse_sort(spec))
+    if limit is not None:
+        top = heapq.nlargest if reverse else heapq.nsmallest
+        return iter(top(limit, docs, key=key))
+    return iter(sorted(docs, key=key, reverse=reverse))
+
+
+def _count(docs, name):
+    if not isinstance(name, str) or not name or name.startswith("$"):
+        raise ValueError("$count needs an output field name")
+    yield {name: sum(1 for _ in docs)}
+
+
+def run_pipeline(pipeline: list, find) -> tuple:
+    """Run `pipeline`; `find(filter)` returns the documents matching a filter.
+
+    A leading $match is handed to `find` (indexes / columnar engine).
+    Returns (rows, plan) where plan is whatever `find` reported.
+    """
+    if not isinstance(pipeline, list):
+        raise ValueError("pipeline must be a list of stages")
+    stages = []
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise ValueError(f"Each pipeline stage needs exactly one operator: {stage!r}")
+        stages.append(next(iter(stage.items())))
+
+    flt = {}
+    if stages and stages[0][0] == "$match":
+        flt = stages.pop(0)[1] or {}
+    docs, plan = find(flt)
+    rows = iter(docs)
+
+    i = 0
+    while i < len(stages):
+        op, spec = stages[i]
+        if op == "$match":
+            cond = compile_filter(spec or {})
+            if cond is not None:
+                rows = filter(cond, rows)
+        elif op == "$group":
+            rows = _group(rows, spec)
+        elif op == "$sort":
+            limit = None
+            if i + 1 < len(stages) and stages[i + 1][0] == "$limit":
+                i += 1
+                limit = _non_negative(stages[i][1], "$limit")
+            rows = _sort(rows, spec, limit)
+        elif op == "$limit":
+            rows = islice(rows, _non_negative(spec, "$limit"))
+        elif op == "$skip":
+            rows = islice(rows, _non_negative(spec, "$skip"), None)
+        elif op == "$project":
+            rows = _project(rows, spec)
+        elif op == "$count":
+            rows = _count(rows, spec)
+        else:
+            raise ValueError(f"Unsupported pipeline stage: {op}")
+        i += 1
+    return list(rows), plan
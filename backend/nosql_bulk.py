@@ -0,0 +1,115 @@
+# ─────────────────────────────────────────────────
+# Bulk NoSQL mutations  (one read, one in-memory pass, one write)
+# ─────────────────────────────────────────────────
+# TinyDB's per-document update()/remove() each re-serialize the whole file.
+# These helpers compute every change against the raw table in one pass and
+# persist them together through write_docs(), so N matching documents cost a
+# single storage write; the undo snapshot plus the (doc_id, before, after)
+# change list are captured during that same pass.
+
+def write_docs(table, docs: dict):
+    """Persist {doc_id: doc or None (= delete)}.
+
+    Storages with a write_docs() hook (LogStorage) append just these
+    documents; any other storage gets one _update_table pass, i.e. a full
+    rewrite.
+    """
+    if not docs:
+        return
+    hook = getattr(table.storage, "write_docs", None)
+    if hook is not None:
+        hook(table.name, {str(doc_id): doc for doc_id, doc in docs.items()})
+        table.clear_cache()
+        return
+
+    def updater(table_docs):
+        last = next(reversed(table_docs), None)
+        reorder = False
+        for doc_id, doc in docs.items():
+            key = table.document_id_class(doc_id)
+            if doc is None:
+                table_docs.pop(key, None)
+                continue
+            # Keep the table in doc_id order so re-created docs don't move to the end
+            reorder |= last is not None and key not in table_docs and key < last
+            table_docs[key] = doc
+        if reorder:
+            ordered = sorted(table_docs.items())
+            table_docs.clear()
+            table_docs.update(ordered)
+
+    table._update_table(updater)
+
+
+def _raw_docs(table):
+    return table._read_table()   # {"doc_id": doc}, no per-document conversion
+
+
+def bulk_insert(table, doc: dict):
+    """Insert one document under the table's next doc id."""
+    doc_id = table._get_next_id()
+    write_docs(table, {doc_id: dict(doc)})
+    return [(doc_id, None, dict(doc))]
+
+
+def bulk_update(table, cond, update_fn):
+    """Apply update_fn(doc) -> new_doc to every doc matching cond (None = all)."""
+    snapshot, changes = [], []
+    for key, doc in _raw_docs(table).items():
+        if cond is not None and not cond(doc):
+            continue
+        doc_id  = table.document_id_class(key)
+        before  = dict(doc)
+        new_doc = update_fn(dict(doc))
+        snapshot.append(before | {"__doc_id__": doc_id})
+        changes.append((doc_id, before, new_doc))
+    write_docs(table, {doc_id: after for doc_id, _, after in changes})
+    return snapshot, changes
+
+
+def bulk_delete(table, cond):
+    """Remove every doc matching cond (None = all) without resetting doc ids."""
+    snapshot, changes = [], []
+    for key, doc in _raw_docs(table).items():
+        if cond is not None and not cond(doc):
+            continue
+        doc_id = table.document_id_class(key)
+        snapshot.append(dict(doc) | {"__doc_id__": doc_id})
+        changes.append((doc_id, dict(doc), None))
+    write_docs(table, {doc_id: None for doc_id, _, _ in changes})
+    return snapshot, changes
+
+
+def bulk_delete_ids(table, doc_ids):
+    """Remove the docs with these ids (missing ones are skipped)."""
+    snapshot, changes = [], []
+    docs = _raw_docs(table)
+    for doc_id in doc_ids:
+        before = docs.get(str(doc_id))
+        if before is None:
+            continue
+        snapshot.append(dict(before) | {"__doc_id__": doc_id})
+        changes.append((doc_id, dict(before), None))
+    write_docs(table, {doc_id: None for doc_id, _, _ in changes})
+    return snapshot, changes
+
+
+def bulk_restore(table, snapshot):
+    """Write snapshot documents back under their original doc ids.
+
+    Works for both updated and deleted documents (deleted ones are
+    re-created). Returns the change list of the restore itself.
+    """
+    changes, restored_docs = [], {}
+    docs = _raw_docs(table)
+    for saved in snapshot:
+        doc_id = saved.get("__doc_id__")
+        if doc_id is None:
+            continue
+        doc_id = table.document_id_class(doc_id)
+        restored = {k: v for k, v in saved.items() if k != "__doc_id__"}
+        before = restored_docs[doc_id] if doc_id in restored_docs else docs.get(str(doc_id))
+        restored_docs[doc_id] = restored
+        changes.append((doc_id, dict(before) if before is not None else None, restored))
+    write_docs(table, restored_docs)
+    return changes
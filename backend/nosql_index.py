@@ -0,0 +1,183 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# ─────────────────────────────────────────────────
+# Secondary indexes for the TinyDB collection
+# ─────────────────────────────────────────────────
+# Indexes only ever narrow the candidate set: the full filter predicate is
+# still applied to every candidate, so an index may return a superset but
+# must never miss a matching document.
+
+_MISSING = object()
+_RANGE_OPS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def _is_number(v) -> bool:
+    # bool is an int in Python and compares like one, so it is indexed too
+    return isinstance(v, (int, float)) and v == v   # v == v drops NaN
+
+
+class HashIndex:
+    """value -> {doc_id}; serves equality and $in."""
+    kind = "hash"
+
+    def __init__(self, field: str):
+        self.field   = field
+        self.buckets = {}
+
+    def add(self, doc_id, doc):
+        v = doc.get(self.field, _MISSING)
+        if v is not _MISSING and v.__hash__ is not None:
+            self.buckets.setdefault(v, set()).add(doc_id)
+
+    def remove(self, doc_id, doc):
+        v = doc.get(self.field, _MISSING)
+        if v is _MISSING or v.__hash__ is None:
+            return
+        ids = self.buckets.get(v)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self.buckets[v]
+
+    def _values(self, spec):
+        """Hashable lookup values for spec, or None if this index can't serve it."""
+        if not isinstance(spec, dict):
+            values = [spec]
+        elif set(spec) == {"$eq"}:
+            values = [spec["$eq"]]
+        elif "$in" in spec and isinstance(spec["$in"], list):
+            values = spec["$in"]
+        else:
+            return None
+        if any(v.__hash__ is None for v in values):
+            return None
+        return values
+
+    def estimate(self, spec):
+        values = self._values(spec)
+        if values is None:
+            return None
+        return sum(len(self.buckets.get(v, ())) for v in values)
+
+    def lookup(self, spec) -> set:
+        ids = set()
+        for v in self._values(spec):
+            ids |= self.buckets.get(v, set())
+        return ids
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "distinct_values": len(self.buckets),
+                "entries": sum(len(ids) for ids in self.buckets.values())}
+
+
+class SortedIndex:
+    """Sorted (value, doc_id) list over numeric values; serves ranges/equality."""
+    kind = "sorted"
+
+    def __init__(self, field: str):
+        self.field   = field
+        self.entries = []
+
+    def add(self, doc_id, doc):
+        v = doc.get(self.field, _MISSING)
+        if v is not _MISSING and _is_number(v):
+            insort(self.entries, (v, doc_id))
+
+    def remove(self, doc_id, doc):
+        v = doc.get(self.field, _MISSING)
+        if v is _MISSING or not _is_number(v):
+            return
+        i = bisect_left(self.entries, (v, doc_id))
+        if i < len(self.entries) and self.entries[i] == (v, doc_id):
+            del self.entries[i]
+
+    def _bounds(self, spec):
+        """(lo, hi) slice positions for spec, or None if it can't be served."""
+        if not isinstance(spec, dict):
+            spec = {"$eq": spec}
+        ops = {op: val for op, val in spec.items() if op in _RANGE_OPS or op == "$eq"}
+        if not ops or any(not _is_number(v) for v in ops.values()):
+            return None
+        lo, hi = 0, len(self.entries)
+        inf = float("inf")
+        for op, val in ops.items():
+            if op in ("$gt", "$gte", "$eq"):
+                key = (val, inf) if op == "$gt" else (val, -inf)
+                lo = max(lo, bisect_left(self.entries, key))
+            if op in ("$lt", "$lte", "$eq"):
+                key = (val, -inf) if op == "$lt" else (val, inf)
+                hi = min(hi, bisect_right(self.entries, key))
+        return lo, max(lo, hi)
+
+    def estimate(self, spec):
+        bounds = self._bounds(spec)
+        return None if bounds is None else bounds[1] - bounds[0]
+
+    def lookup(self, spec) -> set:
+        lo, hi = self._bounds(spec)
+        return {doc_id for _, doc_id in self.entries[lo:hi]}
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "entries": len(self.entries)}
+
+
+INDEX_TYPES = {"hash": HashIndex, "sorted": SortedIndex}
+
+
+class IndexManager:
+    """Declared indexes plus a tiny planner that picks the most selective one."""
+
+    def __init__(self, declared: dict):
+        self.indexes = {field: INDEX_TYPES[kind](field) for field, kind in declared.items()}
+        self._lock   = threading.RLock()
+
+    def rebuild(self, docs):
+        """docs: iterable of (doc_id, doc)."""
+        with self._lock:
+            self.indexes = {f: type(ix)(f) for f, ix in self.indexes.items()}
+            for doc_id, doc in docs:
+                for ix in self.indexes.values():
+                    ix.add(doc_id, doc)
+
+    def apply_changes(self, changes):
+        """Maintain every index from (doc_id, before, after) changes."""
+        with self._lock:
+            for doc_id, before, after in changes:
+                for ix in self.indexes.values():
+                    if before is not None:
+                        ix.remove(doc_id, before)
+                    if after is not None:
+                        ix.add(doc_id, after)
+
+    @staticmethod
+    def _conjuncts(filter_dict: dict):
+        """Top-level AND-ed (field, spec) pairs, including members of $and."""
+        for field, spec in filter_dict.items():
+            if field == "$and" and isinstance(spec, list):
+                for sub in spec:
+                    if isinstance(sub, dict):
+                        yield from IndexManager._conjuncts(sub)
+            elif not field.startswith("$"):
+                yield field, spec
+
+    def plan(self, filter_dict: dict):
+        """Return (plan, candidate_ids). candidate_ids is None for a full scan."""
+        if not filter_dict:
+            return {"type": "scan", "reason": "no filter"}, None
+        with self._lock:
+            best = None
+            for field, spec in self._conjuncts(filter_dict):
+                ix = self.indexes.get(field)
+                est = ix.estimate(spec) if ix is not None else None
+                if est is not None and (best is None or est < best[0]):
+                    best = (est, field, ix, spec)
+            if best is None:
+                return {"type": "scan", "reason": "no usable index"}, None
+            est, field, ix, spec = best
+            ids = ix.lookup(spec)
+        return {"type": "index", "index": field, "kind": ix.kind, "candidates": len(ids)}, ids
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {field: ix.stats() for field, ix in self.indexes.items()}
@@ -0,0 +1,128 @@
+import heapq
+import json
+import math
+from functools import total_ordering
+from itertools import islice
+
+# ─────────────────────────────────────────────────
+# NoSQL read options: sort, skip, limit, projection
+# ─────────────────────────────────────────────────
+# Applied to the documents a filter matched:
+#   sort       "field" | "-field" | ["a", "-b"] | {"a": 1, "b": -1} | [["a", -1]]
+#   skip/limit non-negative ints
+#   projection {"name": 1, "age": 1} (include) | {"salary_currency": 0} (exclude)
+#              | ["name", "age"]
+# With a sort and a limit only the top skip+limit documents are kept, on a
+# bounded heap (O(N log K)). Projection runs last, on the returned page only.
+#
+# Values of different types sort in a fixed order, so mixed fields never raise:
+# missing/null < numbers (bools included, NaN first) < strings < anything else.
+
+
+def _sort_value(v):
+    if v is None:
+        return (0, 0)
+    if isinstance(v, (int, float)):
+        return (1, -math.inf if v != v else v)
+    if isinstance(v, str):
+        return (2, v)
+    return (3, json.dumps(v, sort_keys=True, default=str))
+
+
+@total_ordering
+class _Desc:
+    """Inverts the ordering of a sort value (descending keys)."""
+    __slots__ = ("v",)
+
+    def __init__(self, v):
+        self.v = v
+
+    def __eq__(self, other):
+        return self.v == other.v
+
+    def __lt__(self, other):
+        return other.v < self.v
+
+
+def parse_sort(sort) -> list:
+    """Normalize every accepted sort spelling to [(field, 1 | -1)]."""
+    if not sort:
+        return []
+    if isinstance(sort, str):
+        return [(sort[1:], -1) if sort.startswith("-") else (sort, 1)]
+    if isinstance(sort, dict):
+        items = sort.items()
+    elif isinstance(sort, list):
+        items = []
+        for item in sort:
+            if isinstance(item, (list, tuple)) and len(item) == 2:
+                items.append(tuple(item))
+            else:
+                items.extend(parse_sort(item))
+    else:
+        raise ValueError(f"Unsupported sort: {sort!r}")
+    out = []
+    for field, direction in items:
+        if direction in (-1, "-1", "desc", "descending"):
+            out.append((field, -1))
+        else:
+            out.append((field, 1))
+    return out
+
+
+def sort_key(keys: list):
+    """(key function, reverse). A single direction sorts plain keys with
+    reverse=True; only mixed directions pay for _Desc wrappers."""
+    fields = [f for f, _ in keys]
+    if len({d for _, d in keys}) == 1:
+        if len(fields) == 1:
+            field = fields[0]
+            return (lambda doc: _sort_value(doc.get(field))), keys[0][1] == -1
+        return (lambda doc: tuple(_sort_value(doc.get(f)) for f in fields)), keys[0][1] == -1
+
+    def key(doc):
+        return tuple(_sort_value(doc.get(f)) if d == 1 else _Desc(_sort_value(doc.get(f)))
+                     for f, d in keys)
+    return key, False
+
+
+def project(doc: dict, projection) -> dict:
+    if not projection:
+        return dict(doc)
+    if isinstance(projection, list):
+        wanted = set(projection)
+        return {k: v for k, v in doc.items() if k in wanted}
+    included = {k for k, on in projection.items() if on}
+    if included:
+        return {k: v for k, v in doc.items() if k in included}
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+def _non_negative(value, name):
+    if value is None:
+        return None
+    n = int(value)
+    if n < 0:
+        raise ValueError(f"{name} must be >= 0")
+    return n
+
+
+def apply_read_options(docs, query_obj: dict):
+    """Sort/skip/limit/project `docs` per the query. Returns (results, total)
+    where total is the number of documents the filter matched."""
+    keys  = parse_sort(query_obj.get("sort"))
+    skip  = _non_negative(query_obj.get("skip"), "skip") or 0
+    limit = _non_negative(query_obj.get("limit"), "limit")
+    total = len(docs)
+    if keys:
+        key, reverse = sort_key(keys)
+        if limit is not None and skip + limit < total:
+            # nsmallest/nlargest match sorted(...)[:k] exactly, ties included
+            top = heapq.nlargest if reverse else heapq.nsmallest
+            docs = top(skip + limit, docs, key=key)
+        else:
+            docs = sorted(docs, key=key, reverse=reverse)
+    end = None if limit is None else skip + limit
+    page = islice(docs, skip, end)
+    projection = query_obj.get("projection")
+    return [project(d, projection) for d in page], total
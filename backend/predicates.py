@@ -0,0 +1,157 @@
+import functools
+import json
+import operator
+import re
+
+# ─────────────────────────────────────────────────
+# Compiled predicates for Mongo-style filters
+# ─────────────────────────────────────────────────
+# compile_filter() turns a filter dict into one flat Python function
+# `pred(doc) -> bool` (generated source, compiled once). Regexes are
+# precompiled, $in/$nin lists become frozensets, and compiled predicates are
+# cached by the canonical (key-sorted JSON) form of the filter.
+#
+# Semantics follow TinyDB's Query: a missing field or a type mismatch
+# (e.g. "abc" > 5) makes the comparison False rather than raising; $nin is the
+# negation of $in, so it matches documents missing the field; $regex is an
+# anchored, case-insensitive re.match.
+#
+# Supported: field equality, $eq $ne $gt $gte $lt $lte $in $nin $regex
+# $exists $not, and top-level $and / $or / $nor. Unknown operators are ignored.
+
+_M        = object()                                  # missing-field sentinel
+_NUM      = frozenset({int, float, bool})
+_SCALARS  = frozenset({str, int, float, bool, type(None)})
+_CMP_OPS  = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_PY_OPS   = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def _safe(op, v, c):
+    """Generic comparison with TinyDB's error semantics (slow path)."""
+    if v is _M:
+        return False
+    try:
+        return bool(op(v, c))
+    except (TypeError, KeyError):
+        return False
+
+
+class _Compiler:
+    def __init__(self):
+        self.consts = {}     # name -> value (bound as default args)
+        self.fields = {}     # field -> local variable name
+
+    def const(self, value, prefix="c"):
+        name = f"_{prefix}{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    def var(self, field):
+        if field not in self.fields:
+            self.fields[field] = f"v{len(self.fields)}"
+        return self.fields[field]
+
+    # ── filters ───────────────────────────────
+    def filter(self, flt):
+        """Expression for a filter dict, or None when it constrains nothing."""
+        parts = []
+        for key, spec in flt.items():
+            if key in ("$and", "$or", "$nor") and isinstance(spec, list):
+                subs = [self.filter(s) if isinstance(s, dict) else None for s in spec]
+                if key == "$and":
+                    parts.extend(s for s in subs if s is not None)
+                elif subs and None not in subs:   # an empty branch matches everything
+                    joined = "(" + " or ".join(subs) + ")"
+                    parts.append(joined if key == "$or" else f"not {joined}")
+                elif subs and key == "$nor":
+                    parts.append("False")
+            else:
+                part = self.field(key, spec)
+                if part is not None:
+                    parts.append(part)
+        if not parts:
+            return None
+        return parts[0] if len(parts) == 1 else "(" + " and ".join(parts) + ")"
+
+    def field(self, field, spec):
+        v = self.var(field)
+        if isinstance(spec, dict) and any(k.startswith("$") for k in spec):
+            parts = [p for p in (self.op(v, field, op, val) for op, val in spec.items()) if p]
+            if not parts:
+                return None
+            return parts[0] if len(parts) == 1 else "(" + " and ".join(parts) + ")"
+        return self.op(v, field, "$eq", spec)
+
+    def op(self, v, field, op, val):
+        if op == "$eq":
+            return f"({v} is not _M and {v} == {self.const(val)})"
+        if op == "$ne":
+            return f"({v} is not _M and {v} != {self.const(val)})"
+        if op in _CMP_OPS:
+            sym, c = _CMP_OPS[op], self.const(val)
+            if type(val) in _NUM:
+                return f"(type({v}) in _NUM and {v} {sym} {c})"
+            if type(val) is str:
+                return f"(type({v}) is str and {v} {sym} {c})"
+            return f"_safe({self.const(_PY_OPS[sym], 'op')}, {v}, {c})"
+        if op in ("$in", "$nin"):
+            expr = self._in(v, val)
+            return expr if op == "$in" else f"(not {expr})"
+        if op == "$regex":
+            rx = self.const(re.compile(val, re.IGNORECASE), "rx")
+            return f"(type({v}) is str and {rx}.match({v}) is not None)"
+        if op == "$exists":
+            return f"({v} is not _M)" if val else f"({v} is _M)"
+        if op == "$not":
+            inner = ({"$regex": val} if isinstance(val, str) else val)
+            sub = self.field(field, inner) if isinstance(inner, dict) else None
+            return f"(not {sub})" if sub else None
+        return None   # unknown operator — ignored, as before
+
+    def _in(self, v, val):
+        if isinstance(val, list) and all(type(x) in _SCALARS for x in val):
+            fs = self.const(frozenset(val), "fs")
+            # non-scalar doc values (lists/dicts) can never equal a scalar item
+            return f"(type({v}) in _SCALARS and {v} in {fs})"
+        return f"_safe({self.const(operator.contains, 'op')}, {self.const(val)}, {v})"
+
+    # ── code generation ───────────────────────
+    def build(self, flt):
+        expr = self.filter(flt)
+        if expr is None:
+            return None
+        env = {"_M": _M, "_NUM": _NUM, "_SCALARS": _SCALARS, "_safe": _safe, **self.consts}
+        args = ", ".join(f"{name}={name}" for name in env)
+        loads = "".join(f"    {var} = doc.get({field!r}, _M)\n" for field, var in self.fields.items())
+        src = f"def _pred(doc, *, {args}):\n{loads}    return {expr}\n"
+        ns = dict(env)
+        exec(compile(src, "<compiled filter>", "exec"), ns)
+        pred = ns["_pred"]
+        pred.source = src
+        return pred
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_canonical(key: str):
+    return _Compiler().build(json.loads(key))
+
+
+def compile_filter(filter_dict: dict):
+    """Filter dict → predicate(doc) -> bool, or None when it matches all docs.
+
+    Drop-in for the old TinyDB Query translator: the result can be passed to
+    Table.search()/remove() or called directly on a plain dict.
+    """
+    if not filter_dict:
+        return None
+    try:
+        key = json.dumps(filter_dict, sort_keys=True)
+    except (TypeError, ValueError):
+        return _Compiler().build(filter_dict)   # not JSON-able → compile uncached
+    return _compile_canonical(key)
+
+
+def cache_stats() -> dict:
+    info = _compile_canonical.cache_info()
+    return {"hits": info.hits, "misses": info.misses,
+            "size": info.currsize, "max_size": info.maxsize}
@@ -0,0 +1,93 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ─────────────────────────────────────────────────
+# NL → query cache  (LRU + TTL, schema-aware)
+# ─────────────────────────────────────────────────
+_WS_RE     = re.compile(r"\s+")
+_TRAIL_RE  = re.compile(r"[\s.?!;,]+$")
+_QUOTED_RE = re.compile(r"""("[^"]*"|'[^']*')""")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation. Quoted
+    literals are kept as typed: they end up in the query ('IT' vs 'it')."""
+    parts = _QUOTED_RE.split(prompt.strip())
+    text = "".join(part if i % 2 else _WS_RE.sub(" ", part.lower())
+                   for i, part in enumerate(parts))
+    return _TRAIL_RE.sub("", text)
+
+
+def schema_hash(schema: str) -> str:
+    return hashlib.sha1(schema.encode("utf-8")).hexdigest()[:16]
+
+
+class QueryCache:
+    """Bounded cache of LLM-generated queries.
+
+    Keys are (normalized prompt, mode, db_type, schema hash). When the schema
+    hash seen for a db_type changes, every entry built against the old schema
+    for that db_type is dropped.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl      = ttl
+        self._data    = OrderedDict()   # key -> (expires_at, value)
+        self._schemas = {}              # db_type -> last seen schema hash
+        self._lock    = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def make_key(self, prompt: str, mode: str, db_type: str, schema: str):
+        h = schema_hash(schema)
+        with self._lock:
+            old = self._schemas.get(db_type)
+            if old is not None and old != h:
+                stale = [k for k in self._data if k[2] == db_type]
+                for k in stale:
+                    del self._data[k]
+                self.invalidations += len(stale)
+            self._schemas[db_type] = h
+        return (normalize_prompt(prompt), mode, db_type, h)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < now:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data), "max_size": self.max_size, "ttl_seconds": self.ttl,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+            }
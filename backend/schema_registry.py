@@ -0,0 +1,122 @@
+import json
+import threading
+from collections import Counter
+
+# ─────────────────────────────────────────────────
+# Schema registry  (computed once, versioned, incrementally maintained)
+# ─────────────────────────────────────────────────
+class DocumentSchema:
+    """Union schema of a document collection, maintained incrementally.
+
+    Tracks, per field, how many documents carry each value type. A field is
+    nullable when some documents lack it or hold None. add()/remove() keep the
+    counts exact, so updates are remove(old) + add(new).
+    """
+
+    def __init__(self):
+        self.total  = 0
+        self.fields = {}   # field -> Counter(type name -> doc count)
+
+    def add(self, doc: dict):
+        self.total += 1
+        for k, v in doc.items():
+            self.fields.setdefault(k, Counter())[type(v).__name__] += 1
+
+    def remove(self, doc: dict):
+        self.total -= 1
+        for k, v in doc.items():
+            types = self.fields.get(k)
+            if types is None:
+                continue
+            t = type(v).__name__
+            types[t] -= 1
+            if types[t] <= 0:
+                del types[t]
+            if not types:
+                del self.fields[k]
+
+    def describe(self) -> dict:
+        """field -> type string, e.g. "int", "float | int", "str | null"."""
+        out = {}
+        for k, types in self.fields.items():
+            names = sorted(t for t in types if t != "NoneType")
+            nullable = "NoneType" in types or sum(types.values()) < self.total
+            out[k] = " | ".join(names + (["null"] if nullable else [])) or "null"
+        return out
+
+
+class SchemaRegistry:
+    """Caches the SQL and NoSQL schema strings between data-version changes.
+
+    `sql_loader()` returns the SQL schema string; `docs_loader()` returns an
+    iterable of every NoSQL document (only used for the initial/full build).
+    """
+
+    def __init__(self, sql_loader, docs_loader, empty_desc: str = ""):
+        self._sql_loader  = sql_loader
+        self._docs_loader = docs_loader
+        self._empty_desc  = empty_desc
+        self._lock        = threading.RLock()
+        self._sql_text    = None
+        self._docs        = None     # DocumentSchema, built lazily
+        self._nosql_text  = None
+        self.versions     = {"sql": 0, "nosql": 0}
+
+    # ── SQL ───────────────────────────────────
+    def sql_schema(self) -> str:
+        with self._lock:
+            if self._sql_text is None:
+                self._sql_text = self._sql_loader()
+            return self._sql_text
+
+    # ── NoSQL ─────────────────────────────────
+    def nosql_schema(self) -> str:
+        with self._lock:
+            if self._nosql_text is None:
+                docs = self._doc_schema()
+                self._nosql_text = (json.dumps(docs.describe(), indent=2)
+                                    if docs.total else self._empty_desc)
+            return self._nosql_text
+
+    def _doc_schema(self) -> DocumentSchema:
+        if self._docs is None:
+            docs = DocumentSchema()
+            for doc in self._docs_loader():
+                docs.add(doc)
+            self._docs = docs
+        return self._docs
+
+    def apply_changes(self, changes):
+        """Fold (doc_id, before, after) NoSQL changes into the union schema."""
+        with self._lock:
+            if self._docs is None:
+                return   # not built yet; the first read builds it from scratch
+            before_text = json.dumps(self._docs.describe(), sort_keys=True)
+            for _, before, after in changes:
+                if before is not None:
+                    self._docs.remove(before)
+                if after is not None:
+                    self._docs.add(after)
+            if json.dumps(self._docs.describe(), sort_keys=True) != before_text:
+                self._nosql_text = None
+                self.versions["nosql"] += 1
+
+    # ── Invalidation ──────────────────────────
+    def invalidate(self, db_type: str):
+        """Drop the cached schema for db_type (migrations, bulk reloads)."""
+        with self._lock:
+            if db_type == "sql":
+                self._sql_text = None
+            else:
+                self._docs = None
+                self._nosql_text = None
+            self.versions[db_type] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "versions": dict(self.versions),
+                "sql_cached": self._sql_text is not None,
+                "nosql_cached": self._nosql_text is not None,
+                "nosql_documents": self._docs.total if self._docs else None,
+            }
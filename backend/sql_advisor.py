@@ -0,0 +1,239 @@
+import threading
+import time
+
+from sql_lexer import tokenize, ident_name
+
+# ─────────────────────────────────────────────────
+# SQLite index advisor
+# ─────────────────────────────────────────────────
+# observe() is fed every executed statement with its execution time. It pulls
+# the columns the statement filters on (WHERE / ON / HAVING) and sorts by
+# (ORDER BY) and turns them into a candidate index per table:
+#     equality columns (sorted) + the first range column, or else the first
+#     ORDER BY column — at most MAX_COLUMNS columns.
+# EXPLAIN QUERY PLAN tells whether the table was fully scanned. A candidate
+# whose pattern caused `threshold` scans, and that no existing index already
+# covers, becomes a recommendation; with auto_create it is handed back to the
+# caller to build. Timings are kept per candidate before and after its index
+# exists, which gives the observed speedup.
+
+MAX_COLUMNS = 3
+
+_EQ_OPS    = {"=", "==", "IN", "IS"}
+_RANGE_OPS = {"<", ">", "<=", ">=", "BETWEEN", "LIKE", "GLOB"}
+# Keywords after which a predicate / ORDER BY list ends
+_CLAUSE_ENDS = {"SELECT", "FROM", "GROUP", "LIMIT", "OFFSET", "UNION", "EXCEPT",
+                "INTERSECT", "WINDOW", "RETURNING", "SET", "VALUES", "JOIN"}
+_NOT_ALIAS = _CLAUSE_ENDS | {"WHERE", "ON", "USING", "ORDER", "HAVING", "LEFT", "RIGHT",
+                             "FULL", "INNER", "OUTER", "CROSS", "NATURAL", "INDEXED", "NOT"}
+
+
+def _column_usage(tokens):
+    """(equality columns, range columns, order columns) in first-seen order;
+    a qualified `e.age` counts as `age`."""
+    eq, rng, order = [], [], []
+    state = None
+    for i, tok in enumerate(tokens):
+        word = tok.upper if tok.kind == "word" else None
+        if word in ("WHERE", "ON", "HAVING"):
+            state = "pred"
+            continue
+        if word == "ORDER" and i + 1 < len(tokens) and tokens[i + 1].upper == "BY":
+            state = "order"
+            continue
+        if word in _CLAUSE_ENDS:
+            state = None
+            continue
+        if state is None or tok.kind not in ("word", "ident"):
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1].text == ".":
+            continue                              # table qualifier
+        if i + 1 < len(tokens) and tokens[i + 1].text == "(":
+            continue                              # function call
+        name = ident_name(tok).lower()
+        if state == "order":
+            if name not in order and word not in ("BY", "ASC", "DESC", "NULLS", "FIRST",
+                                                  "LAST", "COLLATE"):
+                order.append(name)
+            continue
+        nxt = tokens[i + 1].upper if i + 1 < len(tokens) else ""
+        if nxt in _EQ_OPS and name not in eq:
+            eq.append(name)
+        elif nxt in _RANGE_OPS and name not in rng:
+            rng.append(name)
+    return eq, rng, order
+
+
+def _table_aliases(tokens, tables) -> dict:
+    """{name used in the plan: table} for the known tables the SQL mentions."""
+    names = {}
+    for i, tok in enumerate(tokens):
+        if tok.kind not in ("word", "ident") or ident_name(tok).lower() not in tables:
+            continue
+        table = tables[ident_name(tok).lower()]
+        names[table.lower()] = table
+        j = i + 1
+        if j < len(tokens) and tokens[j].upper == "AS":
+            j += 1
+        if (j < len(tokens) and tokens[j].kind in ("word", "ident")
+                and tokens[j].upper not in _NOT_ALIAS):
+            names[ident_name(tokens[j]).lower()] = table
+    return names
+
+
+class _Candidate:
+    __slots__ = ("table", "columns", "scans", "queries", "status", "error",
+                 "before", "after", "created_at")
+
+    def __init__(self, table, columns):
+        self.table, self.columns = table, columns
+        self.scans = self.queries = 0
+        self.status = "observed"     # → recommended → creating → created | failed | covered
+        self.error = None
+        self.before = [0, 0.0]       # executions, seconds (without the index)
+        self.after  = [0, 0.0]       # ... and once the index exists
+        self.created_at = None
+
+    @property
+    def name(self) -> str:
+        return "auto_idx_" + "_".join([self.table] + list(self.columns))
+
+    @property
+    def sql(self) -> str:
+        cols = ", ".join(f'"{c}"' for c in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON "{self.table}" ({cols})'
+
+
+class IndexAdvisor:
+    def __init__(self, threshold: int = 5, auto_create: bool = False):
+        self.threshold   = threshold
+        self.auto_create = auto_create
+        self._lock       = threading.Lock()
+        self._candidates = {}    # (table, columns) -> _Candidate
+        self._tables     = None  # {lowercase name: (name, {indexable column,...})}
+
+    def invalidate(self):
+        """Schema changed: re-read table columns on the next observe()."""
+        self._tables = None
+
+    def _schema(self, con) -> dict:
+        if self._tables is None:
+            tables = {}
+            for (name,) in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                       "AND name NOT LIKE 'sqlite%'"):
+                info = con.execute(f'PRAGMA table_info("{name}")').fetchall()
+                # An INTEGER PRIMARY KEY is the rowid: already the table's key
+                pks = [r for r in info if r[5]]
+                rowid = None
+                if len(pks) == 1 and pks[0][2].upper() == "INTEGER":
+                    rowid = pks[0][1].lower()
+                cols = {r[1].lower() for r in info} - {rowid}
+                tables[name.lower()] = (name, cols)
+            self._tables = tables
+        return self._tables
+
+    def _covered(self, con, cand) -> bool:
+        """An existing index already starts with the candidate's columns."""
+        want = list(cand.columns)
+        for idx in con.execute(f'PRAGMA index_list("{cand.table}")').fetchall():
+            cols = [r[2].lower() for r in con.execute(f'PRAGMA index_info("{idx[1]}")')
+                    if r[2] is not None]
+            if cols[:len(want)] == want:
+                return True
+        return False
+
+    def observe(self, con, sql: str, seconds: float, params=()) -> list:
+        """Record one executed statement (`params` bind its `?` placeholders).
+        Returns candidates the caller should create now (auto_create only);
+        build them with create()."""
+        tokens = tokenize(sql)
+        eq, rng, order = _column_usage(tokens)
+        if not (eq or rng or order):
+            return []
+        schema  = self._schema(con)
+        aliases = _table_aliases(tokens, {k: v[0] for k, v in schema.items()})
+        if not aliases:
+            return []
+        scanned = set()
+        for row in con.execute("EXPLAIN QUERY PLAN " + sql, params):
+            parts = row[3].split()
+            if parts[0] == "SCAN" and len(parts) > 1 and parts[1].lower() in aliases:
+                scanned.add(aliases[parts[1].lower()])
+
+        due = []
+        for table in set(aliases.values()):
+            cols = schema[table.lower()][1]
+            t_eq  = sorted(c for c in eq if c in cols)
+            t_rng = [c for c in rng if c in cols and c not in t_eq][:1]
+            t_ord = [c for c in order if c in cols and c not in t_eq][:1]
+            columns = tuple((t_eq + (t_rng or t_ord))[:MAX_COLUMNS])
+            if not columns:
+                continue
+            with self._lock:
+                cand = self._candidates.get((table, columns))
+                if cand is None:
+                    cand = self._candidates[(table, columns)] = _Candidate(table, columns)
+                cand.queries += 1
+                timing = cand.after if cand.status == "created" else cand.before
+                timing[0] += 1
+                timing[1] += seconds
+                if table not in scanned or cand.status != "observed":
+                    continue
+                cand.scans += 1
+                if cand.scans < self.threshold:
+                    continue
+            if self._covered(con, cand):
+                cand.status = "covered"
+                continue
+            with self._lock:
+                cand.status = "creating" if self.auto_create else "recommended"
+            if self.auto_create:
+                due.append(cand)
+        return due
+
+    def create(self, con, cand):
+        """Build a candidate's index on the writer connection `con`."""
+        try:
+            con.execute(cand.sql)
+            con.execute(f'ANALYZE "{cand.table}"')
+        except Exception as e:
+            with self._lock:
+                cand.status, cand.error = "failed", str(e)
+            raise
+        with self._lock:
+            cand.status, cand.created_at = "created", time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def create_recommended(self, con, name: str):
+        """Build a recommended index by name (manual apply)."""
+        with self._lock:
+            cand = next((c for c in self._candidates.values()
+                         if c.name == name and c.status in ("recommended", "failed")), None)
+            if cand is None:
+                return None
+            cand.status = "creating"
+        self.create(con, cand)
+        return cand
+
+    def report(self) -> dict:
+        def avg_ms(t):
+            return round(t[1] / t[0] * 1000, 3) if t[0] else None
+
+        out = {"recommended": [], "created": [], "observed": []}
+        with self._lock:
+            cands = sorted(self._candidates.values(), key=lambda c: -c.scans)
+            for c in cands:
+                before, after = avg_ms(c.before), avg_ms(c.after)
+                row = {"name": c.name, "table": c.table, "columns": list(c.columns),
+                       "sql": c.sql, "status": c.status, "queries": c.queries,
+                       "full_scans": c.scans, "avg_ms_before": before, "avg_ms_after": after}
+                if c.status in ("created", "creating", "failed"):
+                    row["created_at"] = c.created_at
+                    row["error"] = c.error
+                    row["speedup"] = round(before / after, 2) if before and after else None
+                    out["created"].append(row)
+                elif c.status == "recommended":
+                    out["recommended"].append(row)
+                elif c.status == "observed":
+                    out["observed"].append(row)
+        out["threshold"], out["auto_create"] = self.threshold, self.auto_create
+        return out
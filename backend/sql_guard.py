@@ -0,0 +1,179 @@
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────────
+# Runaway-query guard for generated SQL
+# ─────────────────────────────────────────────────
+# ExecutionBudget caps the SQLite VM instructions and the wall-clock time one
+# statement may spend executing. A progress handler runs every `check_every`
+# instructions and interrupts the statement once either budget is spent; the
+# clock only runs while SQLite is working, so a slow streaming client doesn't
+# use it up. With readonly=True an authorizer also denies anything that is not
+# a plain read (writes, temp objects, ATTACH, setting pragmas).
+#
+# estimate_cost() is the pre-flight: it reads EXPLAIN QUERY PLAN and estimates
+# the rows the plan visits. Nested loops multiply, correlated subqueries run
+# once per outer row, everything else adds. SQLite doesn't expose its planner
+# costs, so full scans count the table's rows, index equality lookups
+# SEARCH_ROWS, and index ranges a quarter of the table.
+
+SEARCH_ROWS = 10
+
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ,
+                 sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# Introspection pragmas (their argument names a table/index) and status
+# pragmas that are read-only only without an argument
+_READ_PRAGMAS   = {"table_info", "table_xinfo", "table_list", "index_list", "index_info",
+                   "index_xinfo", "foreign_key_list", "database_list", "collation_list",
+                   "function_list", "module_list", "pragma_list", "compile_options"}
+_STATUS_PRAGMAS = {"page_count", "page_size", "freelist_count", "user_version",
+                   "schema_version", "encoding"}
+
+_ACTION_NAMES = {getattr(sqlite3, "SQLITE_" + n): n for n in (
+    "CREATE_INDEX", "CREATE_TABLE", "CREATE_TEMP_INDEX", "CREATE_TEMP_TABLE",
+    "CREATE_TEMP_TRIGGER", "CREATE_TEMP_VIEW", "CREATE_TRIGGER", "CREATE_VIEW",
+    "DELETE", "DROP_INDEX", "DROP_TABLE", "DROP_TEMP_INDEX", "DROP_TEMP_TABLE",
+    "DROP_TEMP_TRIGGER", "DROP_TEMP_VIEW", "DROP_TRIGGER", "DROP_VIEW", "INSERT",
+    "PRAGMA", "TRANSACTION", "UPDATE", "ATTACH", "DETACH", "ALTER_TABLE", "REINDEX",
+    "ANALYZE", "CREATE_VTABLE", "DROP_VTABLE", "SAVEPOINT")}
+
+
+class QueryAborted(Exception):
+    """A statement was stopped by the guard. `reason` is one of
+    "steps", "time", "plan" or "read_only"."""
+
+    def __init__(self, reason: str, message: str, **details):
+        super().__init__(message)
+        self.reason  = reason
+        self.details = details
+
+    def to_dict(self) -> dict:
+        return {"reason": self.reason, "message": str(self), **self.details}
+
+
+class ExecutionBudget:
+    def __init__(self, max_steps: int, max_seconds: float, check_every: int = 10000):
+        self.max_steps   = max_steps
+        self.max_seconds = max_seconds
+        self.check_every = check_every
+        self.steps   = 0
+        self.elapsed = 0.0
+        self._tripped = None   # "steps" / "time" once the handler interrupts
+        self._denied  = None   # what the authorizer refused
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action in _READ_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA:
+            name = arg1.lower()
+            if name in _READ_PRAGMAS or (arg2 is None and name in _STATUS_PRAGMAS):
+                return sqlite3.SQLITE_OK
+        self._denied = " ".join(filter(None, (_ACTION_NAMES.get(action, str(action)), arg1)))
+        return sqlite3.SQLITE_DENY
+
+    @contextmanager
+    def attach(self, con, readonly: bool = False):
+        """Enforce the budget on `con` for the statements run in this block.
+        Time and steps carry over between blocks (e.g. stream batches)."""
+        started  = time.perf_counter()
+        deadline = started + self.max_seconds - self.elapsed
+
+        def progress():
+            self.steps += self.check_every
+            if self.steps > self.max_steps:
+                self._tripped = "steps"
+            elif time.perf_counter() > deadline:
+                self._tripped = "time"
+            return 1 if self._tripped else 0
+
+        con.set_progress_handler(progress, self.check_every)
+        if readonly:
+            con.set_authorizer(self._authorize)
+        try:
+            try:
+                yield self
+            finally:
+                self.elapsed += time.perf_counter() - started
+        except sqlite3.DatabaseError as e:
+            raise self._translate(e) from e
+        finally:
+            con.set_progress_handler(None, 0)
+            if readonly:
+                con.set_authorizer(None)
+
+    def _translate(self, error):
+        if self._tripped == "steps":
+            return QueryAborted("steps", f"Query aborted: exceeded the budget of "
+                                f"{self.max_steps:,} SQLite VM steps",
+                                limit=self.max_steps, steps=self.steps)
+        if self._tripped == "time":
+            return QueryAborted("time", f"Query aborted: exceeded the "
+                                f"{self.max_seconds:g}s execution time budget",
+                                limit=self.max_seconds, seconds=round(self.elapsed, 3))
+        if self._denied:
+            return QueryAborted("read_only", f"Query mode is read-only: "
+                                f"{self._denied} is not allowed", denied=self._denied)
+        return error
+
+    def stats(self) -> dict:
+        return {"steps": self.steps, "seconds": round(self.elapsed, 4)}
+
+
+# ── Plan pre-flight ───────────────────────────
+_RANGE = re.compile(r"[<>]|\bBETWEEN\b")
+
+
+def _table_rows(con, tables) -> dict:
+    rows = {}
+    for name in tables:
+        ident = '"' + name.replace('"', '""') + '"'
+        try:
+            rows[name] = con.execute(f"SELECT max(rowid) FROM {ident}").fetchone()[0] or 0
+        except sqlite3.DatabaseError:   # WITHOUT ROWID
+            rows[name] = con.execute(f"SELECT count(*) FROM {ident}").fetchone()[0]
+    return rows
+
+
+def _loop_rows(detail: str, sizes: dict, default: int) -> int:
+    parts = detail.split()
+    if parts[:2] == ["SCAN", "CONSTANT"]:
+        return 1
+    # "SCAN e", "SEARCH t2 USING ...": the name may be an alias or CTE
+    n = sizes.get(parts[1], default) if len(parts) > 1 else default
+    if parts[0] == "SCAN":
+        return max(n, 1)
+    if "(rowid=?)" in detail or ("PRIMARY KEY" in detail and not _RANGE.search(detail)):
+        return 1
+    if _RANGE.search(detail):
+        return max(n // 4, 1)
+    return min(SEARCH_ROWS, max(n, 1))
+
+
+def estimate_cost(con, sql: str, params=()) -> dict:
+    """Estimated rows visited by `sql` from its query plan (no execution)."""
+    plan = con.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    tables = [r[0] for r in con.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite%'")]
+    sizes = _table_rows(con, tables)
+    default = max(sizes.values(), default=1)   # aliases / CTEs: assume the largest
+
+    children = {}
+    for node_id, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node_id, detail))
+
+    def cost(parent):
+        outer, loops, extra = 1, False, 0
+        for node_id, detail in children.get(parent, ()):
+            if detail.startswith(("SCAN ", "SEARCH ")):
+                outer *= _loop_rows(detail, sizes, default)
+                loops = True
+                extra += cost(node_id)
+            elif detail.startswith("CORRELATED"):
+                extra += outer * cost(node_id)
+            else:
+                extra += cost(node_id)
+        return (outer if loops else 0) + extra
+
+    return {"cost": cost(0), "tables": sizes, "plan": [row[3] for row in plan]}
@@ -0,0 +1,49 @@
+import re
+from typing import NamedTuple
+
+# ─────────────────────────────────────────────────
+# Minimal SQLite tokenizer
+# ─────────────────────────────────────────────────
+# Enough of SQLite's lexical grammar to tell literals, identifiers, keywords
+# and operators apart, so callers never mistake text inside a string literal
+# or a comment for SQL. Whitespace and comments are dropped.
+
+class Token(NamedTuple):
+    kind: str    # string | blob | number | param | ident | word | op | other
+    text: str
+    pos:  int = 0   # offset in the source SQL
+
+    @property
+    def upper(self) -> str:
+        return self.text.upper()
+
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:[^']|'')*'?)
+  | (?P<blob>[xX]'[0-9a-fA-F]*')
+  | (?P<ident>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<param>\?\d*|[:@$][A-Za-z_]\w*)
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<op><=|>=|==|!=|<>|\|\||<<|>>|->>|->|[-+*/%<>=~&|(),.;])
+  | (?P<other>.)
+""", re.S | re.X)
+
+
+def tokenize(sql: str) -> list:
+    out = []
+    for m in _TOKEN.finditer(sql):
+        kind = m.lastgroup
+        if kind not in ("ws", "comment"):
+            out.append(Token(kind, m.group(), m.start()))
+    return out
+
+
+def ident_name(tok: Token) -> str:
+    """Column/table name of a bare or quoted identifier token."""
+    if tok.kind != "ident":
+        return tok.text
+    quote, body = tok.text[0], tok.text[1:-1]
+    return body if quote == "[" else body.replace(quote * 2, quote)
@@ -0,0 +1,151 @@
+import hashlib
+from typing import NamedTuple
+
+from sql_lexer import tokenize
+
+# ─────────────────────────────────────────────────
+# Literal parameterization of generated SQL
+# ─────────────────────────────────────────────────
+# `... WHERE salary_amount > 80000` → `... WHERE salary_amount > ?`, (80000,)
+# Keywords are upper-cased and whitespace is canonical, so structurally
+# identical statements share one text: one prepared statement in SQLite's
+# statement cache, and one fingerprint for grouping query shapes.
+#
+# Literals stay inline where a parameter would change meaning or not parse:
+#   - the result-column list (SQLite names unaliased columns after its exact
+#     text, so it is kept verbatim)
+#   - ORDER BY / GROUP BY ordinals, `AS 'alias'`, type sizes in CAST(x AS T(n)),
+#     window frame offsets, hex and blob literals, out-of-range integers
+#   - anything that isn't SELECT / WITH / VALUES / INSERT / UPDATE / DELETE /
+#     REPLACE (DDL and PRAGMA take no parameters), and SQL that already has them
+
+KEYWORDS = frozenset("""
+ABORT ACTION ADD AFTER ALL ALTER ALWAYS ANALYZE AND AS ASC ATTACH AUTOINCREMENT
+BEFORE BEGIN BETWEEN BY CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT
+CONSTRAINT CREATE CROSS CURRENT CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP
+DATABASE DEFAULT DEFERRABLE DEFERRED DELETE DESC DETACH DISTINCT DO DROP EACH
+ELSE END ESCAPE EXCEPT EXCLUDE EXCLUSIVE EXISTS EXPLAIN FAIL FILTER FIRST
+FOLLOWING FOR FOREIGN FROM FULL GENERATED GLOB GROUP GROUPS HAVING IF IGNORE
+IMMEDIATE IN INDEX INDEXED INITIALLY INNER INSERT INSTEAD INTERSECT INTO IS
+ISNULL JOIN KEY LAST LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT NOTHING
+NOTNULL NULL NULLS OF OFFSET ON OR ORDER OTHERS OUTER OVER PARTITION PLAN
+PRAGMA PRECEDING PRIMARY QUERY RAISE RANGE RECURSIVE REFERENCES REGEXP REINDEX
+RELEASE RENAME REPLACE RESTRICT RETURNING RIGHT ROLLBACK ROW ROWS SAVEPOINT
+SELECT SET TABLE TEMP TEMPORARY THEN TIES TO TRANSACTION TRIGGER UNBOUNDED
+UNION UNIQUE UPDATE USING VACUUM VALUES VIEW VIRTUAL WHEN WHERE WINDOW WITH
+WITHOUT TRUE FALSE
+""".split())
+
+_DML = {"SELECT", "WITH", "VALUES", "INSERT", "UPDATE", "DELETE", "REPLACE"}
+# End an ORDER BY / GROUP BY list at the same nesting depth
+_LIST_ENDS = {"LIMIT", "HAVING", "WINDOW", "UNION", "EXCEPT", "INTERSECT", "ORDER"}
+_MAX_INT = 2 ** 63 - 1
+
+
+class NormalizedSQL(NamedTuple):
+    sql:         str     # as generated
+    text:        str     # canonical, literals lifted to ?
+    params:      tuple
+    fingerprint: str     # short hash of `text`
+
+
+def _literal_value(tok):
+    if tok.kind == "string":
+        if len(tok.text) < 2 or not tok.text.endswith("'"):
+            return None                              # unterminated
+        return tok.text[1:-1].replace("''", "'")
+    if tok.text[:2].lower() == "0x":
+        return None
+    if any(c in tok.text for c in ".eE"):
+        return float(tok.text)
+    n = int(tok.text)
+    return n if n <= _MAX_INT else None
+
+
+def _join(parts) -> str:
+    out, prev = [], None
+    for kind, text in parts:
+        tight = prev is not None and (
+            text in (",", ")", ".") or prev[1] in ("(", ".")
+            or (text == "(" and prev[0] in ("word", "ident") and prev[1] not in KEYWORDS))
+        if prev is not None and not tight:
+            out.append(" ")
+        out.append(text)
+        prev = (kind, text)
+    return "".join(out)
+
+
+def normalize_sql(sql: str) -> NormalizedSQL:
+    tokens = tokenize(sql)
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    first = tokens[0].upper if tokens else ""
+    if first not in _DML or any(t.kind == "param" for t in tokens):
+        # Run as generated; only the fingerprint sees collapsed whitespace
+        return NormalizedSQL(sql, sql, (), _fingerprint(" ".join(sql.split())))
+
+    parts, params = [], []
+    depth = 0
+    columns_at = columns_from = None   # result-column list being copied verbatim
+    by_list_at = None                  # depth of the current ORDER/GROUP BY list
+    type_paren_at = None               # depth of a CAST(... AS T(n)) size paren
+    n = len(tokens)
+    for i, tok in enumerate(tokens):
+        word = tok.upper if tok.kind == "word" else None
+        prev = tokens[i - 1] if i else None
+        nxt = tokens[i + 1] if i + 1 < n else None
+
+        if columns_at is not None:
+            ends = tok.text == ";" or (depth == columns_at and (
+                tok.text == ")" or word in ("FROM", "WHERE", "GROUP", "ORDER", "LIMIT",
+                                            "WINDOW", "UNION", "EXCEPT", "INTERSECT")))
+            if not ends:
+                depth += (tok.text == "(") - (tok.text == ")")
+                continue
+            parts.append(("verbatim", sql[columns_from:tok.pos].strip()))
+            columns_at = None
+
+        if tok.text == "(":
+            depth += 1
+            if prev is not None and prev.kind == "word" and i >= 2 and tokens[i - 2].upper == "AS":
+                type_paren_at = depth
+        elif tok.text == ")":
+            if type_paren_at == depth:
+                type_paren_at = None
+            if by_list_at == depth:
+                by_list_at = None
+            depth -= 1
+        elif word == "BY" and prev.upper in ("ORDER", "GROUP"):
+            by_list_at = depth
+        elif word in _LIST_ENDS and by_list_at == depth:
+            by_list_at = None
+
+        if tok.kind in ("string", "number"):
+            ordinal = (tok.kind == "number" and by_list_at == depth
+                       and (prev.text == "," or prev.upper == "BY"))
+            keep = (ordinal or type_paren_at is not None
+                    or (prev is not None and prev.upper == "AS")
+                    or (nxt is not None and nxt.upper in ("PRECEDING", "FOLLOWING")))
+            value = None if keep else _literal_value(tok)
+            if value is not None:
+                params.append(value)
+                parts.append(("param", "?"))
+            else:
+                parts.append((tok.kind, tok.text))
+        elif word is not None:
+            parts.append(("word", word if word in KEYWORDS else tok.text))
+        else:
+            parts.append((tok.kind, tok.text))
+
+        if word == "SELECT" and nxt is not None:
+            columns_at, columns_from = depth, nxt.pos
+    if columns_at is not None:
+        end = tokens[-1].pos + len(tokens[-1].text)
+        parts.append(("verbatim", sql[columns_from:end].strip()))
+
+    text = _join(parts)
+    return NormalizedSQL(sql, text, tuple(params), _fingerprint(text))
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
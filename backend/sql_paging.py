@@ -0,0 +1,77 @@
+from sql_lexer import tokenize
+
+# ─────────────────────────────────────────────────
+# Keyset paging for generated SELECTs
+# ─────────────────────────────────────────────────
+# Re-running a read with LIMIT ? OFFSET ? for every page makes SQLite step
+# over all earlier rows again, so reading n rows page by page costs O(n²).
+# A plain single-table SELECT instead gets the table's rowid as a key column
+#   SELECT rowid AS _page_key, <columns> FROM employees WHERE ...
+# and each page is
+#   SELECT * FROM (<that>) WHERE _page_key > ? ORDER BY _page_key LIMIT ?
+# which SQLite flattens into a seek on the rowid (or on an index + rowid), so
+# a page costs the same wherever it starts. Rows come back in rowid order,
+# the same order every page, and `_page_key` is stripped from the results.
+#
+# Anything else (joins, GROUP BY, DISTINCT, ORDER BY, LIMIT, compound
+# selects, window functions, CTEs) has no single rowid to key on and keeps
+# OFFSET paging, bounded by the read row cap.
+
+PAGE_KEY = "_page_key"
+
+# Clauses at the top level that rule out keying on the rowid
+_NO_KEYSET = {"GROUP", "ORDER", "LIMIT", "UNION", "EXCEPT", "INTERSECT", "WINDOW",
+              "HAVING", "JOIN", "OVER", "VALUES"}
+
+
+def keyset_form(sql: str):
+    """`sql` with a rowid key column in front, or None when it can't be
+    keyset-paged."""
+    body = sql.strip().rstrip(";").strip()
+    tokens = tokenize(body)
+    if not tokens or tokens[0].upper != "SELECT":
+        return None
+    if len(tokens) > 1 and tokens[1].upper in ("DISTINCT", "ALL"):
+        return None
+    depth, source, where = 0, None, False   # source: tokens after the top-level FROM
+    for tok in tokens[1:]:
+        if tok.text == "(":
+            if depth == 0 and source is not None and not where:
+                return None    # subquery or table-valued function
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif tok.kind == "word" and tok.upper == "OVER":
+            return None
+        elif depth == 0:
+            if tok.kind == "word" and tok.upper in _NO_KEYSET:
+                return None
+            if tok.kind == "word" and tok.upper == "FROM" and source is None:
+                source = []
+            elif tok.kind == "word" and tok.upper == "WHERE":
+                where = True
+            elif source is not None and not where:
+                source.append(tok)
+    if not source or source[0].kind not in ("word", "ident"):
+        return None
+    # table [AS] [alias] only: a comma or a second name means more than one table
+    rest = [t for t in source[1:] if t.upper != "AS"]
+    if any(t.text in (",", ".") for t in source) or len(rest) > 1:
+        return None
+    head = tokens[0]
+    cut = head.pos + len(head.text)
+    return f"{body[:cut]} rowid AS {PAGE_KEY},{body[cut:]}"
+
+
+def keyset_select(keyed_sql: str, after, limit: int):
+    """Wrap a keyset_form() SELECT: rows keyed above `after` (None: from the
+    start), at most `limit` of them. Returns (sql, params to append)."""
+    if after is None:
+        return f"SELECT * FROM ({keyed_sql}) ORDER BY {PAGE_KEY} LIMIT ?", (limit,)
+    return (f"SELECT * FROM ({keyed_sql}) WHERE {PAGE_KEY} > ? ORDER BY {PAGE_KEY} LIMIT ?",
+            (after, limit))
+
+
+def split_key(row) -> tuple:
+    """sqlite3.Row from a keyset page → (key, row dict without the key)."""
+    return row[PAGE_KEY], {k: row[k] for k in row.keys() if k != PAGE_KEY}
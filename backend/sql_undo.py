@@ -0,0 +1,98 @@
+import json
+
+# ─────────────────────────────────────────────────
+# SQL undo  (targeted before-images via temp triggers)
+# ─────────────────────────────────────────────────
+# Temporary triggers on the writer connection copy the before-image of every
+# row a statement touches into a temp table, inside the same transaction. A
+# mutation's undo record is therefore only the rows it changed:
+#   {"op": "insert" | "update" | "delete", "rowid": ..., "row": {...} | None}
+# and undo replays those records in reverse order. JSON has no binary type, so
+# BLOB values are captured as {"$blob": "<hex>"} and decoded on restore.
+#
+# Temp objects are per-connection and never touch the database file.
+
+UNDO_TABLE = "_undo_log"
+_OPS = ("insert", "update", "delete")
+_BLOB = "$blob"
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def install_undo_triggers(con, table: str = "employees"):
+    """(Re)create the capture triggers for `table` on this connection.
+
+    Call again after DDL on the table so new columns are captured.
+    """
+    con.execute(f"CREATE TEMP TABLE IF NOT EXISTS {UNDO_TABLE} "
+                "(seq INTEGER PRIMARY KEY, tbl TEXT, op TEXT, rid INTEGER, old TEXT)")
+    for op in _OPS:
+        con.execute(f"DROP TRIGGER IF EXISTS temp.{_ident(f'_undo_{table}_{op}')}")
+    cols = [r[1] for r in con.execute(f"PRAGMA main.table_info({_ident(table)})")]
+    if not cols:
+        return   # table doesn't exist (yet)
+    old = "json_object(" + ", ".join(
+        "'{0}', CASE WHEN typeof(OLD.{1}) = 'blob' THEN json_object('{2}', hex(OLD.{1})) "
+        "ELSE OLD.{1} END".format(c.replace("'", "''"), _ident(c), _BLOB) for c in cols) + ")"
+    tbl = table.replace("'", "''")
+    bodies = {
+        "insert": f"VALUES ('{tbl}', 'insert', NEW.rowid, NULL)",
+        # keyed by the new rowid so an UPDATE of the primary key is reversible
+        "update": f"VALUES ('{tbl}', 'update', NEW.rowid, {old})",
+        "delete": f"VALUES ('{tbl}', 'delete', OLD.rowid, {old})",
+    }
+    for op, values in bodies.items():
+        con.execute(
+            f"CREATE TEMP TRIGGER {_ident(f'_undo_{table}_{op}')} "
+            f"AFTER {op.upper()} ON main.{_ident(table)} BEGIN "
+            f"INSERT INTO {UNDO_TABLE} (tbl, op, rid, old) {values}; END")
+
+
+def start_capture(con):
+    """Discard before-images left over from earlier statements."""
+    con.execute(f"DELETE FROM temp.{UNDO_TABLE}")
+
+
+def collect_before_images(con) -> list:
+    """Before-images captured since start_capture(), in statement order."""
+    rows = con.execute(f"SELECT tbl, op, rid, old FROM temp.{UNDO_TABLE} ORDER BY seq").fetchall()
+    con.execute(f"DELETE FROM temp.{UNDO_TABLE}")
+    return [{"table": tbl, "op": op, "rowid": rid, "row": json.loads(old) if old else None}
+            for tbl, op, rid, old in rows]
+
+
+def _decode(value):
+    if isinstance(value, dict) and len(value) == 1 and _BLOB in value:
+        return bytes.fromhex(value[_BLOB])
+    return value
+
+
+def restore_before_images(con, changes: list) -> dict:
+    """Reverse `changes` (newest first).
+
+    Returns {"restored": n, "missing": [...]}: changes whose row no longer
+    exists (deleted, or its key changed since) match nothing and are listed
+    as {"table", "op", "rowid"} instead of being silently skipped.
+    """
+    restored, missing = 0, []
+    for ch in reversed(changes):
+        table = _ident(ch["table"])
+        row = {c: _decode(v) for c, v in (ch["row"] or {}).items()}
+        if ch["op"] == "insert":
+            cur = con.execute(f"DELETE FROM {table} WHERE rowid = ?", (ch["rowid"],))
+        elif ch["op"] == "update":
+            sets = ", ".join(f"{_ident(c)} = ?" for c in row)
+            cur = con.execute(f"UPDATE {table} SET {sets} WHERE rowid = ?",
+                              [*row.values(), ch["rowid"]])
+        else:
+            cols = ", ".join(_ident(c) for c in row)
+            marks = ", ".join("?" * len(row))
+            cur = con.execute(f"INSERT INTO {table} ({cols}) VALUES ({marks})", list(row.values()))
+        if cur.rowcount:
+            restored += 1
+        else:
+            missing.append({"table": ch["table"], "op": ch["op"], "rowid": ch["rowid"]})
+    start_capture(con)   # the restore itself was captured; drop it
+    return {"restored": restored, "missing": missing}
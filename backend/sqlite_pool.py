@@ -0,0 +1,158 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# ─────────────────────────────────────────────────
+# SQLite connection pool  (WAL, one writer + read-only readers)
+# ─────────────────────────────────────────────────
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",     # durable at checkpoints; safe with WAL
+    "PRAGMA cache_size=-65536",      # 64 MiB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MiB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+READER_PRAGMAS = (
+    "PRAGMA cache_size=-32768",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA query_only=ON",
+)
+
+
+class PoolTimeout(RuntimeError):
+    """No reader came free within the pool's `reader_timeout`."""
+
+
+class SQLitePool:
+    """Thread-safe pool: a single writer connection and up to `readers`
+    read-only connections. In WAL mode readers never block on the writer.
+
+    Connections are opened lazily (the writer eagerly, so WAL is switched on
+    before any reader attaches) and reused for the life of the process.
+    With a `reader_timeout`, a reader checkout waits at most that long and
+    then raises PoolTimeout; the writer is always waited for.
+    """
+
+    def __init__(self, path: str, readers: int = 4, cached_statements: int = 512,
+                 busy_timeout: float = 5.0, reader_timeout: float = None, on_connect=None):
+        self.path              = path
+        self.max_readers       = readers
+        self.cached_statements = cached_statements
+        self.busy_timeout      = busy_timeout
+        self.reader_timeout    = reader_timeout
+        self.on_connect        = on_connect    # optional hook(con, readonly)
+        self._readers   = queue.LifoQueue()
+        self._writers   = queue.LifoQueue(maxsize=1)
+        self._lock      = threading.Lock()
+        self._n_readers = 0
+        self._closed    = False
+        self._stats     = {"reader_checkouts": 0, "writer_checkouts": 0,
+                           "reader_waits": 0, "writer_waits": 0, "reader_timeouts": 0,
+                           "wait_seconds": 0.0}
+        self._writers.put(self._open(readonly=False))
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        if readonly:
+            uri = f"file:{pathname2url(self.path)}?mode=ro"
+            con = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout,
+                                  check_same_thread=False,
+                                  cached_statements=self.cached_statements)
+            pragmas = READER_PRAGMAS
+        else:
+            con = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                  check_same_thread=False,
+                                  cached_statements=self.cached_statements)
+            pragmas = WRITER_PRAGMAS
+        con.row_factory = sqlite3.Row
+        for pragma in pragmas:
+            con.execute(pragma)
+        if self.on_connect:
+            self.on_connect(con, readonly)
+        return con
+
+    def _checkout(self, q: queue.LifoQueue, kind: str) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("SQLite pool is closed")
+        self._count(f"{kind}_checkouts")
+        try:
+            return q.get_nowait()
+        except queue.Empty:
+            pass
+        if kind == "reader":
+            with self._lock:
+                grow = self._n_readers < self.max_readers
+                if grow:
+                    self._n_readers += 1
+            if grow:
+                try:
+                    return self._open(readonly=True)
+                except Exception:
+                    with self._lock:
+                        self._n_readers -= 1
+                    raise
+        started = time.perf_counter()
+        timeout = self.reader_timeout if kind == "reader" else None
+        try:
+            con = q.get(timeout=timeout)
+        except queue.Empty:
+            self._count("reader_timeouts", time.perf_counter() - started)
+            raise PoolTimeout(f"No SQLite reader free after {timeout}s") from None
+        self._count(f"{kind}_waits", time.perf_counter() - started)
+        return con
+
+    def _count(self, key: str, waited: float = 0.0):
+        with self._lock:
+            self._stats[key] += 1
+            self._stats["wait_seconds"] += waited
+
+    @contextmanager
+    def reader(self):
+        """Check out a read-only connection."""
+        con = self._checkout(self._readers, "reader")
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            self._readers.put(con)
+
+    @contextmanager
+    def writer(self):
+        """Check out the writer; commits on success, rolls back on error."""
+        con = self._checkout(self._writers, "writer")
+        try:
+            yield con
+            if con.in_transaction:
+                con.commit()
+        except BaseException:
+            if con.in_transaction:
+                con.rollback()
+            raise
+        finally:
+            self._writers.put(con)
+
+    def close(self):
+        self._closed = True
+        for q in (self._readers, self._writers):
+            while True:
+                try:
+                    q.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._stats)
+        return {
+            **counters,
+            "wait_seconds": round(counters["wait_seconds"], 6),
+            "open_readers": self._n_readers, "idle_readers": self._readers.qsize(),
+            "max_readers": self.max_readers,
+            "open_writers": 1, "idle_writers": self._writers.qsize(),
+            "cached_statements": self.cached_statements,
+        }
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+
+from tinydb.storages import Storage
+
+from logstore import LogStore
+
+# ─────────────────────────────────────────────────
+# TinyDB storages
+# ─────────────────────────────────────────────────
+class AtomicJSONStorage(Storage):
+    """JSON file storage whose writes are atomic (write temp → fsync → rename).
+
+    TinyDB's stock JSONStorage rewrites the file in place through a long-lived
+    handle, so a crash mid-write leaves a truncated database. Here a reader
+    always sees either the old or the new file, never a mix.
+
+    The parsed data is kept in memory and reused until the file's stat
+    signature changes (e.g. another process rewrote it), so reads no longer
+    re-parse the whole file every time. Such a reload bumps `generation`.
+    """
+
+    def __init__(self, path: str, encoding: str = "utf-8", **kwargs):
+        super().__init__()
+        self.path     = path
+        self.encoding = encoding
+        self.kwargs   = kwargs     # passed to json.dumps (e.g. indent)
+        self._cache   = None       # (stat signature, parsed data)
+        self.generation = 0
+        if not os.path.exists(path):
+            open(path, "a", encoding=encoding).close()
+
+    def _signature(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def read(self):
+        sig = self._signature()
+        if self._cache is not None:
+            if self._cache[0] == sig:
+                return self._cache[1]
+            self.generation += 1   # rewritten by another process
+        with open(self.path, "r", encoding=self.encoding) as f:
+            raw = f.read()
+        data = json.loads(raw) if raw.strip() else None
+        self._cache = (sig, data)
+        return data
+
+    def write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding=self.encoding) as f:
+                f.write(json.dumps(data, **self.kwargs))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._cache = (self._signature(), data)
+        except BaseException:
+            self._cache = None
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def refresh(self) -> int:
+        """Pick up a rewrite by another process; returns `generation`."""
+        self.read()
+        return self.generation
+
+    def close(self):
+        pass
+
+
+class LogStorage(Storage):
+    """Append-only storage: each write adds one line to <path>.log instead of
+    rewriting the JSON file, which is compacted in the background (logstore.py).
+
+    TinyDB's generic write() still logs a whole table, as only the swapped
+    table dict is known; nosql_bulk.write_docs() uses write_docs() to log just
+    the changed documents.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__()
+        self.store = LogStore(path, **kwargs)   # compact_ratio, compact_min_bytes, sync
+
+    def read(self):
+        return self.store.read()
+
+    def refresh(self) -> int:
+        return self.store.refresh()
+
+    def write(self, data):
+        self.store.write(data)
+
+    def write_docs(self, table: str, docs: dict):
+        self.store.write_docs(table, docs)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+    def close(self):
+        self.store.close()
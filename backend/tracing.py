@@ -0,0 +1,121 @@
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ─────────────────────────────────────────────────
+# Request tracing + on-demand sampling profiler
+# ─────────────────────────────────────────────────
+# A Trace collects (name, start, duration) spans for one request. span() adds
+# to the trace of the current context and does nothing outside one; run_db()
+# copies the context into DB threads, so their spans land in the same trace.
+# The spans go back to the client as a Server-Timing header (summed per name)
+# and, on request, as a `timings` list.
+#
+# SamplingProfiler is statistical: a thread snapshots the stacks of the watched
+# threads (event loop + DB workers) every `interval` seconds through
+# sys._current_frames() and saves them in collapsed-stack format
+# ("frame;frame;frame count" per line, as read by flamegraph.pl / speedscope).
+# Unlike cProfile it sees work in executor threads, and costs nothing while
+# off. Other requests running on the same threads meanwhile show up too.
+
+current_trace = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.id      = secrets.token_hex(8)
+        self.started = time.perf_counter()
+        self.spans   = []   # (name, start offset s, duration s)
+
+    def add(self, name: str, started: float, seconds: float):
+        self.spans.append((name, started - self.started, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        totals = {}
+        for name, _, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        parts = [f"{name};dur={s * 1000:.3f}" for name, s in totals.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.3f}")
+        return ", ".join(parts)
+
+    def timings(self) -> list:
+        return [{"name": name, "start_ms": round(start * 1000, 3),
+                 "duration_ms": round(seconds * 1000, 3)}
+                for name, start, seconds in sorted(self.spans, key=lambda s: s[1])]
+
+
+@contextmanager
+def span(name: str):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter() - started)
+
+
+# Leaf frames of a thread that is waiting, not working
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+def _idle(frame) -> bool:
+    code = frame.f_code
+    name = os.path.basename(code.co_filename)
+    return name in _IDLE_FILES or (code.co_name == "_worker" and name == "thread.py")
+
+
+def _stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, watch, interval: float = 0.002):
+        self.watch    = watch      # watch(thread) -> bool: sample this thread?
+        self.interval = interval
+        self.samples  = Counter()  # collapsed stack -> hits
+        self.ticks    = 0
+        self._stop    = threading.Event()
+        self._thread  = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread in threading.enumerate():
+                frame = frames.get(thread.ident)
+                if frame is None or not self.watch(thread) or _idle(frame):
+                    continue
+                self.samples[_stack(frame)] += 1
+            self.ticks += 1
+
+    def save(self, path: str) -> dict:
+        """Write the collapsed stacks to `path` (blocking)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, hits in self.samples.most_common():
+                f.write(f"{stack} {hits}\n")
+        return {"path": path, "ticks": self.ticks, "samples": sum(self.samples.values()),
+                "interval_ms": self.interval * 1000}
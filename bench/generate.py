@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+# ─────────────────────────────────────────────────
+# SYNTHETIC EMPLOYEES DATASETS
+# ─────────────────────────────────────────────────
+# Writes bench/data/<size>/company_sql.db, company_nosql.json and dataset.json
+# with the fields of SEED_EMPLOYEES. Rows are a pure function of (index, seed),
+# so a size/seed pair always produces the same data:
+#
+#     python bench/generate.py 10k 100k 1M 10M
+#     python bench/generate.py 250000 --seed 7 --out /tmp/bench-data
+#
+# Employee i (1-based) is SQLite row id i, TinyDB doc_id i, and is named
+# name_of(i), which is how the stub LLM targets single employees.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR  = os.path.join(BENCH_DIR, "data")
+
+FIRST_NAMES = ["Amit", "Priya", "Karan", "Neha", "Raj", "Anita", "Suresh",
+               "Divya", "Vikram", "Pooja"]
+DEPARTMENTS = ["IT", "HR", "Finance", "Marketing", "Sales", "Operations"]
+LOCATIONS   = ["Hyderabad", "Chennai", "Mumbai", "Bangalore", "Pune", "Delhi"]
+
+SIZES = {"k": 1_000, "m": 1_000_000}
+BATCH = 50_000
+
+# Same DDL as backend/main.py init_sqlite()
+SQLITE_DDL = """
+    CREATE TABLE employees (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        name            TEXT    NOT NULL,
+        age             INTEGER NOT NULL,
+        department      TEXT    NOT NULL,
+        salary_amount   REAL    NOT NULL,
+        salary_currency TEXT    NOT NULL DEFAULT 'INR',
+        location        TEXT    NOT NULL
+    )
+"""
+
+
+def parse_size(text: str) -> int:
+    """"10k" → 10000, "1M" → 1000000, "2500" → 2500."""
+    unit = SIZES.get(text[-1].lower())
+    return int(float(text[:-1]) * unit) if unit else int(text)
+
+
+def name_of(i: int) -> str:
+    return f"{FIRST_NAMES[i % len(FIRST_NAMES)]}-{i}"
+
+
+def employees(rows: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(1, rows + 1):
+        yield {
+            "name":            name_of(i),
+            "age":             rng.randint(21, 60),
+            "department":      rng.choice(DEPARTMENTS),
+            "salary_amount":   rng.randrange(30_000, 200_000, 500),
+            "salary_currency": "INR",
+            "location":        rng.choice(LOCATIONS),
+        }
+
+
+def write_sqlite(path: str, rows: int, seed: int):
+    if os.path.exists(path):
+        os.remove(path)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute(SQLITE_DDL)
+    batch = []
+    insert = ("INSERT INTO employees (name,age,department,salary_amount,salary_currency,location) "
+              "VALUES (?,?,?,?,?,?)")
+    for e in employees(rows, seed):
+        batch.append((e["name"], e["age"], e["department"], e["salary_amount"],
+                      e["salary_currency"], e["location"]))
+        if len(batch) == BATCH:
+            con.executemany(insert, batch)
+            batch.clear()
+    con.executemany(insert, batch)
+    con.commit()
+    con.close()
+
+
+def write_tinydb(path: str, rows: int, seed: int):
+    """TinyDB's file layout, streamed: {"employees": {"1": {...}, ...}}."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{"employees": {')
+        for i, e in enumerate(employees(rows, seed), 1):
+            f.write(f'{", " if i > 1 else ""}"{i}": {json.dumps(e)}')
+        f.write("}}")
+    os.replace(tmp, path)
+
+
+def generate(rows: int, seed: int, out: str) -> dict:
+    os.makedirs(out, exist_ok=True)
+    started = time.perf_counter()
+    write_sqlite(os.path.join(out, "company_sql.db"), rows, seed)
+    write_tinydb(os.path.join(out, "company_nosql.json"), rows, seed)
+    meta = {"rows": rows, "seed": seed, "seconds": round(time.perf_counter() - started, 2)}
+    with open(os.path.join(out, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate benchmark datasets")
+    parser.add_argument("sizes", nargs="+", help="row counts, e.g. 10k 100k 1M 10M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=DATA_DIR, help="parent directory (default bench/data)")
+    args = parser.parse_args()
+    for size in args.sizes:
+        out = os.path.join(args.out, size)
+        meta = generate(parse_size(size), args.seed, out)
+        print(f"✅ {size}: {meta['rows']:,} employees in {meta['seconds']}s → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from stub_llm import READS, MUTATION
+
+# ─────────────────────────────────────────────────
+# BENCHMARK RUNNER
+# ─────────────────────────────────────────────────
+# Drives /api/query reads and mutations, /api/audit/undo and /api/audit at
+# each concurrency level and reports throughput and latency percentiles per
+# scenario as JSON:
+#
+#     python bench/run.py --data bench/data/100k --concurrency 1 8 32
+#     python bench/run.py --url http://127.0.0.1:8000 --rows 10000 --scenarios sql_read
+#     python bench/run.py --data bench/data/1M --baseline results/before.json
+#
+# With --data a server (bench/serve.py) is started on a fresh copy of the
+# dataset; --url targets a running one. Request i of a scenario is always the
+# same request (prompt, target employee, amount), whatever the concurrency,
+# so results of runs with equal arguments are comparable; --baseline prints
+# the change against an earlier result file.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ── HTTP ─────────────────────────────────────
+class Client:
+    """One keep-alive connection per worker thread (stdlib only)."""
+
+    def __init__(self, url: str):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+
+    def request(self, method: str, path: str, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            try:
+                self.conn.request(method, path, payload, headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        try:
+            return resp.status, json.loads(data)
+        except ValueError:
+            return resp.status, None
+
+    def ok(self, method: str, path: str, body=None) -> bool:
+        status, data = self.request(method, path, body)
+        return status == 200 and not (isinstance(data, dict) and "error" in data)
+
+
+# ── Scenarios ─────────────────────────────────
+# Each takes (client, request index, context) and returns success.
+READ_PROMPTS = sorted(READS)
+
+
+def _rng(i: int) -> random.Random:
+    return random.Random(f"bench-{i}")
+
+
+def _read(db_type):
+    def run(client, i, ctx):
+        prompt = READ_PROMPTS[i % len(READ_PROMPTS)]
+        return client.ok("POST", "/api/query", {"prompt": prompt, "role": "Admin",
+                                               "mode": "query", "db_type": db_type})
+    return run
+
+
+def _mutation_body(db_type, i, rows):
+    rng = _rng(i)
+    prompt = MUTATION.format(n=rng.randint(1, rows), amount=rng.randrange(30_000, 200_000, 500))
+    return {"prompt": prompt, "role": "Admin", "mode": "mutation", "db_type": db_type}
+
+
+def _mutation(db_type):
+    def run(client, i, ctx):
+        return client.ok("POST", "/api/query", _mutation_body(db_type, i, ctx["rows"]))
+    return run
+
+
+def _undo_setup(db_type):
+    """Make one undoable mutation per undo request (sequentially, untimed)."""
+    def setup(client, count, ctx):
+        ids = []
+        for i in range(count):
+            if not client.ok("POST", "/api/query",
+                             _mutation_body(db_type, 1_000_000 + i, ctx["rows"])):
+                raise RuntimeError(f"undo setup: {db_type} mutation failed")
+            _, page = client.request("GET", f"/api/audit?limit=1&user=Admin&db_type={db_type}")
+            entry = page["entries"][0]
+            if not entry.get("has_snapshot") or entry.get("undone"):
+                raise RuntimeError(f"undo setup: audit entry #{entry['id']} is not undoable")
+            ids.append(entry["id"])
+        return ids
+    return setup
+
+
+def _undo(client, i, ids):
+    return client.ok("POST", f"/api/audit/undo/{ids[i]}")
+
+
+def _audit(client, i, ctx):
+    return client.ok("GET", "/api/audit?limit=50")
+
+
+# name → (backend, run, setup or None)
+SCENARIOS = {
+    "sql_read":       ("sql",   _read("sql"),       None),
+    "nosql_read":     ("nosql", _read("nosql"),     None),
+    "sql_mutation":   ("sql",   _mutation("sql"),   None),
+    "nosql_mutation": ("nosql", _mutation("nosql"), None),
+    "sql_undo":       ("sql",   _undo,              _undo_setup("sql")),
+    "nosql_undo":     ("nosql", _undo,              _undo_setup("nosql")),
+    "audit":          ("audit", _audit,             None),
+}
+
+
+# ── Measurement ──────────────────────────────
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def measure(url: str, run, ctx, requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    next_i = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        client = Client(url)
+        while True:
+            with lock:
+                i = next(next_i, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                ok = run(client, i, ctx)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += not ok
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "requests": len(latencies), "errors": errors, "seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {"mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+                       "p50": ms(percentile(latencies, 50)),
+                       "p95": ms(percentile(latencies, 95)),
+                       "p99": ms(percentile(latencies, 99)),
+                       "max": ms(latencies[-1]) if latencies else 0.0},
+    }
+
+
+def run_scenario(url, name, rows, requests, concurrency, warmup) -> dict:
+    backend, run, setup = SCENARIOS[name]
+    ctx = {"rows": rows}
+    if setup is not None:
+        # Undo targets are used up: prepare them for the measured requests only
+        ctx = setup(Client(url), requests, ctx)
+    elif warmup:
+        measure(url, run, ctx, warmup, concurrency)
+    result = measure(url, run, ctx, requests, concurrency)
+    return {"scenario": name, "backend": backend, "concurrency": concurrency, **result}
+
+
+# ── Server ───────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(data: str, llm_latency: float, timeout: float = 600):
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "serve.py"), data,
+                             "--port", str(port), "--llm-latency", str(llm_latency)])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"benchmark server exited with code {proc.returncode}")
+        try:
+            if Client(url).request("GET", "/api/health")[0] == 200:
+                return proc, url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("benchmark server did not start in time")
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ── Report ───────────────────────────────────
+def print_table(results: list, baseline=None):
+    base = {(r["scenario"], r["concurrency"]): r for r in (baseline or {}).get("results", [])}
+    print(f"\n{'scenario':<16}{'conc':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>8}")
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['scenario']:<16}{r['concurrency']:>5}{r['throughput_rps']:>10}"
+              f"{lat['p50']:>10}{lat['p95']:>10}{lat['p99']:>10}{r['errors']:>8}")
+        old = base.get((r["scenario"], r["concurrency"]))
+        if old:
+            def delta(new, prev):
+                return f"{(new - prev) / prev * 100:+.1f}%" if prev else "n/a"
+            print(f"{'  vs baseline':<21}{delta(r['throughput_rps'], old['throughput_rps']):>10}"
+                  + "".join(f"{delta(lat[k], old['latency_ms'][k]):>10}"
+                            for k in ("p50", "p95", "p99")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--data", help="dataset directory; starts bench/serve.py on a copy")
+    target.add_argument("--url", help="already running server")
+    parser.add_argument("--rows", type=int,
+                        help="employees in the served dataset (default: from --data)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200, help="per scenario and level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    dataset = {"rows": args.rows}
+    if args.data:
+        with open(os.path.join(args.data, "dataset.json"), encoding="utf-8") as f:
+            dataset = json.load(f)
+    if not dataset.get("rows"):
+        parser.error("--rows is required with --url")
+
+    proc, url = (start_server(args.data, args.llm_latency) if args.data else (None, args.url))
+    results = []
+    try:
+        for name in names:
+            for level in args.concurrency:
+                print(f"▶ {name} × {level} ...", file=sys.stderr)
+                results.append(run_scenario(url, name, dataset["rows"], args.requests,
+                                            level, args.warmup))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(), "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "dataset": dataset, "requests": args.requests, "warmup": args.warmup,
+        "llm_latency": args.llm_latency, "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report → {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
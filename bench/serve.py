@@ -0,0 +1,53 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+# ─────────────────────────────────────────────────
+# BENCHMARK SERVER
+# ─────────────────────────────────────────────────
+# Runs backend/main.py against a fresh copy of a generated dataset with the
+# stub LLM installed:
+#
+#     python bench/serve.py bench/data/100k --port 8765 --llm-latency 0.2
+#
+# The copy lives in a temporary directory (audit log included), so every run
+# starts from identical data and the generated files are never modified.
+
+BENCH_DIR   = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), "backend")
+DATA_FILES  = ("company_sql.db", "company_nosql.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the backend on a benchmark dataset")
+    parser.add_argument("data", help="dataset directory written by generate.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds the stub LLM waits per call")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="nlq-bench-")
+    for name in DATA_FILES:
+        shutil.copyfile(os.path.join(args.data, name), os.path.join(work, name))
+    os.environ["NLQ_SQLITE_DB"]       = os.path.join(work, "company_sql.db")
+    os.environ["NLQ_TINYDB"]          = os.path.join(work, "company_nosql.json")
+    os.environ["NLQ_AUDIT_LOG"]       = os.path.join(work, "audit_log.json")
+    os.environ["NLQ_AUDIT_SNAPSHOTS"] = os.path.join(work, "audit_snapshots.jsonl")
+
+    import stub_llm
+    stub_llm.install(args.llm_latency)
+
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    import main as backend
+    try:
+        uvicorn.run(backend.app, host=args.host, port=args.port, log_level="warning")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
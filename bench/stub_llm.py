@@ -0,0 +1,86 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from generate import name_of
+
+# ─────────────────────────────────────────────────
+# DETERMINISTIC STAND-IN FOR THE LLM
+# ─────────────────────────────────────────────────
+# install() swaps litellm.acompletion for a local function that answers the
+# backend's prompts from the tables below, keyed by the quoted
+# `User request: "..."` and whether the prompt asks for SQL or NoSQL. Insight
+# prompts get a fixed summary. An optional fixed delay stands in for model
+# time, so runs measure the backend rather than a model server.
+
+# Read prompts used by the benchmark scenarios: prompt → (SQL, NoSQL JSON)
+READS = {
+    "Employees in IT located in Hyderabad": (
+        "SELECT * FROM employees WHERE department = 'IT' AND location = 'Hyderabad'",
+        {"filter": {"department": "IT", "location": "Hyderabad"}},
+    ),
+    "Top 10 earners": (
+        "SELECT name, department, salary_amount FROM employees ORDER BY salary_amount DESC LIMIT 10",
+        {"filter": {}, "sort": {"salary_amount": -1}, "limit": 10,
+         "projection": {"name": 1, "department": 1, "salary_amount": 1}},
+    ),
+    "Average salary by department": (
+        "SELECT department, AVG(salary_amount) AS avg_salary, COUNT(*) AS employees "
+        "FROM employees GROUP BY department ORDER BY avg_salary DESC",
+        {"pipeline": [
+            {"$group": {"_id": "$department", "avg_salary": {"$avg": "$salary_amount"},
+                        "employees": {"$count": {}}}},
+            {"$sort": {"avg_salary": -1}},
+            {"$project": {"department": "$_id", "avg_salary": 1, "employees": 1, "_id": 0}},
+        ]},
+    ),
+    "How many employees are older than 55": (
+        "SELECT COUNT(*) AS employees FROM employees WHERE age > 55",
+        {"pipeline": [{"$match": {"age": {"$gt": 55}}}, {"$count": "employees"}]},
+    ),
+    "Employees aged 30 earning more than 190000": (
+        "SELECT * FROM employees WHERE age = 30 AND salary_amount > 190000",
+        {"filter": {"age": 30, "salary_amount": {"$gt": 190000}}},
+    ),
+}
+
+# Mutation prompts: "Set the salary of employee <n> to <amount>"
+MUTATION = "Set the salary of employee {n} to {amount}"
+_MUTATION = re.compile(r"Set the salary of employee (\d+) to (\d+)")
+
+INSIGHT = "Stub insight: salaries vary by department and location."
+
+_REQUEST = re.compile(r'User request: "(.*)"')
+
+
+def answer(prompt: str) -> str:
+    if prompt.startswith("You are a Data Analyst"):
+        return INSIGHT
+    m = _REQUEST.search(prompt)
+    if m is None:
+        raise ValueError("stub LLM: no user request in prompt")
+    request, sql = m.group(1), prompt.startswith("You are a SQLite SQL expert")
+    if request in READS:
+        canned = READS[request]
+        return canned[0] if sql else json.dumps(canned[1])
+    m = _MUTATION.fullmatch(request)
+    if m is not None:
+        n, amount = int(m.group(1)), int(m.group(2))
+        if sql:
+            return f"UPDATE employees SET salary_amount = {amount} WHERE id = {n}"
+        return json.dumps({"method": "update", "filter": {"name": name_of(n)},
+                           "update": {"salary_amount": amount}})
+    raise ValueError(f"stub LLM: no canned answer for {request!r}")
+
+
+def install(latency: float = 0.0):
+    import litellm
+
+    async def acompletion(model=None, messages=(), **kwargs):
+        if latency:
+            await asyncio.sleep(latency)
+        content = answer(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    litellm.acompletion = acompletion
@@ -7,7 +7,7 @@ import PromptBar from './components/PromptBar';
 import ResultsView from './components/ResultsView';
 import SettingsModal from './components/SettingsModal';
 import AuditLogView from './components/AuditLogView';
-import { sendQuery } from './services/api';
+import { sendQuery, streamQuery, fetchNextPage, waitForInsights } from './services/api';
 import './App.css';
 
 function App() {
@@ -23,17 +23,62 @@ function App() {
   const [dbType, setDbType] = useState('nosql'); // 'nosql' | 'sql'
   const [currentView, setCurrentView] = useState('chat'); // 'chat' | 'audit'
 
+  const followInsights = (jobId) => {
+    if (!jobId) return;
+    waitForInsights(jobId)
+      .then((job) => setData((prev) =>
+        prev && prev.insights_job_id === job?.id
+          ? { ...prev, insights: job.insights || job.error || '', insights_job_id: null }
+          : prev))
+      .catch(() => setData((prev) => prev && { ...prev, insights_job_id: null }));
+  };
+
+  // SQL reads stream in: the first rows render while the rest are still coming
+  const handleStreamEvent = (event) => {
+    if (event.type === 'meta') {
+      setData({ ...event, results: [], count: 0, streaming: true });
+      setLoading(false);
+    } else if (event.type === 'rows') {
+      setData((prev) => ({ ...prev, results: [...prev.results, ...event.rows],
+                           count: prev.count + event.rows.length }));
+    } else if (event.type === 'end') {
+      setData((prev) => ({ ...prev, streaming: false, truncated: event.truncated,
+                           insights_job_id: event.insights_job_id }));
+      followInsights(event.insights_job_id);
+    } else if (event.error) {
+      setError(event.error);
+    } else {
+      setData(event);
+    }
+  };
+
+  const handleLoadMore = async () => {
+    const page = await fetchNextPage(data.next_cursor, userRole);
+    if (page.error) {
+      setError(page.error);
+      return;
+    }
+    setData((prev) => ({ ...prev, results: [...prev.results, ...page.results],
+                         count: prev.count + page.count, next_cursor: page.next_cursor,
+                         truncated: page.truncated }));
+  };
+
   const handleQuerySubmit = async (prompt) => {
     setLoading(true);
     setError(null);
     setShowHero(false);
 
     try {
+      if (dbType === 'sql' && opMode === 'query') {
+        await streamQuery(prompt, userRole, handleStreamEvent);
+        return;
+      }
       const result = await sendQuery(prompt, userRole, opMode, dbType);
       if (result.error) {
         setError(result.error);
       } else {
         setData(result);
+        followInsights(result.insights_job_id);
       }
     } catch (err) {
       setError(err.message || 'Failed to connect to backend');
@@ -69,7 +114,7 @@ function App() {
               </div>
             </>
           ) : (
-            <ResultsView data={data} loading={loading} error={error} />
+            <ResultsView data={data} loading={loading} error={error} onLoadMore={handleLoadMore} />
           )}
         </div>
 
@@ -3,15 +3,15 @@ import { History, Shield, RefreshCcw, MapPin, Database, User, Clock, CheckCircle
 import './AuditLogView.css';
 
 export default function AuditLogView() {
-    const [logs, setLogs] = useState([]);
+    const [latest, setLatest] = useState({ entries: [], next_cursor: null });
+    const [older, setOlder] = useState({ entries: [], next_cursor: null });
     const [loading, setLoading] = useState(true);
     const [undoingId, setUndoingId] = useState(null);
 
     const fetchLogs = async () => {
         try {
             const res = await fetch('http://localhost:8000/api/audit');
-            const data = await res.json();
-            setLogs(data);
+            setLatest(await res.json());
         } catch (err) {
             console.error('Failed to fetch logs:', err);
         } finally {
@@ -25,6 +25,21 @@ export default function AuditLogView() {
         return () => clearInterval(interval);
     }, []);
 
+    // Polling refreshes the newest page; older pages are kept once loaded
+    const oldestLatest = latest.entries.length ? latest.entries[latest.entries.length - 1].id : Infinity;
+    const logs = [...latest.entries, ...older.entries.filter((log) => log.id < oldestLatest)];
+    const nextCursor = older.entries.length ? older.next_cursor : latest.next_cursor;
+
+    const loadOlder = async () => {
+        try {
+            const res = await fetch(`http://localhost:8000/api/audit?cursor=${nextCursor}`);
+            const data = await res.json();
+            setOlder((prev) => ({ entries: [...prev.entries, ...data.entries], next_cursor: data.next_cursor }));
+        } catch (err) {
+            console.error('Failed to fetch logs:', err);
+        }
+    };
+
     const handleUndo = async (logId) => {
         setUndoingId(logId);
         try {
@@ -109,7 +124,7 @@ export default function AuditLogView() {
                             </div>
 
                             <div className="card-actions">
-                                {log.snapshot && !log.undone && (
+                                {log.has_snapshot && !log.undone && (
                                     <button
                                         className="undo-btn"
                                         onClick={() => handleUndo(log.id)}
@@ -133,6 +148,11 @@ export default function AuditLogView() {
                         </div>
                     ))
                 )}
+                {nextCursor !== null && (
+                    <button className="load-more-btn" onClick={loadOlder}>
+                        Load older entries
+                    </button>
+                )}
             </div>
         </div>
     );
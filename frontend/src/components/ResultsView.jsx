@@ -1,8 +1,8 @@
-import { Database, Code, BarChart3, AlertCircle, Loader2, Sparkles, TrendingUp, Info, Server } from 'lucide-react';
+import { Database, Code, BarChart3, AlertCircle, Loader2, Sparkles, TrendingUp, Info, Server, Search } from 'lucide-react';
 import Plot from 'react-plotly.js';
 import './ResultsView.css';
 
-export default function ResultsView({ data, loading, error }) {
+export default function ResultsView({ data, loading, error, onLoadMore }) {
     if (loading) {
         return (
             <div className="results-view results-loading">
@@ -114,8 +114,11 @@ export default function ResultsView({ data, loading, error }) {
                         </div>
                         <span className="section-title">Results</span>
                         {data.count != null && (
-                            <span className="record-count-label">({data.count})</span>
+                            <span className="record-count-label">
+                                ({data.count}{data.streaming || data.next_cursor ? '+' : ''})
+                            </span>
                         )}
+                        {data.streaming && <Loader2 size={14} className="spin-icon" />}
                         <div className="section-actions-placeholder">
                             <TrendingUp size={14} />
                             <Search size={14} />
@@ -156,18 +159,37 @@ export default function ResultsView({ data, loading, error }) {
                                 <Info size={16} />
                                 <p>{data.message}</p>
                             </div>
-                        ) : (
+                        ) : data.streaming ? null : (
                             <div className="result-empty">
                                 <p>No records found.</p>
                             </div>
                         )}
                     </div>
+                    {data.next_cursor && (
+                        <button className="load-more-btn" onClick={onLoadMore}>
+                            Load more rows
+                        </button>
+                    )}
+                    {data.truncated && (
+                        <div className="result-truncated">
+                            <Info size={14} />
+                            <span>Showing the first {data.count} rows (row limit reached).</span>
+                        </div>
+                    )}
                 </div>
 
                 {/* 3. Chart Area */}
                 {renderChart()}
 
                 {/* 4. AI Analysis Area */}
+                {!data.insights && data.insights_job_id && (
+                    <div className="unified-section ai-section">
+                        <div className="ai-header">
+                            <Loader2 size={15} className="spin-icon" />
+                            <span className="ai-title">Generating AI insights...</span>
+                        </div>
+                    </div>
+                )}
                 {data.insights && (
                     <div className="unified-section ai-section">
                         <div className="ai-container-inner">
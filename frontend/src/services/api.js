@@ -12,6 +12,53 @@ export async function sendQuery(prompt, role = 'Viewer', mode = 'query', db_type
     return response.data;
 }
 
+// Next page of a paginated SQL read (uses the previous response's next_cursor)
+export async function fetchNextPage(cursor, role = 'Viewer') {
+    const response = await api.post('/query', { prompt: '', role, db_type: 'sql', cursor });
+    return response.data;
+}
+
+// Streamed SQL read: calls onEvent for each NDJSON line (meta, rows..., end | error).
+// Plain JSON replies (e.g. LLM errors) are passed through as a single event.
+export async function streamQuery(prompt, role, onEvent) {
+    const response = await fetch(`${api.defaults.baseURL}/query`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompt, role, mode: 'query', db_type: 'sql', stream: true }),
+    });
+    if (!(response.headers.get('content-type') || '').includes('ndjson')) {
+        onEvent({ type: 'result', ...(await response.json()) });
+        return;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(Boolean).forEach((line) => onEvent(JSON.parse(line)));
+    }
+    if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
+// Insights are generated in the background; resolves with the finished job.
+export function waitForInsights(jobId) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${api.defaults.baseURL}/insights/${jobId}/stream`);
+        source.addEventListener('insights', (event) => {
+            source.close();
+            resolve(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            source.close();
+            reject(new Error('Insight stream closed'));
+        };
+    });
+}
+
 export async function getSchema(db_type = 'nosql') {
     const response = await api.get('/schema', { params: { db_type } });
     return response.data;
@@ -22,9 +69,10 @@ export async function healthCheck() {
     return response.data;
 }
 
-export async function getAuditLogs() {
-    const response = await api.get('/audit');
-    return response.data;
+// Newest-first page of audit entries; filters: user, status, db_type, since, until, cursor, limit
+export async function getAuditLogs(params = {}) {
+    const response = await api.get('/audit', { params });
+    return response.data.entries;
 }
 
 export async function transcribeAudio(audioBlob) {
@@ -1,62 +1,344 @@
 import sqlite3
+import io
 import json
 import os
+import re
+import sys
+import time
+
+from backend.cdc import pair_by_id
+from backend.logstore import log_path, overlay
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SQLITE_DB_PATH = os.path.join(BASE_DIR, "backend", "company_sql.db")
 TINYDB_PATH = os.path.join(BASE_DIR, "backend", "company_nosql.json")
 
-def populate_sqlite():
+# ─────────────────────────────────────────────────
+# BULK LOAD SETTINGS
+# ─────────────────────────────────────────────────
+# The load goes into a separate file (<db>.loading); the live database is
+# untouched, and stays usable by a running API, until the load is complete.
+# Then the finished file is copied over it with SQLite's backup API: one write
+# transaction under SQLite's own locking, so readers see the old data or the
+# new, never a mix. The JSON is parsed record by record (never loaded whole)
+# and inserted in executemany batches. Every COMMIT_ROWS rows the batch
+# transaction commits together with a checkpoint (byte offset into the JSON),
+# so an interrupted load resumes where it stopped: run the script again.
+# --restart discards the checkpoint. The live table's indexes are created
+# once at the end. SQLite row id = TinyDB doc_id, and the final transaction
+# pairs every row with its document for the change feed (backend/cdc.py).
+# Documents changed in the JSON's change log (<file>.log, backend/logstore.py)
+# are skipped in the JSON and inserted from the log in the final transaction.
+READ_CHUNK  = 1 << 20       # characters read from the JSON at a time
+BATCH_ROWS  = 50_000        # rows per executemany
+COMMIT_ROWS = 1_000_000     # rows per transaction / checkpoint
+CHECKPOINT_TABLE = "_bulk_load_checkpoint"
+LOAD_SUFFIX = ".loading"
+
+BULK_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",       # checkpoints must survive a crash to resume from
+    "PRAGMA cache_size=-262144",       # 256 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",   # the load file is ours alone
+)
+
+# Same DDL as backend/main.py init_sqlite()
+EMPLOYEES_DDL = """
+    CREATE TABLE IF NOT EXISTS employees (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        name            TEXT    NOT NULL,
+        age             INTEGER NOT NULL,
+        department      TEXT    NOT NULL,
+        salary_amount   REAL    NOT NULL,
+        salary_currency TEXT    NOT NULL DEFAULT 'INR',
+        location        TEXT    NOT NULL
+    )
+"""
+
+INSERT_QUERY = """
+INSERT INTO employees (id, name, age, department, salary_amount, salary_currency, location)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+# ─────────────────────────────────────────────────
+# INCREMENTAL TINYDB READER
+# ─────────────────────────────────────────────────
+_DOC_KEY = re.compile(r'[\s,]*"(\d+)"\s*:\s*')   # `, "123": ` before a document
+
+class TinyDBReader:
+    """Walks a TinyDB file ({"table": {"doc_id": {...}, ...}, ...}) one
+    document at a time with JSONDecoder.raw_decode over a sliding buffer."""
+
+    def __init__(self, path, offset=0):
+        self.file = open(path, "rb")
+        self.file.seek(offset)
+        self.text = io.TextIOWrapper(self.file, encoding="utf-8", newline="")
+        self.decoder = json.JSONDecoder()
+        self.buf, self.pos = "", 0
+        self.base = offset          # byte offset of buf[0]
+        self.eof = False
+
+    def close(self):
+        self.text.close()
+
+    def _fill(self):
+        if self.pos > READ_CHUNK:
+            self.base += len(self.buf[:self.pos].encode("utf-8"))
+            self.buf, self.pos = self.buf[self.pos:], 0
+        chunk = self.text.read(READ_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ("" at the end of the file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Malformed TinyDB JSON: expected {char!r} at byte {self.offset()}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next string / object (both self-delimiting)."""
+        self.peek()
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():     # truncated only if the file really ended
+                    raise
+
+    def offset(self):
+        return self.base + len(self.buf[:self.pos].encode("utf-8"))
+
+    def open_table(self, table):
+        """Position inside `table`'s object. False if the file has no such table."""
+        self.expect("{")
+        while True:
+            char = self.peek()
+            if char in ("}", ""):
+                return False
+            if char == ",":
+                self.pos += 1
+                continue
+            name = self.value()
+            self.expect(":")
+            if name == table:
+                self.expect("{")
+                return True
+            self.value()                 # another table: skip it
+
+    def documents(self):
+        """Yield (doc_id, document) up to the table's end; offset() between
+        two documents is where to resume after the last one."""
+        decode, match = self.decoder.raw_decode, _DOC_KEY.match
+        while True:
+            m = match(self.buf, self.pos)
+            if m is not None and m.end() < len(self.buf):
+                try:
+                    doc, self.pos = decode(self.buf, m.end())
+                except json.JSONDecodeError:
+                    if not self._fill():
+                        raise
+                    continue
+                yield int(m.group(1)), doc
+                continue
+            if m is None:
+                char = self.peek()
+                if char in ("}", ""):
+                    return
+                if len(self.buf) - self.pos > 64:     # peek() may have read more
+                    if match(self.buf, self.pos) is None:
+                        raise ValueError("Malformed TinyDB JSON: bad document key "
+                                         f"at byte {self.offset()}")
+                    continue
+            if not self._fill():                 # key cut off by the end of the buffer
+                raise ValueError("Malformed TinyDB JSON: file ends inside the table")
+
+
+# ─────────────────────────────────────────────────
+# CHECKPOINTS
+# ─────────────────────────────────────────────────
+def source_signature(path):
+    """Changes whenever the JSON file or its change log does."""
+    parts = []
+    for p in (path, log_path(path)):
+        if os.path.exists(p):
+            st = os.stat(p)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+def read_checkpoint(cur, signature):
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), source TEXT, tbl TEXT, "
+                "offset INTEGER, rows INTEGER, indexes TEXT)")
+    row = cur.execute(f"SELECT source, tbl, offset, rows, indexes FROM {CHECKPOINT_TABLE}").fetchone()
+    if row is None or row[0] != signature:
+        return None
+    return {"table": row[1], "offset": row[2], "rows": row[3], "indexes": json.loads(row[4])}
+
+def write_checkpoint(cur, signature, state):
+    cur.execute(f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (1, ?, ?, ?, ?, ?)",
+                (signature, state["table"], state["offset"], state["rows"],
+                 json.dumps(state["indexes"])))
+
+_INDEXES = ("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'employees' AND sql IS NOT NULL")
+
+def read_live(sql):
+    """Rows of a query against the live database ([] before it exists)."""
+    if not os.path.exists(SQLITE_DB_PATH):
+        return []
+    con = sqlite3.connect(SQLITE_DB_PATH, timeout=30)
+    try:
+        return con.execute(sql).fetchall()
+    finally:
+        con.close()
+
+def start_fresh(cur):
+    """Empty employees in the load file; returns the live table's indexes,
+    created after the load."""
+    cur.execute(EMPLOYEES_DDL)
+    for name, _ in cur.execute(_INDEXES).fetchall():   # left by an earlier load
+        cur.execute(f'DROP INDEX "{name}"')
+    cur.execute("DELETE FROM employees")
+    indexes = [sql for _, sql in read_live(_INDEXES)]
+    print(f"Loading into {SQLITE_DB_PATH + LOAD_SUFFIX}; {len(indexes)} index(es) to rebuild.")
+    return indexes
+
+def swap_in(conn):
+    """Copy the finished load file over the live database in one transaction."""
+    live = sqlite3.connect(SQLITE_DB_PATH, timeout=30)
+    try:
+        conn.backup(live)
+    finally:
+        live.close()
+
+
+# ─────────────────────────────────────────────────
+# LOADER
+# ─────────────────────────────────────────────────
+def employee_row(doc_id, r):
+    return (doc_id, r.get("name"), r.get("age"), r.get("department"),
+            r.get("salary_amount"), r.get("salary_currency", "INR"), r.get("location"))
+
+def load_table(cur, state, signature):
+    """Insert the rest of state["table"] from state["offset"], then the
+    documents from its change log; commits per COMMIT_ROWS."""
+    replaced, changed = overlay(TINYDB_PATH, state["table"])
+    reader = TinyDBReader(TINYDB_PATH, state["offset"])
+    try:
+        in_json = not replaced and (state["offset"] > 0 or reader.open_table(state["table"]))
+        loaded, since_commit, batch = 0, 0, []
+        started = time.perf_counter()
+        for doc_id, r in (reader.documents() if in_json else ()):
+            if changed and str(doc_id) in changed:
+                continue                         # newer version (or deletion) in the log
+            batch.append(employee_row(doc_id, r))
+            if len(batch) < BATCH_ROWS:
+                continue
+            cur.executemany(INSERT_QUERY, batch)
+            loaded += len(batch)
+            since_commit += len(batch)
+            batch.clear()
+            if since_commit >= COMMIT_ROWS:
+                state["offset"], state["rows"] = reader.offset(), state["rows"] + since_commit
+                write_checkpoint(cur, signature, state)
+                cur.execute("COMMIT")
+                cur.execute("BEGIN")
+                since_commit = 0
+                rate = loaded / (time.perf_counter() - started)
+                print(f"  … {state['rows']:,} rows  ({rate:,.0f} rows/sec)")
+        batch.extend(employee_row(int(k), r) for k, r in changed.items() if r is not None)
+        for i in range(0, len(batch), BATCH_ROWS):
+            cur.executemany(INSERT_QUERY, batch[i:i + BATCH_ROWS])
+        loaded += len(batch)
+        since_commit += len(batch)
+        state["rows"] += since_commit
+        return loaded
+    finally:
+        reader.close()
+
+def populate_sqlite(restart=False):
     print(f"--- Populating SQLite: {SQLITE_DB_PATH} ---")
-    
+
     if not os.path.exists(TINYDB_PATH):
         print(f"Error: Source file not found: {TINYDB_PATH}")
         return
 
-    # 1. Read NoSQL Data
+    load_path = SQLITE_DB_PATH + LOAD_SUFFIX
+    if restart and os.path.exists(load_path):
+        os.remove(load_path)
+    conn = sqlite3.connect(load_path, isolation_level=None)
+    cur = conn.cursor()
+    swapped = False
     try:
-        with open(TINYDB_PATH, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-            employees_dict = raw_data.get("employees", {})
-            if not employees_dict:
-                employees_dict = raw_data.get("_default", {})
-            
-            records = list(employees_dict.values())
-            print(f"Success: Found {len(records)} records in JSON.")
-    except Exception as e:
-        print(f"Error reading JSON: {e}")
-        return
+        # The backup into a WAL-mode live database needs equal page sizes
+        # (a no-op once the load file has tables)
+        for (page_size,) in read_live("PRAGMA page_size"):
+            cur.execute(f"PRAGMA page_size={page_size}")
+        for pragma in BULK_PRAGMAS:
+            cur.execute(pragma)
+        started = time.perf_counter()
+        signature = source_signature(TINYDB_PATH)
 
-    # 2. Connect and Insert
-    try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
-        cur = conn.cursor()
-        
-        # Clear existing data
-        cur.execute("DELETE FROM employees")
-        print("Cleared existing records in 'employees' table.")
-        
-        insert_query = """
-        INSERT INTO employees (name, age, department, salary_amount, salary_currency, location)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """
-        
-        for r in records:
-            cur.execute(insert_query, (
-                r.get("name"),
-                r.get("age"),
-                r.get("department"),
-                r.get("salary_amount"),
-                r.get("salary_currency", "INR"),
-                r.get("location")
-            ))
-        
-        conn.commit()
-        print(f"Success: Successfully inserted {len(records)} records into SQLite.")
-        conn.close()
+        cur.execute("BEGIN")
+        state = None if restart else read_checkpoint(cur, signature)
+        if state is None:
+            read_checkpoint(cur, signature)      # creates the checkpoint table
+            state = {"table": "employees", "offset": 0, "rows": 0,
+                     "indexes": start_fresh(cur)}
+        else:
+            print(f"Resuming: {state['rows']:,} rows already loaded "
+                  f"(byte {state['offset']:,} of {TINYDB_PATH}).")
+
+        loaded = load_table(cur, state, signature)
+        if state["rows"] == 0 and state["table"] == "employees":
+            state["table"] = "_default"          # older files keep the docs there
+            loaded = load_table(cur, state, signature)
+        load_seconds = time.perf_counter() - started
+        print(f"Success: inserted {loaded:,} records in {load_seconds:.2f}s "
+              f"({loaded / max(load_seconds, 1e-9):,.0f} rows/sec); "
+              f"{state['rows']:,} rows in total.")
+
+        # Indexes once over the full table, far cheaper than maintaining them per
+        # row; same transaction as the checkpoint's removal
+        index_started = time.perf_counter()
+        for sql in state["indexes"]:
+            cur.execute(sql)
+        cur.execute("ANALYZE employees")
+        pair_by_id(conn)                         # change feed: id = doc_id
+        cur.execute(f"DROP TABLE {CHECKPOINT_TABLE}")
+        cur.execute("COMMIT")
+        print(f"Rebuilt {len(state['indexes'])} index(es) and statistics in "
+              f"{time.perf_counter() - index_started:.2f}s.")
+
+        swap_started = time.perf_counter()
+        swap_in(conn)
+        swapped = True
+        print(f"Swapped the load into {SQLITE_DB_PATH} in "
+              f"{time.perf_counter() - swap_started:.2f}s.")
     except Exception as e:
+        if conn.in_transaction:
+            cur.execute("ROLLBACK")
         print(f"Error updating SQLite: {e}")
+        print("Run the script again to resume from the last checkpoint.")
+    finally:
+        conn.close()
+        if swapped:
+            os.remove(load_path)
 
 if __name__ == "__main__":
-    populate_sqlite()
+    populate_sqlite(restart="--restart" in sys.argv[1:])
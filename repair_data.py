@@ -19,6 +19,8 @@ SEED_EMPLOYEES = [
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TINYDB_PATH = os.path.join(BASE_DIR, "backend", "company_nosql.json")
+# Changes appended since the JSON file was last compacted (backend/logstore.py)
+TINYDB_LOG_PATH = TINYDB_PATH + ".log"
 
 def repair_json_directly():
     print(f"--- Zero-Dependency Repair of {TINYDB_PATH} ---")
@@ -39,7 +41,12 @@ def repair_json_directly():
         
         with open(TINYDB_PATH, "w") as f:
             json.dump(full_db, f, indent=4)
-            
+        # The log holds changes to the old data; replayed over the repaired
+        # file it would undo the repair
+        if os.path.exists(TINYDB_LOG_PATH):
+            os.remove(TINYDB_LOG_PATH)
+            print(f"🗑️  Removed change log {TINYDB_LOG_PATH}")
+
         print(f"✅ Successfully re-wrote {TINYDB_PATH} with {len(SEED_EMPLOYEES)} numeric records.")
         
     except Exception as e:
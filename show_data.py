@@ -1,7 +1,8 @@
 import sqlite3
-import json
 import os
 
+from backend.logstore import read_tables   # stdlib only
+
 # ─────────────────────────────────────────────────
 # PATHS
 # ─────────────────────────────────────────────────
@@ -60,23 +61,22 @@ def show_sqlite_data():
         print(f"❌ Error reading SQLite: {e}")
 
 def show_nosql_data():
-    """Reads TinyDB file directly as JSON to avoid dependency issues."""
+    """Reads the TinyDB JSON file plus its change log (.log) without TinyDB."""
     if not os.path.exists(TINYDB_PATH):
         print(f"ℹ️ TinyDB file not found at: {TINYDB_PATH}")
         return
 
     try:
-        with open(TINYDB_PATH, 'r') as f:
-            raw_data = json.load(f)
-            # TinyDB stores data in a table named "employees" (or "_default")
-            # Structure: {"employees": {"1": {...}, "2": {...}}}
-            employees_dict = raw_data.get("employees", {})
-            if not employees_dict:
-                 # Fallback to default if not named
-                 employees_dict = raw_data.get("_default", {})
-                 
-            data = list(employees_dict.values())
-            print_table(data, "TINYDB DATABASE (NoSQL) - employees table")
+        raw_data = read_tables(TINYDB_PATH)
+        # TinyDB stores data in a table named "employees" (or "_default")
+        # Structure: {"employees": {"1": {...}, "2": {...}}}
+        employees_dict = raw_data.get("employees", {})
+        if not employees_dict:
+             # Fallback to default if not named
+             employees_dict = raw_data.get("_default", {})
+
+        data = list(employees_dict.values())
+        print_table(data, "TINYDB DATABASE (NoSQL) - employees table")
     except Exception as e:
         print(f"❌ Error reading TinyDB JSON: {e}")
 
@@ -0,0 +1,98 @@
+import json
+
+from audit_index import AuditIndex
+from audit_store import AuditWriter
+
+
+def _entry(i, **extra):
+    return {"id": i, "timestamp": f"2024-05-01 10:{i // 60:02d}:{i % 60:02d}", "user": "Admin",
+            "action": "Query", "status": "Success", "db_type": "sql", **extra}
+
+
+def _write(path, records):
+    index = AuditIndex(str(path))
+    writer = AuditWriter(str(path), flush_interval=0.01, index=index)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    return index
+
+
+def test_search_pages_newest_first(tmp_path):
+    path = tmp_path / "audit_log.json"
+    index = _write(path, [_entry(i, user="Viewer" if i % 3 == 0 else "Admin",
+                                 status="Success" if i % 2 else "Failed: boom")
+                          for i in range(300)])
+    want = [i for i in range(299, -1, -1) if i % 6 == 0]
+    page = index.search(user="Viewer", status="failed", limit=10)
+    assert [e["id"] for e in page["entries"]] == want[:10]
+    page = index.search(user="Viewer", status="failed", limit=10, cursor=page["next_cursor"])
+    assert [e["id"] for e in page["entries"]] == want[10:20]
+
+    window = index.search(since="2024-05-01T10:01:00", until="2024-05-01 10:01:04")
+    assert [e["id"] for e in window["entries"]] == [64, 63, 62, 61, 60]
+    assert [e["id"] for e in index.search(log_id=123)["entries"]] == [123]
+    assert [e["id"] for e in index.recent(3)] == [297, 298, 299]
+    index.close()
+
+
+def test_recovers_after_a_crash(tmp_path):
+    path = tmp_path / "audit_log.json"
+    _write(path, [_entry(i) for i in range(60)]).close()
+    lines = path.read_bytes().splitlines(keepends=True)
+    # The last 10 lines never reached the disk, and the next one is torn
+    path.write_bytes(b"".join(lines[:50]) + lines[50][:20])
+
+    index = AuditIndex(str(path))
+    assert index.count == 50
+    assert path.read_bytes() == b"".join(lines[:50])
+    assert [e["id"] for e in index.recent(2)] == [48, 49]
+    index.close()
+
+
+def test_unindexed_lines_are_scanned_on_start(tmp_path):
+    path = tmp_path / "audit_log.json"
+    path.write_text("".join(json.dumps(_entry(i)) + "\n" for i in range(20)))
+    index = AuditIndex(str(path))
+    assert (index.count, index.max_id) == (20, 19)
+    index.close()
+
+    with open(path, "a") as f:
+        f.write(json.dumps(_entry(20)) + "\n")
+    index = AuditIndex(str(path))
+    assert (index.count, index.max_id) == (21, 20)
+    assert [e["id"] for e in index.search(log_id=20)["entries"]] == [20]
+    index.close()
+
+
+def test_index_failure_does_not_stop_writes(tmp_path):
+    path = tmp_path / "audit_log.json"
+    index = AuditIndex(str(path))
+    index.close()   # the next append fails
+    writer = AuditWriter(str(path), flush_interval=0.01, index=index)
+    for i in range(3):
+        writer.write(_entry(i))
+    writer.close()
+    assert len(path.read_text().splitlines()) == 3
+    assert writer.index is None and writer.stats()["errors"] == 1
+    assert AuditIndex(str(path)).count == 3   # the unindexed tail is re-scanned
+
+
+def test_search_with_out_of_order_records(tmp_path):
+    path = tmp_path / "audit_log.json"
+    ids = list(range(120))
+    ids[10:20] = reversed(ids[10:20])
+    path.write_text("".join(json.dumps(_entry(i)) + "\n" for i in ids))
+    index = AuditIndex(str(path))
+    for i in (0, 10, 15, 19, 119):
+        assert [e["id"] for e in index.search(log_id=i)["entries"]] == [i]
+    found = index.search(since="2024-05-01T10:00:12", until="2024-05-01T10:00:25", limit=100)
+    assert sorted(e["id"] for e in found["entries"]) == list(range(12, 26))
+    assert [e["id"] for e in index.recent(3)] == [117, 118, 119]
+    index.close()
+
+
+def test_search_before_the_first_flush(tmp_path):
+    index = AuditIndex(str(tmp_path / "audit_log.json"))
+    assert index.search(user="Admin") == {"entries": [], "next_cursor": None}
+    index.close()
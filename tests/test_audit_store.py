@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+
+from audit_store import AuditLog, AuditWriter
+
+
+def _entry(i, **extra):
+    return {"id": i, "timestamp": f"2024-05-01 10:{i // 60:02d}:{i % 60:02d}", "user": "Admin",
+            "action": "Query", "status": "Success", "db_type": "sql", "undone": False,
+            "snapshot_ref": None, **extra}
+
+
+def _log(tmp_path, **kwargs):
+    return AuditLog(str(tmp_path / "snapshots.jsonl"), **kwargs)
+
+
+def _ids(path):
+    return [json.loads(line)["id"] for line in path.read_text().splitlines()]
+
+
+def _wait_for(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return check()
+
+
+def test_memory_is_bounded(tmp_path):
+    log = _log(tmp_path, max_entries=10)
+    for i in range(25):
+        log.append(_entry(i))
+    stats = log.stats()
+    assert (stats["entries"], stats["evicted"], stats["next_id"]) == (10, 15, 25)
+    assert log.get(14) is None and log.get(15)["id"] == 15 and log.get(24)["id"] == 24
+
+
+def test_pages_newest_first_with_filters(tmp_path):
+    log = _log(tmp_path)
+    for i in range(30):
+        log.append(_entry(i, user="Admin" if i % 3 else "Viewer",
+                          status="Success" if i % 2 else "Failed: boom",
+                          db_type="sql" if i < 15 else "nosql"))
+    page = log.page(limit=5)
+    assert [e["id"] for e in page["entries"]] == [29, 28, 27, 26, 25]
+    assert page["next_cursor"] == 25 and page["entries"][0]["has_snapshot"] is False
+    assert "snapshot_ref" not in page["entries"][0]
+    assert [e["id"] for e in log.page(cursor=25, limit=5)["entries"]] == [24, 23, 22, 21, 20]
+
+    failed = log.page(limit=100, status="failed", user="Admin", db_type="nosql")
+    assert [e["id"] for e in failed["entries"]] == [28, 26, 22, 20, 16]
+    window = log.page(limit=100, since="2024-05-01T10:00:10", until="2024-05-01 10:00:12")
+    assert [e["id"] for e in window["entries"]] == [12, 11, 10]
+
+
+def test_newer_than_lists_unflushed_entries(tmp_path):
+    log = _log(tmp_path)
+    for i in range(10):
+        log.append(_entry(0, user="Viewer" if i % 2 else "Admin"))
+    assert [e["id"] for e in log.newer_than(5)] == [9, 8, 7, 6]
+    assert [e["id"] for e in log.newer_than(5, user="Viewer")] == [9, 7]
+    assert [e["id"] for e in log.newer_than(5, limit=1)] == [9]
+    assert [e["id"] for e in log.newer_than(5, log_id=7)] == [7]
+    assert log.newer_than(9) == []
+    assert "snapshot_ref" not in log.newer_than(5)[0]
+
+
+def test_snapshot_segments_roll_over_and_are_removed(tmp_path):
+    log = _log(tmp_path, max_entries=2, segment_bytes=1)
+    entries = [log.append(_entry(i), snapshot=[{"op": "update", "rowid": i}]) for i in range(5)]
+    for e in entries[3:]:
+        assert log.snapshot(e) == [{"op": "update", "rowid": e["id"]}]
+    assert log.stats()["snapshot_segments_live"] == 2
+    assert len(list(tmp_path.iterdir())) == 2   # segments of evicted entries are gone
+
+
+def test_restore_keeps_the_newest_entries(tmp_path):
+    log = _log(tmp_path, max_entries=20)
+    log.restore([_entry(i) for i in range(50)], next_id=0)
+    assert log.stats()["entries"] == 20
+    assert log.get(29) is None and log.get(30)["id"] == 30
+    assert log.next_id == 50
+
+
+def test_restore_sorts_out_of_order_entries(tmp_path):
+    entries = [_entry(i) for i in range(100)]
+    entries[40], entries[41] = entries[41], entries[40]   # written out of order
+    log = _log(tmp_path)
+    log.restore(entries, next_id=100)
+    assert log.stats()["entries"] == 100
+    assert [e["id"] for e in log.page(limit=100)["entries"]] == list(range(99, -1, -1))
+    assert log.get(40)["id"] == 40
+    assert log.next_id == 100
+
+
+def test_restore_keeps_the_newest_entries_and_handles_gaps(tmp_path):
+    entries = [_entry(i) for i in range(50) if i % 10 != 3]
+    log = _log(tmp_path, max_entries=20)
+    log.restore(entries, next_id=0)
+    ids = [e["id"] for e in log.page(limit=50)["entries"]]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 20 and ids[0] == 49
+    assert log.get(43) is None and log.get(44)["id"] == 44
+    assert [e["id"] for e in log.page(cursor=45, limit=3)["entries"]] == [44, 42, 41]
+    assert log.next_id == 50
+    assert log.append({"timestamp": "2024-05-01 11:00:00", "user": "Admin"})["id"] == 50
+
+
+def test_restore_reapplies_undo_and_drops_missing_snapshots(tmp_path):
+    log = _log(tmp_path)
+    undone = log.append(_entry(0), snapshot=[{"op": "delete"}])
+    entries = [dict(undone, undone=False), _entry(1, snapshot_ref=[999, 0, 10]),
+               _entry(2, action="Undo", undo_of=0)]
+    log.close()
+
+    log = _log(tmp_path)
+    log.restore(entries, next_id=3)
+    assert log.get(0)["undone"] is True
+    assert log.snapshot(log.get(0)) == [{"op": "delete"}]
+    assert log.get(1)["snapshot_ref"] is None   # its segment is gone
+
+
+def test_writer_appends_every_record_in_order(tmp_path):
+    path = tmp_path / "audit_log.json"
+    writer = AuditWriter(str(path), batch_size=16, flush_interval=0.01)
+    for i in range(100):
+        writer.write({"id": i})
+    writer.close()
+    writer.write({"id": 100})   # after close: straight to disk
+    assert _ids(path) == list(range(101))
+    stats = writer.stats()
+    assert stats["written"] == 101 and stats["batches"] >= 100 // 16
+    assert stats["queue_depth"] == 0
+
+
+def test_writer_retries_a_failed_batch(tmp_path):
+    path = tmp_path / "missing" / "audit_log.json"   # its directory doesn't exist yet
+    writer = AuditWriter(str(path), flush_interval=0.01)
+    writer.write({"id": 0})
+    assert _wait_for(lambda: writer.stats()["errors"] == 1)
+    path.parent.mkdir()
+    writer.write({"id": 1})
+    writer.close()
+    assert _ids(path) == [0, 1]
+    assert writer.stats()["pending_retry"] == 0
+
+
+def test_writer_never_drops_when_the_queue_is_full(tmp_path, monkeypatch):
+    path = tmp_path / "audit_log.json"
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        time.sleep(0.02)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    writer = AuditWriter(str(path), batch_size=1, flush_interval=0, max_queue=2, put_timeout=0.001)
+    for i in range(30):
+        writer.write({"id": i})
+    writer.close()
+    assert _ids(path) == list(range(30))
+    stats = writer.stats()
+    assert stats["written"] == 30 and stats["sync_writes"] > 0
+
+
+def test_concurrent_appends_reach_the_writer_in_id_order(tmp_path):
+    path = tmp_path / "audit_log.json"
+    log = _log(tmp_path)
+    writer = AuditWriter(str(path), flush_interval=0.01)
+
+    def work():
+        for _ in range(200):
+            log.append(_entry(0), persist=writer.write)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    assert _ids(path) == list(range(800))
@@ -0,0 +1,149 @@
+import pytest
+
+from cdc import ChangeFeed, UnpairedRecords, pair_by_id
+from sql_undo import collect_before_images, install_undo_triggers, start_capture
+from sqlite_pool import SQLitePool
+
+
+class FakeNoSQL:
+    """In-memory stand-in for the TinyDB side: {doc_id: doc}."""
+
+    def __init__(self, docs):
+        self.docs = dict(docs)
+        self.next_id = max(self.docs, default=0) + 1
+
+    def items(self):
+        return list(self.docs.items())
+
+    def allocate(self, n):
+        first, self.next_id = self.next_id, self.next_id + n
+        return list(range(first, first + n))
+
+    def apply(self, upserts, deletes):
+        self.docs.update(upserts)
+        for doc_id in deletes:
+            self.docs.pop(doc_id, None)
+
+    def write(self, feed, doc_id, doc):
+        """A NoSQL mutation: write, then stage/flush its after-image."""
+        before = self.docs.get(doc_id)
+        if doc is None:
+            self.docs.pop(doc_id, None)
+        else:
+            self.docs[doc_id] = doc
+        feed.record_nosql([(doc_id, before, doc)])
+        feed.flush_nosql()
+
+
+ROWS = [(1, "Amit", "IT", 75000), (2, "Priya", "HR", 52000), (3, "Karan", "IT", 91000)]
+
+
+@pytest.fixture
+def setup(tmp_path):
+    pool = SQLitePool(str(tmp_path / "company.db"), readers=1)
+    with pool.writer() as con:
+        con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, "
+                    "department TEXT, salary_amount REAL)")
+        con.executemany("INSERT INTO employees VALUES (?, ?, ?, ?)", ROWS)
+        install_undo_triggers(con)
+    nosql = FakeNoSQL({i: {"name": n, "department": d, "salary_amount": s} for i, n, d, s in ROWS})
+    with pool.writer() as con:
+        pair_by_id(con)   # as after populate_sqlite.py
+    feed = ChangeFeed(pool, nosql.items, nosql.allocate, nosql.apply)
+    yield pool, nosql, feed
+    feed.close()
+    pool.close()
+
+
+def sql_write(pool, feed, sql, params=()):
+    with pool.writer() as con:
+        start_capture(con)
+        con.execute(sql, params)
+        feed.record_sql(con, collect_before_images(con))
+
+
+def sql_row(pool, row_id):
+    with pool.writer() as con:
+        r = con.execute("SELECT name, department, salary_amount FROM employees WHERE id = ?",
+                        (row_id,)).fetchone()
+    return dict(r) if r else None
+
+
+def drain(feed):
+    while feed.sync_once():
+        pass
+
+
+def test_changes_propagate_both_ways(setup):
+    pool, nosql, feed = setup
+    sql_write(pool, feed, "UPDATE employees SET salary_amount = 1 WHERE department = 'IT'")
+    nosql.write(feed, 2, {"name": "Priya", "department": "Ops", "salary_amount": 52000})
+    sql_write(pool, feed, "INSERT INTO employees (name, department, salary_amount) "
+                          "VALUES ('Neha', 'Sales', 67000)")
+    drain(feed)
+    assert nosql.docs[1]["salary_amount"] == 1 and nosql.docs[3]["salary_amount"] == 1
+    assert sql_row(pool, 2)["department"] == "Ops"
+    assert nosql.docs[4] == {"name": "Neha", "department": "Sales", "salary_amount": 67000}
+
+    nosql.write(feed, 4, None)
+    drain(feed)
+    assert sql_row(pool, 4) is None
+    assert feed.stats()["lag"] == 0
+
+
+@pytest.mark.parametrize("nosql_last", [True, False])
+def test_concurrent_changes_later_entry_wins(setup, nosql_last):
+    pool, nosql, feed = setup
+    nosql_image = {"name": "Amit", "department": "IT", "salary_amount": 2}
+    writes = [lambda: sql_write(pool, feed, "UPDATE employees SET salary_amount = 1 WHERE id = 1"),
+              lambda: nosql.write(feed, 1, nosql_image)]
+    for write in (writes if nosql_last else writes[::-1]):
+        write()
+    drain(feed)
+    winner = 2 if nosql_last else 1
+    assert sql_row(pool, 1)["salary_amount"] == winner
+    assert nosql.docs[1]["salary_amount"] == winner
+
+
+def test_staged_nosql_changes_keep_write_order(setup):
+    pool, nosql, feed = setup
+    # Both staged before either is flushed, as under the TinyDB lock
+    feed.record_nosql([(3, None, {"name": "Karan", "department": "IT", "salary_amount": 1})])
+    feed.record_nosql([(3, None, {"name": "Karan", "department": "IT", "salary_amount": 2})])
+    assert feed.stats()["staged"] == 2
+    drain(feed)
+    assert sql_row(pool, 3)["salary_amount"] == 2
+
+
+def test_misaligned_ids_are_reconciled_by_natural_key(tmp_path):
+    pool = SQLitePool(str(tmp_path / "company.db"), readers=1)
+    with pool.writer() as con:
+        con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, "
+                    "department TEXT, salary_amount REAL)")
+        # Same employees, SQL ids 21-23 against doc ids 1-3 (and a 1 that isn't Amit)
+        con.executemany("INSERT INTO employees VALUES (?, ?, ?, ?)",
+                        [(i + 20, n, d, s) for i, n, d, s in ROWS] + [(1, "Ravi", "Ops", 1)])
+        install_undo_triggers(con)
+    nosql = FakeNoSQL({i: {"name": n, "department": d, "salary_amount": s} for i, n, d, s in ROWS})
+    feed = ChangeFeed(pool, nosql.items, nosql.allocate, nosql.apply)
+    with pytest.raises(UnpairedRecords):
+        feed.start()
+
+    result = feed.reconcile(["name", "department"])
+    assert (result["paired"], result["unpaired_sql"], result["unpaired_nosql"]) == (3, [1], [])
+    with pytest.raises(UnpairedRecords):
+        feed.start()                                        # Ravi has no document
+    nosql.docs[4] = {"name": "Ravi", "department": "Ops", "salary_amount": 1}
+    assert feed.reconcile(["name", "department"])["paired"] == 1
+    feed.start()
+
+    sql_write(pool, feed, "UPDATE employees SET salary_amount = 5 WHERE name = 'Amit'")
+    nosql.write(feed, 2, {"name": "Priya", "department": "Ops", "salary_amount": 52000})
+    drain(feed)
+    assert nosql.docs[1]["salary_amount"] == 5 and sql_row(pool, 1)["name"] == "Ravi"
+    assert sql_row(pool, 22)["department"] == "Ops"
+    assert len(nosql.docs) == 4
+    with pool.writer() as con:
+        assert con.execute("SELECT count(*) FROM employees").fetchone()[0] == 4
+    feed.close()
+    pool.close()
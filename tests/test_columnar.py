@@ -0,0 +1,153 @@
+import json
+import random
+import time
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+import columnar
+from columnar import ColumnarCollection, WriteBehind
+from nosql_bulk import write_docs
+from predicates import compile_filter
+
+COLUMNS = {"numeric": ("age", "salary_amount"), "categorical": ("department",)}
+FILTERS = [
+    {}, {"department": "IT"}, {"department": {"$in": ["HR", None]}},
+    {"department": {"$regex": "^f"}}, {"department": {"$exists": False}},
+    {"age": 30}, {"age": {"$gt": 30}}, {"age": {"$gte": 1, "$lt": 40.5}},
+    {"age": {"$ne": 30}}, {"age": {"$in": [30, True, "30"]}}, {"age": {"$nin": [30]}},
+    {"age": {"$exists": True}}, {"salary_amount": {"$gt": 2 ** 60}},
+    {"$or": [{"age": {"$lt": 25}}, {"department": "Sales"}]},
+    {"$nor": [{"age": {"$gt": 30}}]}, {"$and": [{"age": {"$gte": 25}}, {"name": {"$regex": "a"}}]},
+    {"age": {"$not": {"$gt": 30}}},
+]
+
+
+def _docs(n=400, seed=3):
+    rnd = random.Random(seed)
+    ages = [22, 25, 30, 30.0, 35.5, 41, True, "30", None, 2 ** 60]
+    docs = {}
+    for doc_id in range(1, n + 1):
+        doc = {"name": rnd.choice(["Amit", "Priya", "Karan", "Zoe"])}
+        for field, values in (("department", ["IT", "HR", "Finance", "Sales", 7, None]),
+                              ("age", ages), ("salary_amount", [50000, 72000.5, 2 ** 62, "n/a"])):
+            if rnd.random() < 0.9:
+                doc[field] = rnd.choice(values)
+        if rnd.random() < 0.5:
+            doc = dict(reversed(list(doc.items())))
+        docs[doc_id] = doc
+    return docs
+
+
+def _expected(docs, flt):
+    pred = compile_filter(flt)
+    return [(doc_id, doc) for doc_id, doc in docs.items() if pred is None or pred(doc)]
+
+
+def _check(col, docs):
+    for flt in FILTERS:
+        found, ids = col.find(flt)
+        want = _expected(docs, flt)
+        assert ids == [doc_id for doc_id, _ in want], flt
+        # identical values, types and key order
+        assert json.dumps(found) == json.dumps([doc for _, doc in want]), flt
+        assert [[type(v) for v in d.values()] for d in found] == \
+               [[type(v) for v in d.values()] for _, d in want]
+
+
+def test_find_matches_the_row_engine():
+    docs = _docs()
+    _check(ColumnarCollection.from_docs(docs.items(), **COLUMNS), docs)
+
+
+def test_mutations_round_trip():
+    docs = _docs()
+    col = ColumnarCollection.from_docs(docs.items(), **COLUMNS)
+
+    snapshot, changes = col.update({"department": "IT"}, lambda d: d | {"age": 99, "department": "Ops"})
+    for doc_id, before, after in changes:
+        assert docs[doc_id] == before
+        docs[doc_id] = after
+    _check(col, docs)
+
+    deleted, changes = col.delete({"age": {"$gt": 40}})
+    for doc_id, _, _ in changes:
+        del docs[doc_id]
+    _check(col, docs)
+
+    doc_id, _ = col.insert({"name": "Neha", "age": 27, "department": "HR"})
+    assert doc_id == 401
+    docs[doc_id] = {"name": "Neha", "age": 27, "department": "HR"}
+    _check(col, docs)
+
+    for undo in (deleted, snapshot):   # newest first, as undo does
+        for saved in undo:
+            docs[saved["__doc_id__"]] = {k: v for k, v in saved.items() if k != "__doc_id__"}
+        col.restore(undo)
+        docs = dict(sorted(docs.items()))
+        _check(col, docs)
+    assert len(col) == len(docs) == 401
+
+
+def test_write_behind_persists_changes():
+    table = TinyDB(storage=MemoryStorage).table("employees")
+    table.insert_multiple([{"name": "Amit"}, {"name": "Priya"}])
+    col = ColumnarCollection.from_docs(((d.doc_id, d) for d in table.all()), **COLUMNS)
+    writer = WriteBehind(table, linger=0)
+    writer.submit(col.update({"name": "Amit"}, lambda d: d | {"age": 30})[1])
+    writer.submit(col.delete({"name": "Priya"})[1])
+    writer.submit(col.insert({"name": "Neha"})[1])
+    writer.close()
+    assert {d.doc_id: dict(d) for d in table.all()} == {1: {"name": "Amit", "age": 30},
+                                                         3: {"name": "Neha"}}
+    assert writer.stats()["documents_written"] == 3
+
+
+def test_write_behind_retries_a_failed_batch(monkeypatch):
+    table = TinyDB(storage=MemoryStorage).table("employees")
+    calls = []
+
+    def flaky(table, docs):
+        calls.append(dict(docs))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        write_docs(table, docs)
+
+    monkeypatch.setattr(columnar, "write_docs", flaky)
+    writer = WriteBehind(table, linger=0, retry_interval=0.01)
+    writer.submit([(1, None, {"name": "Amit"})])
+    for _ in range(500):
+        if writer.stats()["documents_written"]:
+            break
+        time.sleep(0.01)
+    writer.close()
+    assert {d.doc_id: dict(d) for d in table.all()} == {1: {"name": "Amit"}}
+    stats = writer.stats()
+    assert (stats["errors"], stats["pending_retry"], stats["last_error"]) == (1, 0, "disk full")
+
+
+def test_write_behind_close_retries_a_failed_batch(monkeypatch):
+    table = TinyDB(storage=MemoryStorage).table("employees")
+    calls = []
+
+    def flaky(table, docs):
+        calls.append(dict(docs))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        write_docs(table, docs)
+
+    monkeypatch.setattr(columnar, "write_docs", flaky)
+    writer = WriteBehind(table, linger=0, retry_interval=60)
+    writer.submit([(1, None, {"name": "Amit"})])
+    writer.close()
+    assert {d.doc_id: dict(d) for d in table.all()} == {1: {"name": "Amit"}}
+    assert writer.stats()["pending_retry"] == 0
+
+
+def test_write_behind_sync_waits_for_the_write():
+    table = TinyDB(storage=MemoryStorage).table("employees")
+    writer = WriteBehind(table, linger=0.05)
+    writer.submit([(1, None, {"name": "Amit"})])
+    assert writer.sync(timeout=5)
+    assert {d.doc_id: dict(d) for d in table.all()} == {1: {"name": "Amit"}}
+    writer.close()
@@ -0,0 +1,89 @@
+import contextvars
+import asyncio
+
+from insight_jobs import InsightJobQueue
+
+
+async def _echo(sample, count, prompt):
+    await asyncio.sleep(0)
+    return f"{prompt}: {count}"
+
+
+def test_jobs_run_in_the_background():
+    async def main():
+        jobs = InsightJobQueue(_echo, workers=2)
+        ids = [jobs.submit([{"id": 1}], n, "q") for n in range(5)]
+        assert all(jobs.get(i)["status"] == "queued" for i in ids)
+        done = [await jobs.wait(i, timeout=5) for i in ids]
+        await jobs.stop()
+        return jobs, done
+
+    jobs, done = asyncio.run(main())
+    assert [d["insights"] for d in done] == [f"q: {n}" for n in range(5)]
+    assert all(d["status"] == "done" and d["finished"] for d in done)
+    assert jobs.stats()["completed"] == 5
+
+
+def test_full_queue_rejects_and_failures_are_recorded():
+    async def boom(sample, count, prompt):
+        raise RuntimeError("LLM down")
+
+    async def main():
+        jobs = InsightJobQueue(boom, workers=1, max_queue=2)
+        ids = [jobs.submit([], 0, "q") for _ in range(3)]   # no worker has run yet
+        results = [await jobs.wait(i, timeout=5) for i in ids if i]
+        await jobs.stop()
+        return jobs, ids, results
+
+    jobs, ids, results = asyncio.run(main())
+    assert ids[2] is None and jobs.stats()["rejected"] == 1
+    assert [(r["status"], r["error"]) for r in results] == [("failed", "LLM down")] * 2
+
+
+def test_finished_and_excess_jobs_are_evicted():
+    async def main():
+        jobs = InsightJobQueue(_echo, max_jobs=3, ttl=0.0)
+        first = jobs.submit([], 0, "q")
+        await jobs.wait(first, timeout=5)
+        await asyncio.sleep(0.01)
+        pending = [jobs.submit([], n, "q") for n in range(4)]   # expiry runs on submit
+        await jobs.stop()
+        return jobs, first, pending
+
+    jobs, first, pending = asyncio.run(main())
+    assert jobs.get(first) is None
+    assert jobs.get(pending[0]) is None          # over max_jobs
+    assert all(jobs.get(i) for i in pending[1:])
+
+
+def test_queue_survives_a_new_event_loop():
+    jobs = InsightJobQueue(_echo, workers=1)
+
+    async def main():
+        done = [await jobs.wait(jobs.submit([], n, "q"), timeout=5) for n in range(2)]
+        await asyncio.sleep(0.01)
+        workers = jobs.stats()["workers"]
+        await jobs.stop()
+        return [d["status"] for d in done], workers
+
+    for _ in range(2):   # e.g. the app restarted under a new loop
+        assert asyncio.run(main()) == (["done", "done"], 1)
+
+
+def test_handler_runs_in_the_submitters_context():
+    request_id = contextvars.ContextVar("request_id", default=None)
+
+    async def handler(sample, count, prompt):
+        return request_id.get()
+
+    async def main():
+        jobs = InsightJobQueue(handler, workers=1)
+        request_id.set("first")
+        a = jobs.submit([], 0, "q")
+        request_id.set("second")
+        b = jobs.submit([], 0, "q")
+        done = [await jobs.wait(i, timeout=5) for i in (a, b)]
+        await jobs.stop()
+        return [d["insights"] for d in done]
+
+    assert asyncio.run(main()) == ["first", "second"]
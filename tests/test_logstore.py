@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+
+from logstore import LogStore, fold, log_path, read_tables
+
+
+def _doc(i, v):
+    return {"name": f"e{i}", "v": v}
+
+
+def test_replay_after_compaction(tmp_path):
+    path = str(tmp_path / "db.json")
+    store = LogStore(path, compact_ratio=None)
+    store.write_docs("employees", {str(i): _doc(i, 0) for i in range(1, 21)})
+    store.write_docs("employees", {"3": _doc(3, 1), "4": None})
+    store.compact()
+    # Appended after the compaction: replayed over the new base
+    store.write_docs("employees", {"5": _doc(5, 2), "6": None, "21": _doc(21, 0)})
+    store.write_docs("other", {"1": {"x": 1}})
+    expected = {name: dict(docs) for name, docs in store.read().items()}
+    assert store.stats()["compactions"] == 1
+    store.close()
+
+    reopened = LogStore(path, compact_ratio=None)
+    assert reopened.read() == expected
+    assert reopened.read()["employees"]["3"] == _doc(3, 1)
+    assert "4" not in reopened.read()["employees"] and "6" not in reopened.read()["employees"]
+    reopened.close()
+    assert read_tables(path) == expected
+
+    fold(path)
+    assert not os.path.exists(log_path(path))
+    assert read_tables(path) == expected
+
+
+def test_background_compaction_keeps_every_write(tmp_path):
+    path = str(tmp_path / "db.json")
+    store = LogStore(path, compact_ratio=0.3, compact_min_bytes=0, sync=False)
+    for round_ in range(30):
+        store.write_docs("employees", {str(i): _doc(i, round_) for i in range(1, 51)})
+    store.close()
+    assert store.compactions >= 1
+    assert read_tables(path)["employees"] == {str(i): _doc(i, 29) for i in range(1, 51)}
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "db.json")
+    store = LogStore(path, compact_ratio=None)
+    store.write_docs("employees", {"1": _doc(1, 0)})
+    store.close()
+    size = os.path.getsize(log_path(path))
+    with open(log_path(path), "ab") as f:
+        f.write(b'{"table": "employees", "put": {"2": ')   # crash mid-append
+
+    store = LogStore(path, compact_ratio=None)
+    assert store.read() == {"employees": {"1": _doc(1, 0)}}
+    assert os.path.getsize(log_path(path)) == size
+    store.write_docs("employees", {"2": _doc(2, 0)})
+    store.close()
+    assert read_tables(path)["employees"] == {"1": _doc(1, 0), "2": _doc(2, 0)}
+
+
+def _writer(path, first):
+    store = LogStore(path, compact_ratio=0.3, compact_min_bytes=0, sync=False)
+    for i in range(first, first + 200):
+        store.write_docs("employees", {str(i): _doc(i, 0)})
+        store.write_docs("employees", {str(i): _doc(i, 1)})
+        if i % 50 == 0:
+            store.compact()
+    store.close()
+
+
+def test_processes_share_the_files(tmp_path):
+    path = str(tmp_path / "db.json")
+    LogStore(path).close()
+    procs = [multiprocessing.Process(target=_writer, args=(path, first))
+             for first in (1, 1001, 2001)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    expected = {str(i): _doc(i, 1) for first in (1, 1001, 2001) for i in range(first, first + 200)}
+    assert read_tables(path)["employees"] == expected
+
+
+def test_read_returns_a_snapshot(tmp_path):
+    path = str(tmp_path / "db.json")
+    store = LogStore(path, compact_ratio=None, sync=False)
+    store.write_docs("employees", {"1": _doc(1, 0)})
+    snapshot = store.read()
+    store.write_docs("employees", {"1": _doc(1, 1), "2": _doc(2, 0)})
+    store.write_docs("other", {"1": {"x": 1}})
+    assert snapshot == {"employees": {"1": _doc(1, 0)}}
+
+    # TinyDB-style write-back: only the table that changed is logged
+    tables = store.read()
+    tables["other"] = {"1": {"x": 2}}
+    before = store.appends
+    store.write(tables)
+    assert store.appends == before + 1
+    store.close()
+    assert read_tables(path)["other"] == {"1": {"x": 2}}
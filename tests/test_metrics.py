@@ -0,0 +1,56 @@
+import threading
+
+from metrics import Registry, request_labels
+
+
+def test_counter_and_histogram_render():
+    registry = Registry()
+    queries = registry.counter("queries_total", "Queries run", ("db_type", "status"))
+    latency = registry.histogram("query_seconds", "Query latency", ("db_type",), buckets=(0.1, 1.0))
+    queries.inc(db_type="sql", status="ok")
+    queries.inc(2, db_type="sql", status="ok")
+    queries.inc(db_type='no"sql', status="error")
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(seconds, db_type="sql")
+    assert registry.render().splitlines() == [
+        "# HELP queries_total Queries run",
+        "# TYPE queries_total counter",
+        'queries_total{db_type="no\\"sql",status="error"} 1',
+        'queries_total{db_type="sql",status="ok"} 3',
+        "# HELP query_seconds Query latency",
+        "# TYPE query_seconds histogram",
+        'query_seconds_bucket{db_type="sql",le="0.1"} 2',
+        'query_seconds_bucket{db_type="sql",le="1.0"} 3',
+        'query_seconds_bucket{db_type="sql",le="+Inf"} 4',
+        'query_seconds_sum{db_type="sql"} 3.65',
+        'query_seconds_count{db_type="sql"} 4',
+    ]
+
+
+def test_labels_default_to_the_request_context():
+    counter = Registry().counter("llm_calls_total", "LLM calls", ("db_type", "mode", "purpose"))
+    token = request_labels.set({"db_type": "nosql", "mode": "query"})
+    try:
+        counter.inc(purpose="generate")
+        counter.inc(purpose="generate", mode="insight")
+    finally:
+        request_labels.reset(token)
+    counter.inc(purpose="generate")
+    assert counter._values == {("nosql", "query", "generate"): 1,
+                               ("nosql", "insight", "generate"): 1,
+                               ("none", "none", "generate"): 1}
+
+
+def test_concurrent_increments_are_not_lost():
+    counter = Registry().counter("hits_total", "Hits")
+
+    def work():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter._values == {(): 40000}
@@ -0,0 +1,57 @@
+import pytest
+
+from nosql_aggregate import run_pipeline
+from predicates import compile_filter
+
+DOCS = [
+    {"name": "Amit", "department": "IT", "salary_amount": 75000, "age": 29},
+    {"name": "Priya", "department": "HR", "salary_amount": 62000, "age": 24},
+    {"name": "Karan", "department": "IT", "salary_amount": 82000, "age": 31},
+    {"name": "Sneha", "department": "Finance", "salary_amount": "n/a", "age": 27},
+    {"name": "Rahul", "department": "HR", "salary_amount": 58000},
+]
+
+
+def _find(flt):
+    pred = compile_filter(flt)
+    return [d for d in DOCS if pred is None or pred(d)], {"type": "scan", "filter": flt}
+
+
+def test_group_sort_limit_project():
+    rows, plan = run_pipeline([
+        {"$match": {"age": {"$gte": 24}}},
+        {"$group": {"_id": "$department", "avg_salary": {"$avg": "$salary_amount"},
+                    "n": {"$count": {}}, "oldest": {"$max": "$age"}}},
+        {"$sort": {"avg_salary": -1}},
+        {"$limit": 2},
+        {"$project": {"department": "$_id", "avg_salary": 1, "n": 1, "_id": 0}},
+    ], _find)
+    assert plan["filter"] == {"age": {"$gte": 24}}   # the leading $match went to find()
+    assert rows == [{"department": "IT", "avg_salary": 78500, "n": 2},
+                    {"department": "HR", "avg_salary": 62000, "n": 1}]
+
+
+def test_non_numeric_values_are_skipped_and_null_groups_work():
+    rows, _ = run_pipeline([{"$group": {"_id": None, "total": {"$sum": "$salary_amount"},
+                                        "youngest": {"$min": "$age"}}}], _find)
+    assert rows == [{"_id": None, "total": 277000, "youngest": 24}]
+    rows, _ = run_pipeline([{"$match": {"department": "Finance"}},
+                            {"$group": {"_id": {"d": "$department"}, "avg": {"$avg": "$salary_amount"}}}],
+                           _find)
+    assert rows == [{"_id": {"d": "Finance"}, "avg": None}]
+
+
+def test_count_skip_and_later_match():
+    rows, _ = run_pipeline([{"$sort": "name"}, {"$skip": 1},
+                            {"$match": {"department": "HR"}}, {"$count": "hr"}], _find)
+    assert rows == [{"hr": 2}]
+
+
+@pytest.mark.parametrize("pipeline", [
+    {"$match": {}}, [{"$match": {}, "$limit": 1}], [{"$bucket": {}}],
+    [{"$group": {"total": {"$sum": "$age"}}}], [{"$group": {"_id": None, "x": {"$push": "$age"}}}],
+    [{"$limit": -1}], [{"$count": "$n"}],
+])
+def test_invalid_pipelines_are_rejected(pipeline):
+    with pytest.raises(ValueError):
+        run_pipeline(pipeline, _find)
@@ -0,0 +1,68 @@
+import pytest
+from tinydb import TinyDB
+
+from nosql_bulk import bulk_delete, bulk_restore, bulk_update
+from storage import AtomicJSONStorage
+
+DOCS = [
+    {"name": "Amit", "department": "IT", "salary_amount": 75000},
+    {"name": "Priya", "department": "HR", "salary_amount": 62000},
+    {"name": "Karan", "department": "IT", "salary_amount": 82000},
+    {"name": "Sneha", "department": "Finance", "salary_amount": 70000},
+]
+
+
+@pytest.fixture
+def table(tmp_path):
+    db = TinyDB(str(tmp_path / "db.json"), storage=AtomicJSONStorage)
+    table = db.table("employees")
+    table.insert_multiple(DOCS)
+    return table
+
+
+def _count_writes(table, monkeypatch):
+    writes, write = [], table.storage.write
+    monkeypatch.setattr(table.storage, "write", lambda data: (writes.append(1), write(data)))
+    return writes
+
+
+def _contents(table):
+    return {doc.doc_id: dict(doc) for doc in table.all()}
+
+
+def test_update_is_a_single_write(table, monkeypatch):
+    writes = _count_writes(table, monkeypatch)
+    snapshot, changes = bulk_update(table, lambda d: d["department"] == "IT",
+                                    lambda d: d | {"salary_amount": d["salary_amount"] + 1})
+    assert len(writes) == 1
+    assert snapshot == [DOCS[0] | {"__doc_id__": 1}, DOCS[2] | {"__doc_id__": 3}]
+    assert [(c[0], c[2]["salary_amount"]) for c in changes] == [(1, 75001), (3, 82001)]
+    assert table.get(doc_id=3)["salary_amount"] == 82001
+
+    bulk_restore(table, snapshot)
+    assert _contents(table) == {i + 1: d for i, d in enumerate(DOCS)}
+
+
+def test_delete_keeps_ids_and_restore_recreates(table, monkeypatch):
+    writes = _count_writes(table, monkeypatch)
+    snapshot, changes = bulk_delete(table, None)
+    assert len(writes) == 1 and len(table) == 0
+    assert [c[2] for c in changes] == [None] * len(DOCS)
+    new_id = table.insert({"name": "Zed"})
+    assert new_id == len(DOCS) + 1          # ids are not handed out again
+
+    changes = bulk_restore(table, snapshot)
+    assert [c[:2] for c in changes] == [(i, None) for i in range(1, len(DOCS) + 1)]
+    assert _contents(table) == {**{i + 1: d for i, d in enumerate(DOCS)}, new_id: {"name": "Zed"}}
+
+
+def test_failed_write_leaves_the_file_intact(tmp_path):
+    path = tmp_path / "db.json"
+    table = TinyDB(str(path), storage=AtomicJSONStorage).table("employees")
+    table.insert(DOCS[0])
+    before = path.read_bytes()
+    with pytest.raises(TypeError):
+        table.insert({"name": "Priya", "tags": {"x"}})   # not JSON serializable
+    assert path.read_bytes() == before
+    assert [p.name for p in tmp_path.iterdir()] == ["db.json"]
+    assert [d["name"] for d in table.all()] == ["Amit"]
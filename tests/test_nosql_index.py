@@ -0,0 +1,81 @@
+import operator
+import random
+
+from nosql_index import IndexManager
+
+DECLARED = {"department": "hash", "age": "sorted"}
+DOCS = {
+    1: {"name": "Amit", "department": "IT", "age": 29},
+    2: {"name": "Priya", "department": "HR", "age": 24},
+    3: {"name": "Karan", "department": "Finance", "age": 31},
+    4: {"name": "Sneha", "department": "IT", "age": 27},
+    5: {"name": "Rahul", "department": "Finance", "age": 35},
+    6: {"name": "Anjali", "department": "HR", "age": 22},
+    7: {"name": "Vikram", "department": "IT", "age": 40},
+    8: {"name": "Neha", "department": "Marketing", "age": 28},
+}
+OPS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def _indexes(docs=DOCS):
+    indexes = IndexManager(DECLARED)
+    indexes.rebuild(docs.items())
+    return indexes
+
+
+def _matches(doc, field, spec):
+    if field not in doc:
+        return False
+    v = doc[field]
+    if not isinstance(spec, dict):
+        return v == spec
+    if "$in" in spec:
+        return v in spec["$in"]
+    try:
+        return all(OPS[op](v, val) for op, val in spec.items())
+    except TypeError:
+        return False
+
+
+def test_plan_picks_the_most_selective_index():
+    plan, ids = _indexes().plan({"department": "IT", "age": {"$gt": 39}})
+    assert plan == {"type": "index", "index": "age", "kind": "sorted", "candidates": 1}
+    assert ids == {7}
+    plan, ids = _indexes().plan({"$and": [{"department": {"$in": ["HR", "Marketing"]}},
+                                          {"age": {"$lt": 30}}]})
+    assert plan["index"] == "department" and ids == {2, 6, 8}
+
+
+def test_plan_falls_back_to_a_scan():
+    indexes = _indexes()
+    assert indexes.plan({})[0] == {"type": "scan", "reason": "no filter"}
+    for flt in ({"name": "Amit"}, {"$or": [{"department": "IT"}]},
+                {"department": {"$regex": "^I"}}, {"age": {"$gt": "30"}}):
+        plan, ids = indexes.plan(flt)
+        assert plan == {"type": "scan", "reason": "no usable index"} and ids is None
+
+
+def test_candidates_cover_every_match_after_changes():
+    rnd = random.Random(7)
+    values = ["IT", "HR", None, 3, 3.0, True, "n/a", [1], 30, 29.5, float("nan")]
+    docs = {}
+    for doc_id in range(1, 301):
+        docs[doc_id] = {f: rnd.choice(values) for f in DECLARED if rnd.random() < 0.9}
+    indexes = _indexes(docs)
+    for _ in range(300):
+        doc_id = rnd.randint(1, 320)
+        before = docs.pop(doc_id, None)
+        after = None if rnd.random() < 0.3 else {f: rnd.choice(values) for f in DECLARED}
+        if after is not None:
+            docs[doc_id] = after
+        indexes.apply_changes([(doc_id, before, after)])
+
+    specs = [("department", "IT"), ("department", {"$in": ["HR", 3]}), ("age", 3),
+             ("age", {"$gte": 3}), ("age", {"$gt": 1, "$lte": 29.5}), ("age", {"$lt": 30})]
+    for field, spec in specs:
+        plan, ids = indexes.plan({field: spec})
+        assert plan["type"] == "index"
+        assert {i for i, d in docs.items() if _matches(d, field, spec)} <= ids
+
+    fresh = _indexes(docs)
+    assert fresh.stats() == indexes.stats()
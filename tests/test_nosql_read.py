@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from nosql_read import apply_read_options, parse_sort, sort_key
+
+DOCS = [
+    {"name": "Amit", "department": "IT", "age": 29},
+    {"name": "Priya", "department": "HR", "age": 24},
+    {"name": "Karan", "department": "IT", "age": 31},
+    {"name": "Sneha", "department": "Finance"},
+    {"name": "Rahul", "department": "HR", "age": 24},
+]
+
+
+def _names(docs):
+    return [d["name"] for d in docs]
+
+
+def test_sort_spellings():
+    assert parse_sort("-age") == [("age", -1)]
+    assert parse_sort({"department": 1, "age": "desc"}) == [("department", 1), ("age", -1)]
+    assert parse_sort([["age", -1], "name"]) == [("age", -1), ("name", 1)]
+
+
+def test_sort_skip_limit_and_projection():
+    results, total = apply_read_options(list(DOCS), {"sort": ["department", "-age"],
+                                                     "skip": 1, "limit": 3,
+                                                     "projection": {"name": 1}})
+    assert total == 5
+    assert results == [{"name": "Priya"}, {"name": "Rahul"}, {"name": "Karan"}]
+    results, _ = apply_read_options(list(DOCS), {"projection": {"age": 0}, "limit": 1})
+    assert results == [{"name": "Amit", "department": "IT"}]
+    with pytest.raises(ValueError):
+        apply_read_options(list(DOCS), {"limit": -1})
+
+
+def test_mixed_types_sort_without_raising():
+    docs = [{"v": v} for v in ["b", 3, None, True, 2.5, {"x": 1}, float("nan"), "a"]]
+    results, _ = apply_read_options(docs, {"sort": "v"})
+    assert [d["v"] for d in results][:1] == [None]
+    assert [d["v"] for d in results][2:] == [True, 2.5, 3, "a", "b", {"x": 1}]
+
+
+def test_top_k_matches_a_full_sort():
+    rnd = random.Random(5)
+    docs = [{"a": rnd.randint(0, 5), "b": rnd.choice([None, 1, "x", 2.0])} for _ in range(300)]
+    for sort in ("a", "-a", ["a", "-b"], {"b": -1, "a": -1}):
+        key, reverse = sort_key(parse_sort(sort))
+        full = sorted(docs, key=key, reverse=reverse)
+        for skip, limit in ((0, 5), (7, 20), (290, 50)):
+            results, _ = apply_read_options(docs, {"sort": sort, "skip": skip, "limit": limit})
+            assert results == full[skip:skip + limit]
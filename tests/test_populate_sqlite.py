@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+import populate_sqlite as ps
+from cdc import LOG, MAP, create_tables
+from logstore import LogStore
+
+
+def _docs(first, last):
+    return {str(i): {"name": f"Émp {i} ✓", "age": 20 + i % 40, "department": f"d{i % 5}",
+                     "salary_amount": 1000.0 * i, "salary_currency": "INR", "location": "Pune"}
+            for i in range(first, last + 1)}
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    db, source = tmp_path / "company_sql.db", tmp_path / "company_nosql.json"
+    monkeypatch.setattr(ps, "SQLITE_DB_PATH", str(db))
+    monkeypatch.setattr(ps, "TINYDB_PATH", str(source))
+    monkeypatch.setattr(ps, "READ_CHUNK", 4096)     # documents straddle chunk boundaries
+    monkeypatch.setattr(ps, "BATCH_ROWS", 100)
+    monkeypatch.setattr(ps, "COMMIT_ROWS", 500)
+    con = sqlite3.connect(db)
+    con.execute(ps.EMPLOYEES_DDL)
+    con.execute("CREATE INDEX idx_dept ON employees (department)")
+    con.execute("INSERT INTO employees VALUES (99999, 'stale', 1, 'x', 1, 'INR', 'x')")
+    create_tables(con)
+    con.execute(f"INSERT INTO {MAP} VALUES (5, 99999)")
+    con.execute(f"INSERT INTO {LOG} (source, key, doc, ts) VALUES ('sql', 99999, NULL, 0)")
+    con.commit()
+    con.close()
+    return db, source
+
+
+def _rows(db):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute("SELECT id, name FROM employees ORDER BY id").fetchall()
+    finally:
+        con.close()
+
+
+def _names(db, kind):
+    con = sqlite3.connect(db)
+    try:
+        return {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+    finally:
+        con.close()
+
+
+def test_loads_every_document_under_its_doc_id(paths):
+    db, source = paths
+    source.write_text(json.dumps({"other": {"1": {"x": 1}}, "employees": _docs(1, 2345)},
+                                 ensure_ascii=False), encoding="utf-8")
+    ps.populate_sqlite()
+    rows = _rows(db)
+    assert [r[0] for r in rows] == list(range(1, 2346))
+    assert rows[0][1] == "Émp 1 ✓"
+    assert "idx_dept" in _names(db, "index")                # the live table's, rebuilt
+    assert ps.CHECKPOINT_TABLE not in _names(db, "table")
+    con = sqlite3.connect(db)
+    try:                                                    # change feed: id = doc_id
+        assert con.execute(f"SELECT count(*) FROM {MAP} WHERE doc_id = row_id").fetchone()[0] == 2345
+        assert con.execute(f"SELECT count(*) FROM {MAP}").fetchone()[0] == 2345
+        assert con.execute(f"SELECT count(*) FROM {LOG}").fetchone()[0] == 0
+    finally:
+        con.close()
+
+
+def test_older_files_load_from_the_default_table(paths):
+    db, source = paths
+    source.write_text(json.dumps({"_default": _docs(1, 10)}), encoding="utf-8")
+    ps.populate_sqlite()
+    assert len(_rows(db)) == 10
+
+
+def test_an_interrupted_load_resumes(paths, monkeypatch):
+    db, source = paths
+    source.write_text(json.dumps({"employees": _docs(1, 2000)}), encoding="utf-8")
+    documents = ps.TinyDBReader.documents
+
+    def killed(self):
+        for i, item in enumerate(documents(self)):
+            if i == 1250:
+                raise KeyboardInterrupt
+            yield item
+
+    monkeypatch.setattr(ps.TinyDBReader, "documents", killed)
+    with pytest.raises(KeyboardInterrupt):
+        ps.populate_sqlite()
+    loading = str(db) + ps.LOAD_SUFFIX
+    assert _rows(db) == [(99999, "stale")]                  # live database untouched
+    assert ps.CHECKPOINT_TABLE not in _names(db, "table")
+    assert len(_rows(loading)) == 1000                      # two committed checkpoints
+    assert ps.CHECKPOINT_TABLE in _names(loading, "table")
+
+    monkeypatch.setattr(ps.TinyDBReader, "documents", documents)
+    ps.populate_sqlite()
+    assert [r[0] for r in _rows(db)] == list(range(1, 2001))
+    assert not os.path.exists(loading)
+
+
+def test_swaps_into_a_database_in_use(paths):
+    db, source = paths
+    source.write_text(json.dumps({"employees": _docs(1, 300)}), encoding="utf-8")
+    reader = sqlite3.connect(db)
+    reader.execute("PRAGMA journal_mode=WAL")
+    assert reader.execute("SELECT count(*) FROM employees").fetchone()[0] == 1
+    ps.populate_sqlite()
+    assert reader.execute("SELECT count(*) FROM employees").fetchone()[0] == 300
+    assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reader.close()
+
+
+def test_changes_in_the_log_override_the_base(paths):
+    db, source = paths
+    source.write_text(json.dumps({"employees": _docs(1, 600)}), encoding="utf-8")
+    store = LogStore(str(source), compact_ratio=None)
+    store.write_docs("employees", {"2": None, "3": dict(_docs(3, 3)["3"], name="Changed"),
+                                   "601": _docs(601, 601)["601"]})
+    store.close()
+    ps.populate_sqlite()
+    rows = dict(_rows(db))
+    assert 2 not in rows and rows[3] == "Changed" and rows[601] == "Émp 601 ✓"
+    assert len(rows) == 600
@@ -0,0 +1,76 @@
+import operator
+import re
+
+import pytest
+from tinydb import Query, TinyDB
+from tinydb.storages import MemoryStorage
+
+from predicates import compile_filter
+
+q = Query()
+
+
+def safe(path, op, value):
+    """`path <op> value` where a type mismatch is a non-match: TinyDB's own
+    comparisons raise there, the translator they were wrapped in didn't."""
+    def test(v):
+        try:
+            return op(v, value)
+        except TypeError:
+            return False
+    return path.test(test)
+
+
+DOCS = [
+    {"name": "Amit", "age": 29, "department": "IT", "salary_amount": 75000, "location": "Hyderabad"},
+    {"name": "Priya", "age": 31, "department": "HR", "salary_amount": 52000.5, "location": "Pune"},
+    {"name": "Karan", "age": "unknown", "department": "IT", "salary_amount": 91000},
+    {"name": "neha", "age": 27, "department": "Sales", "salary_amount": None, "location": "Delhi"},
+    {"name": "Raj", "department": ["IT", "HR"], "salary_amount": 67000, "location": "Pune"},
+]
+
+# filter → the TinyDB Query it replaces
+CASES = [
+    ({"department": "IT"}, q.department == "IT"),
+    ({"department": {"$eq": "HR"}}, q.department == "HR"),
+    ({"department": {"$ne": "IT"}}, q.department != "IT"),
+    ({"age": {"$gt": 28}}, safe(q.age, operator.gt, 28)),
+    ({"age": {"$gte": 27, "$lt": 31}}, safe(q.age, operator.ge, 27) & safe(q.age, operator.lt, 31)),
+    ({"salary_amount": {"$lte": 67000}}, safe(q.salary_amount, operator.le, 67000)),
+    ({"department": {"$in": ["IT", "Sales"]}}, q.department.one_of(["IT", "Sales"])),
+    ({"department": {"$nin": ["IT", "Sales"]}}, ~q.department.one_of(["IT", "Sales"])),
+    ({"name": {"$regex": "^n"}}, q.name.matches("^n", flags=re.IGNORECASE)),
+    ({"location": {"$exists": True}}, q.location.exists()),
+    ({"location": {"$exists": False}}, ~q.location.exists()),
+    ({"age": {"$not": {"$gt": 28}}}, ~safe(q.age, operator.gt, 28)),
+    ({"$or": [{"department": "HR"}, {"age": {"$lt": 28}}]},
+     (q.department == "HR") | safe(q.age, operator.lt, 28)),
+    ({"$and": [{"department": "IT"}, {"salary_amount": {"$gt": 80000}}]},
+     (q.department == "IT") & safe(q.salary_amount, operator.gt, 80000)),
+    ({"$nor": [{"department": "IT"}, {"location": "Pune"}]},
+     ~((q.department == "IT") | (q.location == "Pune"))),
+    ({"location": "Pune", "salary_amount": {"$gt": 60000}},
+     (q.location == "Pune") & safe(q.salary_amount, operator.gt, 60000)),
+]
+
+
+@pytest.fixture(scope="module")
+def table():
+    db = TinyDB(storage=MemoryStorage)
+    db.table("employees").insert_multiple(DOCS)
+    return db.table("employees")
+
+
+@pytest.mark.parametrize("flt,query", CASES)
+def test_matches_tinydb_query(table, flt, query):
+    pred = compile_filter(flt)
+    assert [d.doc_id for d in table.search(pred)] == [d.doc_id for d in table.search(query)]
+    assert [pred(dict(d)) for d in table.all()] == [query(d) for d in table.all()]
+
+
+def test_empty_filter_matches_everything():
+    assert compile_filter({}) is None
+
+
+def test_compiled_predicates_are_cached():
+    assert compile_filter({"a": 1, "b": 2}) is compile_filter({"b": 2, "a": 1})
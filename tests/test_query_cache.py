@@ -0,0 +1,46 @@
+import query_cache
+from query_cache import QueryCache, normalize_prompt
+
+
+def test_normalize_prompt_folds_case_outside_quotes():
+    assert normalize_prompt("  Show   employees in 'Sales'  Department?? ") == \
+        "show employees in 'Sales' department"
+    assert normalize_prompt('WHO works in "IT".') == 'who works in "IT"'
+    assert normalize_prompt("in 'IT'") != normalize_prompt("in 'it'")
+
+
+def test_lru_eviction_and_counters():
+    cache = QueryCache(max_size=2)
+    keys = [cache.make_key(f"prompt {i}", "query", "sql", "schema") for i in range(3)]
+    cache.put(keys[0], "a")
+    cache.put(keys[1], "b")
+    assert cache.get(keys[0]) == "a"      # keys[1] is now least recently used
+    cache.put(keys[2], "c")
+    assert cache.get(keys[1]) is None
+    assert (cache.get(keys[0]), cache.get(keys[2])) == ("a", "c")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(ttl=60)
+    key = cache.make_key("show all", "query", "sql", "schema")
+    cache.put(key, "SELECT * FROM employees")
+    now[0] += 59
+    assert cache.get(key) is not None
+    now[0] += 2
+    assert cache.get(key) is None
+
+
+def test_schema_change_drops_entries():
+    cache = QueryCache()
+    key = cache.make_key("Show all", "query", "sql", "schema v1")
+    other = cache.make_key("Show all", "query", "nosql", "schema v1")
+    cache.put(key, "SELECT * FROM employees")
+    cache.put(other, "{}")
+    assert cache.get(cache.make_key("show all.", "query", "sql", "schema v1")) is not None
+    cache.make_key("show all", "query", "sql", "schema v2")
+    assert cache.get(key) is None
+    assert cache.get(other) == "{}"
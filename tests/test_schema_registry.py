@@ -0,0 +1,49 @@
+import json
+
+from schema_registry import DocumentSchema, SchemaRegistry
+
+DOCS = [
+    {"name": "Amit", "age": 29, "salary": 75000.0},
+    {"name": "Priya", "age": 24.5},
+    {"name": "Karan", "age": None, "salary": 82000},
+]
+
+
+def test_describe_reports_types_and_nullability():
+    schema = DocumentSchema()
+    for doc in DOCS:
+        schema.add(doc)
+    assert schema.describe() == {"name": "str", "age": "float | int | null",
+                                 "salary": "float | int | null"}
+    schema.remove(DOCS[1])
+    schema.remove(DOCS[2])
+    assert schema.describe() == {"name": "str", "age": "int", "salary": "float"}
+
+
+def test_nosql_schema_is_built_once_and_folded_incrementally():
+    loads = []
+
+    def docs_loader():
+        loads.append(1)
+        return list(DOCS)
+
+    registry = SchemaRegistry(lambda: "sql", docs_loader)
+    first = registry.nosql_schema()
+    assert json.loads(first)["name"] == "str"
+    registry.apply_changes([(1, DOCS[0], dict(DOCS[0], name="Amit K"))])
+    assert registry.nosql_schema() is first            # same shape: still cached
+    assert registry.versions["nosql"] == 0
+    registry.apply_changes([(4, None, {"name": "Neha", "remote": True})])
+    assert json.loads(registry.nosql_schema())["remote"] == "bool | null"
+    assert registry.versions["nosql"] == 1
+    assert len(loads) == 1
+
+
+def test_sql_schema_is_cached_until_invalidated():
+    calls = []
+    registry = SchemaRegistry(lambda: calls.append(1) or f"v{len(calls)}", list, "(empty)")
+    assert registry.sql_schema() == registry.sql_schema() == "v1"
+    registry.invalidate("sql")
+    assert registry.sql_schema() == "v2"
+    assert registry.versions["sql"] == 1
+    assert registry.nosql_schema() == "(empty)"
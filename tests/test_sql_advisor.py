@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from sql_advisor import IndexAdvisor, _column_usage
+from sql_lexer import tokenize
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT, "
+                "age INTEGER, salary_amount INTEGER)")
+    con.executemany("INSERT INTO employees (name, department, age, salary_amount) VALUES (?, ?, ?, ?)",
+                    [(f"e{i}", f"d{i % 5}", 20 + i % 40, 1000 * i) for i in range(200)])
+    return con
+
+
+def test_column_usage():
+    sql = ("SELECT e.name FROM employees e WHERE e.department = 'IT' AND age > 30 "
+           "AND lower(name) = 'x' ORDER BY salary_amount DESC")
+    assert _column_usage(tokenize(sql)) == (["department"], ["age"], ["salary_amount"])
+
+
+def test_recommends_after_repeated_scans(con):
+    advisor = IndexAdvisor(threshold=3)
+    sql = "SELECT * FROM employees WHERE department = 'd1' AND age > 30"
+    for _ in range(3):
+        assert advisor.observe(con, sql, 0.01) == []
+    report = advisor.report()
+    assert [r["name"] for r in report["recommended"]] == ["auto_idx_employees_department_age"]
+    assert advisor.observe(con, "SELECT * FROM employees WHERE id = 3", 0.01) == []   # rowid
+
+    cand = advisor.create_recommended(con, "auto_idx_employees_department_age")
+    assert cand.status == "created"
+    advisor.observe(con, sql, 0.001)
+    row = advisor.report()["created"][0]
+    assert row["avg_ms_after"] == 1.0 and row["speedup"] == 10.0
+
+
+def test_auto_create_and_existing_indexes(con):
+    con.execute("CREATE INDEX idx_age ON employees (age)")
+    advisor = IndexAdvisor(threshold=1, auto_create=True)
+    assert advisor.observe(con, "SELECT * FROM employees WHERE age + 0 > 30", 0.01) == []
+    assert advisor.report()["recommended"] == []        # idx_age already covers it
+    due = advisor.observe(con, "SELECT * FROM employees ORDER BY salary_amount", 0.01)
+    assert [c.columns for c in due] == [("salary_amount",)]
+    advisor.create(con, due[0])
+    names = [r[1] for r in con.execute("PRAGMA index_list(employees)")]
+    assert "auto_idx_employees_salary_amount" in names
+
+
+def test_placeholders_are_bound_for_explain(con):
+    advisor = IndexAdvisor(threshold=2)
+    for _ in range(2):
+        advisor.observe(con, "SELECT * FROM employees WHERE department = ?", 0.01, ("d1",))
+    assert [r["columns"] for r in advisor.report()["recommended"]] == [["department"]]
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from sql_guard import ExecutionBudget, QueryAborted, estimate_cost
+
+HEAVY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT)")
+    con.execute("CREATE INDEX idx_dept ON employees (department)")
+    con.executemany("INSERT INTO employees (name, department) VALUES (?, ?)",
+                    [(f"e{i}", f"d{i % 10}") for i in range(1000)])
+    return con
+
+
+def test_step_budget_aborts(con):
+    budget = ExecutionBudget(max_steps=50_000, max_seconds=60, check_every=1000)
+    with pytest.raises(QueryAborted) as err:
+        with budget.attach(con):
+            con.execute(HEAVY).fetchall()
+    assert err.value.reason == "steps" and err.value.to_dict()["limit"] == 50_000
+
+
+def test_time_budget_aborts(con):
+    budget = ExecutionBudget(max_steps=10 ** 15, max_seconds=0.05, check_every=1000)
+    with pytest.raises(QueryAborted) as err:
+        with budget.attach(con):
+            con.execute(HEAVY).fetchall()
+    assert err.value.reason == "time"
+
+
+def test_budget_is_shared_across_blocks(con):
+    budget = ExecutionBudget(max_steps=10 ** 9, max_seconds=60, check_every=100)
+    for _ in range(2):
+        with budget.attach(con):
+            con.execute("SELECT sum(length(name)) FROM employees").fetchall()
+    assert budget.steps > 0 and budget.stats()["seconds"] >= 0
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM employees", "INSERT INTO employees (name) VALUES ('x')",
+    "CREATE TEMP TABLE t (x)", "PRAGMA user_version = 3", "ATTACH ':memory:' AS other",
+])
+def test_read_only_authorizer_denies_writes(con, sql):
+    budget = ExecutionBudget(max_steps=10 ** 9, max_seconds=60)
+    with pytest.raises(QueryAborted) as err:
+        with budget.attach(con, readonly=True):
+            con.execute(sql)
+    assert err.value.reason == "read_only"
+    assert con.execute("SELECT count(*) FROM employees").fetchone()[0] == 1000
+
+
+def test_read_only_allows_reads_and_introspection(con):
+    budget = ExecutionBudget(max_steps=10 ** 9, max_seconds=60)
+    with budget.attach(con, readonly=True):
+        assert con.execute("SELECT count(*) FROM employees WHERE department = 'd1'").fetchone()[0] == 100
+        assert len(con.execute("PRAGMA table_info(employees)").fetchall()) == 3
+        con.execute("PRAGMA user_version").fetchone()
+
+
+def test_estimate_cost_from_the_plan(con):
+    scan = estimate_cost(con, "SELECT * FROM employees")
+    assert scan["cost"] == 1000 and scan["tables"] == {"employees": 1000}
+    assert estimate_cost(con, "SELECT * FROM employees WHERE id = ?", (5,))["cost"] == 1
+    assert estimate_cost(con, "SELECT * FROM employees WHERE department = 'd1'")["cost"] == 10
+    join = estimate_cost(con, "SELECT * FROM employees a, employees b WHERE a.name < b.name")
+    assert join["cost"] >= 1000 * 250
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from sql_normalize import normalize_sql
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT, "
+                "salary_amount REAL, age INTEGER)")
+    con.executemany("INSERT INTO employees VALUES (?, ?, ?, ?, ?)", [
+        (1, "Amit", "IT", 75000, 29), (2, "Priya", "HR", 52000, 31),
+        (3, "O'Brien", "IT", 91000.5, 45), (4, "Neha", "Sales", 67000, 27),
+    ])
+    con.commit()
+    return con
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT name FROM employees WHERE department = 'IT'",
+    "select name, age from employees where salary_amount > 60000 and age < 40 order by 2 desc",
+    "SELECT * FROM employees WHERE name = 'O''Brien';",
+    "SELECT department, count(*) AS n FROM employees GROUP BY 1 HAVING count(*) > 1",
+    "SELECT CAST(salary_amount AS VARCHAR(10)) FROM employees WHERE id IN (1, 3, 4)",
+    "SELECT name, 'x' || department AS tag FROM employees WHERE salary_amount BETWEEN 5e4 AND 8e4",
+    "UPDATE employees SET salary_amount = salary_amount * 1.1 WHERE department = 'IT'",
+    "DELETE FROM employees WHERE age >= 45",
+])
+def test_parameterized_statement_matches_original(con, sql):
+    norm = normalize_sql(sql)
+    expected = sqlite3.connect(":memory:")
+    con.backup(expected)
+    got = con.execute(norm.text, norm.params)
+    want = expected.execute(sql)
+    assert got.fetchall() == want.fetchall()
+    assert got.rowcount == want.rowcount
+    assert con.execute("SELECT * FROM employees ORDER BY id").fetchall() == \
+        expected.execute("SELECT * FROM employees ORDER BY id").fetchall()
+
+
+def test_literals_are_lifted_into_params():
+    norm = normalize_sql("SELECT name FROM employees WHERE department = 'IT' AND age > 30")
+    assert norm.text == "SELECT name FROM employees WHERE department = ? AND age > ?"
+    assert norm.params == ("IT", 30)
+    assert normalize_sql(norm.text).text == norm.text    # already normalized: unchanged
+
+
+def test_same_shape_shares_fingerprint():
+    a = normalize_sql("SELECT name FROM employees WHERE department = 'IT'")
+    b = normalize_sql("select name   from employees where department='HR'")
+    c = normalize_sql("SELECT name FROM employees WHERE location = 'IT'")
+    assert a.fingerprint == b.fingerprint
+    assert a.fingerprint != c.fingerprint
+
+
+def test_statements_that_cannot_be_parameterized_run_as_generated():
+    for sql in ("PRAGMA table_info(employees)", "SELECT * FROM employees WHERE id = ?"):
+        norm = normalize_sql(sql)
+        assert (norm.text, norm.params) == (sql, ())
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from sql_normalize import normalize_sql
+from sql_paging import PAGE_KEY, keyset_form, keyset_select, split_key
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    con.row_factory = sqlite3.Row
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, department TEXT, "
+                "age INTEGER)")
+    con.execute("CREATE INDEX idx_dept ON employees (department)")
+    con.executemany("INSERT INTO employees VALUES (?, ?, ?, ?)",
+                    [(i * 3, f"e{i}", "IT" if i % 2 else "HR", 20 + i % 40) for i in range(1, 501)])
+    return con
+
+
+def _pages(con, sql, size):
+    norm = normalize_sql(sql)
+    keyed, after, out = keyset_form(norm.text), None, []
+    while True:
+        text, bounds = keyset_select(keyed, after, size)
+        rows = con.execute(text, norm.params + bounds).fetchall()
+        if not rows:
+            return out
+        for row in rows:
+            after, result = split_key(row)
+            out.append(result)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM employees",
+    "SELECT name, age FROM employees WHERE age > 30;",
+    "select e.name from employees AS e where e.department = 'IT' and e.age between 25 and 35",
+])
+def test_pages_cover_every_row_once(con, sql):
+    want = [dict(r) for r in con.execute(sql.rstrip(";") + " ORDER BY rowid")]
+    assert _pages(con, sql, 7) == want and want
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM employees ORDER BY age",
+    "SELECT department, count(*) FROM employees GROUP BY department",
+    "SELECT DISTINCT department FROM employees",
+    "SELECT * FROM employees LIMIT 5",
+    "SELECT * FROM employees a JOIN employees b ON a.id = b.id",
+    "SELECT * FROM employees a, employees b",
+    "SELECT * FROM (SELECT * FROM employees) t",
+    "SELECT name, rank() OVER (ORDER BY age) FROM employees",
+    "SELECT * FROM employees UNION SELECT * FROM employees",
+    "WITH t AS (SELECT * FROM employees) SELECT * FROM t",
+    "SELECT 1",
+    "PRAGMA table_info(employees)",
+])
+def test_other_statements_keep_offset_paging(sql):
+    assert keyset_form(sql) is None
+
+
+def test_subqueries_in_the_where_clause_are_fine():
+    sql = "SELECT name FROM employees WHERE age IN (SELECT age FROM employees ORDER BY age LIMIT 3)"
+    assert keyset_form(sql) == sql.replace("SELECT name", f"SELECT rowid AS {PAGE_KEY}, name", 1)
+
+
+def test_later_pages_seek_instead_of_skipping(con):
+    keyed = keyset_form(normalize_sql("SELECT name FROM employees WHERE department = 'IT'").text)
+    text, bounds = keyset_select(keyed, 900, 10)
+    plan = " ".join(r["detail"] for r in con.execute("EXPLAIN QUERY PLAN " + text, ("IT",) + bounds))
+    assert "rowid>?" in plan and "TEMP B-TREE" not in plan
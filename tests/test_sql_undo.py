@@ -0,0 +1,88 @@
+import json
+import sqlite3
+
+import pytest
+
+from sql_undo import (collect_before_images, install_undo_triggers, restore_before_images,
+                      start_capture)
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+    con.executemany("INSERT INTO employees VALUES (?, ?, ?)",
+                    [(1, "Amit", 29), (2, "Priya", 24), (3, "Karan", 31)])
+    install_undo_triggers(con)
+    start_capture(con)
+    return con
+
+
+@pytest.fixture
+def blobs():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, photo BLOB)")
+    con.executemany("INSERT INTO employees VALUES (?, ?, ?)",
+                    [(1, "Amit", b"\x00\xff"), (2, "Priya", None), (3, "Karan", '{"$blob": "00"}')])
+    install_undo_triggers(con)
+    start_capture(con)
+    return con
+
+
+def rows(con):
+    return con.execute("SELECT * FROM employees ORDER BY id").fetchall()
+
+
+def test_update_delete_insert_round_trip(con):
+    before = rows(con)
+    con.execute("UPDATE employees SET name = upper(name), age = age + 1")
+    con.execute("DELETE FROM employees WHERE id = 1")
+    con.execute("INSERT INTO employees (name, age) VALUES ('Neha', 27)")
+    changes = collect_before_images(con)
+    assert [c["op"] for c in changes] == ["update"] * 3 + ["delete", "insert"]
+    json.dumps(changes)   # snapshots are stored as JSON
+    assert restore_before_images(con, changes) == {"restored": len(changes), "missing": []}
+    assert rows(con) == before
+    assert collect_before_images(con) == []   # the restore itself isn't captured
+
+
+def test_only_touched_rows_are_captured(con):
+    con.execute("UPDATE employees SET age = 50 WHERE id = 2")
+    assert collect_before_images(con) == [{"table": "employees", "op": "update", "rowid": 2,
+                                           "row": {"id": 2, "name": "Priya", "age": 24}}]
+    assert collect_before_images(con) == []
+
+
+def test_primary_key_update_is_reversible(con):
+    before = rows(con)
+    con.execute("UPDATE employees SET id = 10 WHERE id = 3")
+    restore_before_images(con, collect_before_images(con))
+    assert rows(con) == before
+
+
+def test_new_columns_are_captured_after_reinstall(con):
+    con.execute("ALTER TABLE employees ADD COLUMN city TEXT")
+    install_undo_triggers(con)
+    con.execute("UPDATE employees SET city = 'Pune' WHERE id = 1")
+    assert collect_before_images(con)[0]["row"] == {"id": 1, "name": "Amit", "age": 29, "city": None}
+
+
+def test_update_and_delete_round_trip_with_blobs(blobs):
+    before = rows(blobs)
+    blobs.execute("UPDATE employees SET name = upper(name), photo = x'01'")
+    blobs.execute("DELETE FROM employees WHERE id = 1")
+    blobs.execute("INSERT INTO employees (name) VALUES ('Neha')")
+    changes = collect_before_images(blobs)
+    json.dumps(changes)   # snapshots are stored as JSON
+    assert restore_before_images(blobs, changes) == {"restored": len(changes), "missing": []}
+    assert rows(blobs) == before
+
+
+def test_rows_gone_since_are_reported(blobs):
+    blobs.execute("UPDATE employees SET name = 'x' WHERE id IN (1, 2)")
+    changes = collect_before_images(blobs)
+    blobs.execute("DELETE FROM employees WHERE id = 2")
+    result = restore_before_images(blobs, changes)
+    assert result["restored"] == 1
+    assert result["missing"] == [{"table": "employees", "op": "update", "rowid": 2}]
+    assert rows(blobs)[0] == (1, "Amit", b"\x00\xff")
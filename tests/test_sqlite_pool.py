@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sqlite_pool import PoolTimeout, SQLitePool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / "test.db"), readers=2)
+    with pool.writer() as con:
+        con.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        con.execute("INSERT INTO t (v) VALUES ('a')")
+    yield pool
+    pool.close()
+
+
+def test_writer_switches_on_wal_and_commits(pool):
+    with pool.writer() as con:
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.reader() as con:
+        assert [r["v"] for r in con.execute("SELECT v FROM t")] == ["a"]
+
+
+def test_readers_are_read_only(pool):
+    with pool.reader() as con:
+        with pytest.raises(sqlite3.OperationalError):
+            con.execute("INSERT INTO t (v) VALUES ('b')")
+
+
+def test_writer_rolls_back_on_error(pool):
+    with pytest.raises(RuntimeError):
+        with pool.writer() as con:
+            con.execute("INSERT INTO t (v) VALUES ('b')")
+            raise RuntimeError("boom")
+    with pool.reader() as con:
+        assert con.execute("SELECT count(*) FROM t").fetchone()[0] == 1
+
+
+def test_readers_are_capped_and_reused(pool):
+    held = [pool.reader() for _ in range(2)]
+    cons = [cm.__enter__() for cm in held]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.reader().__enter__()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()          # both readers are checked out
+    held[0].__exit__(None, None, None)
+    waiter.join(5)
+    assert got == [cons[0]]
+    stats = pool.stats()
+    assert (stats["open_readers"], stats["reader_waits"]) == (2, 1)
+
+
+def test_reader_checkout_times_out(tmp_path):
+    pool = SQLitePool(str(tmp_path / "test.db"), readers=1, reader_timeout=0.05)
+    with pool.reader():
+        with pytest.raises(PoolTimeout):
+            with pool.reader():
+                pass
+    with pool.reader() as con:   # the held reader went back to the pool
+        assert con.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.stats()["reader_timeouts"] == 1
+    pool.close()
@@ -0,0 +1,21 @@
+import pytest
+from tinydb import TinyDB
+
+from storage import AtomicJSONStorage, LogStorage
+
+
+@pytest.mark.parametrize("storage", [AtomicJSONStorage, LogStorage])
+def test_refresh_counts_writes_by_other_processes(tmp_path, storage):
+    path = str(tmp_path / "db.json")
+    ours, theirs = TinyDB(path, storage=storage), TinyDB(path, storage=storage)
+    ours.table("employees").insert({"name": "Amit"})
+    generation = ours.storage.refresh()
+    ours.table("employees").insert({"name": "Priya"})   # our own write: no change
+    assert ours.storage.refresh() == generation
+
+    theirs.table("employees").insert({"name": "Neha"})
+    assert ours.storage.refresh() == generation + 1
+    assert ours.storage.refresh() == generation + 1
+    assert [d["name"] for d in ours.table("employees").all()] == ["Amit", "Priya", "Neha"]
+    ours.close()
+    theirs.close()
@@ -0,0 +1,49 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import SamplingProfiler, Trace, current_trace, span
+
+
+def test_spans_collect_into_the_current_trace():
+    def db_call():
+        with span("db"):
+            pass
+
+    db_call()   # no trace: a no-op
+    trace = Trace()
+    token = current_trace.set(trace)
+    try:
+        with span("llm"):
+            time.sleep(0.01)
+        with ThreadPoolExecutor(1) as pool:   # as run_db does
+            pool.submit(contextvars.copy_context().run, db_call).result()
+        db_call()
+    finally:
+        current_trace.reset(token)
+    names = [t["name"] for t in trace.timings()]
+    assert names == ["llm", "db", "db"]
+    header = trace.server_timing().split(", ")
+    assert [part.split(";")[0] for part in header] == ["llm", "db", "total"]   # summed per name
+
+
+def test_sampling_profiler_sees_busy_threads(tmp_path):
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    profiler = SamplingProfiler(lambda t: t.name == "busy", interval=0.001).start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    result = profiler.save(str(tmp_path / "prof" / "out.txt"))
+    assert result["samples"] > 0 and result["ticks"] >= result["samples"] // 2
+    lines = (tmp_path / "prof" / "out.txt").read_text().splitlines()
+    assert any("busy_loop" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)